@@ -0,0 +1,131 @@
+"""
+Benchmark: regressão harmônica x Prophet
+
+Gera uma série sintética de temperatura (tendência + ciclos diário e semanal
++ ruído autocorrelacionado), treina cada motor com `--days-history` dias e
+avalia as previsões horárias dos `--days-forecast` dias seguintes.
+
+Uso (a partir de python-analytics/):
+
+    python benchmarks/forecast_engines.py
+    python benchmarks/forecast_engines.py --days-history 90 --step-seconds 30
+
+Prophet é opcional; sem ele apenas o motor harmônico é medido.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.harmonic_forecaster import HarmonicForecaster  # noqa: E402
+
+
+def synthetic_series(hours: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Temperatura sintética nos instantes `hours` (horas desde o início)"""
+    ar = np.empty(len(hours))
+    ar[0] = 0.0
+    noise = rng.normal(0, 0.35, len(hours))
+    for i in range(1, len(hours)):
+        ar[i] = 0.9 * ar[i - 1] + noise[i]
+    return (
+        27.0
+        + 0.01 * hours
+        + 5.0 * np.sin(2 * np.pi * (hours - 9) / 24)
+        + 1.2 * np.sin(4 * np.pi * hours / 24)
+        + 1.5 * np.sin(2 * np.pi * hours / 168)
+        + ar
+    )
+
+
+def evaluate(actual: np.ndarray, yhat: np.ndarray, lower: np.ndarray, upper: np.ndarray) -> dict:
+    err = yhat - actual
+    return {
+        "mae": float(np.mean(np.abs(err))),
+        "rmse": float(np.sqrt(np.mean(err ** 2))),
+        "cobertura_80": float(np.mean((actual >= lower) & (actual <= upper)))
+    }
+
+
+def run_harmonic(train_ts, train_y, future_ts):
+    model = HarmonicForecaster().fit(train_ts, train_y)
+    return model.predict(future_ts)
+
+
+def run_prophet(train_ts, train_y, future_ts):
+    from prophet import Prophet
+
+    model = Prophet(
+        daily_seasonality=True,
+        weekly_seasonality=True,
+        yearly_seasonality=False,
+        changepoint_prior_scale=0.05
+    )
+    model.fit(pd.DataFrame({"ds": train_ts, "y": train_y}))
+    forecast = model.predict(pd.DataFrame({"ds": future_ts}))
+    return (
+        forecast["yhat"].to_numpy(),
+        forecast["yhat_lower"].to_numpy(),
+        forecast["yhat_upper"].to_numpy()
+    )
+
+
+def bench(name, fn, repeat, *args):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        timings.append(time.perf_counter() - started)
+    return name, float(np.median(timings)), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days-history", type=int, default=30)
+    parser.add_argument("--days-forecast", type=int, default=7)
+    parser.add_argument("--step-seconds", type=int, default=60, help="intervalo entre leituras")
+    parser.add_argument("--repeat", type=int, default=5, help="repetições do motor harmônico")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    start = np.datetime64("2024-01-01T00:00:00", "ns")
+    step_hours = args.step_seconds / 3600
+
+    history_hours = np.arange(0, args.days_history * 24, step_hours)
+    forecast_hours = history_hours[-1] + np.arange(1, args.days_forecast * 24 + 1)
+    values = synthetic_series(np.concatenate([history_hours, forecast_hours]), rng)
+
+    def to_ts(hours):
+        return start + (hours * 3600e9).astype("timedelta64[ns]")
+
+    train_ts, train_y = to_ts(history_hours), values[:len(history_hours)]
+    future_ts, actual = to_ts(forecast_hours), values[len(history_hours):]
+
+    print(
+        f"Histórico: {len(train_ts)} leituras ({args.days_history} dias) | "
+        f"previsão: {len(future_ts)} horas"
+    )
+
+    runs = [bench("harmonico", run_harmonic, args.repeat, train_ts, train_y, future_ts)]
+    try:
+        import prophet  # noqa: F401
+        runs.append(bench("prophet", run_prophet, 1, train_ts, train_y, future_ts))
+    except ImportError:
+        print("Prophet não instalado: comparação apenas com o motor harmônico")
+
+    print(f"\n{'motor':<10} {'tempo (s)':>10} {'MAE':>8} {'RMSE':>8} {'cobertura 80%':>14}")
+    for name, elapsed, (yhat, lower, upper) in runs:
+        m = evaluate(actual, yhat, lower, upper)
+        print(f"{name:<10} {elapsed:>10.4f} {m['mae']:>8.3f} {m['rmse']:>8.3f} {m['cobertura_80']:>14.1%}")
+
+    if len(runs) == 2:
+        print(f"\nAceleração: {runs[1][1] / runs[0][1]:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
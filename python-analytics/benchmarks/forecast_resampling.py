@@ -0,0 +1,107 @@
+"""
+Benchmark: treino com leituras brutas x médias reamostradas
+
+Emula a etapa de reamostragem do MongoDB (SensorRepository.get_resampled_series:
+média por intervalo no instante médio das leituras, intervalos vazios omitidos)
+sobre uma série sintética e compara, para cada motor, o tempo de treino e a
+qualidade da previsão horária. A referência de cada hora prevista é a média
+das leituras reais na hora centrada nela, que é a grandeza do grid horário.
+
+Uso (a partir de python-analytics/):
+
+    python benchmarks/forecast_resampling.py
+    python benchmarks/forecast_resampling.py --days-history 90 --step-seconds 30 --gap-hours 48
+
+Prophet é opcional; sem ele apenas o motor harmônico é medido.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from forecast_engines import bench, evaluate, run_harmonic, run_prophet, synthetic_series  # noqa: E402
+
+
+def resample_means(hours: np.ndarray, values: np.ndarray, bin_hours: float):
+    """Média por intervalo no instante médio das leituras (como o $group do MongoDB)"""
+    bins = np.floor(hours / bin_hours).astype(np.int64)
+    _, inverse, counts = np.unique(bins, return_inverse=True, return_counts=True)
+    mean_hours = np.bincount(inverse, weights=hours) / counts
+    mean_values = np.bincount(inverse, weights=values) / counts
+    return mean_hours, mean_values
+
+
+def drop_gaps(hours: np.ndarray, values: np.ndarray, gap_hours: float, rng: np.random.Generator):
+    """Remover blocos aleatórios de 6 horas até somar `gap_hours` sem dados"""
+    keep = np.ones(len(hours), dtype=bool)
+    for _ in range(int(gap_hours // 6)):
+        start = rng.uniform(0, hours[-1] - 6)
+        keep &= ~((hours >= start) & (hours < start + 6))
+    return hours[keep], values[keep]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days-history", type=int, default=30)
+    parser.add_argument("--days-forecast", type=int, default=7)
+    parser.add_argument("--step-seconds", type=int, default=60, help="intervalo entre leituras")
+    parser.add_argument("--bin-minutes", type=int, default=60, help="resolução da reamostragem")
+    parser.add_argument("--gap-hours", type=float, default=24, help="horas removidas do histórico em blocos de 6h")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    start = np.datetime64("2024-01-01T00:00:00", "ns")
+    step_hours = args.step_seconds / 3600
+
+    total_hours = (args.days_history + args.days_forecast) * 24
+    hours = np.arange(0, total_hours, step_hours)
+    values = synthetic_series(hours, rng)
+
+    history = hours < args.days_history * 24
+    train_hours, train_y = drop_gaps(hours[history], values[history], args.gap_hours, rng)
+
+    # Referência: média das leituras na hora centrada em cada instante previsto
+    last = train_hours[-1]
+    forecast_hours = last + np.arange(1, args.days_forecast * 24 + 1)
+    future_hours, future_values = hours[~history], values[~history]
+    window = np.abs(future_hours[None, :] - forecast_hours[:, None]) < 0.5
+    actual = (window * future_values).sum(axis=1) / window.sum(axis=1)
+
+    def to_ts(h):
+        return start + (h * 3600e9).astype("timedelta64[ns]")
+
+    bin_hours, bin_y = resample_means(train_hours, train_y, args.bin_minutes / 60)
+    inputs = {
+        "bruto": (to_ts(train_hours), train_y),
+        f"{args.bin_minutes}min": (to_ts(bin_hours), bin_y)
+    }
+    future_ts = to_ts(forecast_hours)
+
+    engines = [("harmonico", run_harmonic, 5)]
+    try:
+        import prophet  # noqa: F401
+        engines.append(("prophet", run_prophet, 1))
+    except ImportError:
+        print("Prophet não instalado: comparação apenas com o motor harmônico")
+
+    print(
+        f"Histórico: {args.days_history} dias, {args.gap_hours:g}h de lacunas | "
+        f"previsão: {len(future_ts)} horas\n"
+    )
+    print(f"{'motor':<10} {'entrada':<8} {'pontos':>8} {'tempo (s)':>10} {'MAE':>8} {'RMSE':>8} {'cobertura 80%':>14}")
+    for engine, fn, repeat in engines:
+        for label, (ts, y) in inputs.items():
+            _, elapsed, (yhat, lower, upper) = bench(engine, fn, repeat, ts, y, future_ts)
+            m = evaluate(actual, yhat, lower, upper)
+            print(
+                f"{engine:<10} {label:<8} {len(ts):>8} {elapsed:>10.4f} "
+                f"{m['mae']:>8.3f} {m['rmse']:>8.3f} {m['cobertura_80']:>14.1%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Micro-benchmark: kernels NumPy (utils/kernels.py) x implementação pandas anterior
+
+Mede, para séries sintéticas de N leituras, o tempo de:
+- índice de calor: DataFrame.apply(axis=1) x kernels.heat_index
+- classes de conforto + contagem: Series.apply + value_counts x np.select + np.unique
+- extração de anomalias: filtro + iterrows x kernels.anomaly_rows
+- linhas de previsão: iterrows x kernels.forecast_rows
+
+Uso (a partir de python-analytics/):
+
+    python benchmarks/indicator_kernels.py
+    python benchmarks/indicator_kernels.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import kernels  # noqa: E402
+
+
+# --- Implementações anteriores (pandas linha a linha) ---
+
+def legacy_heat_index(temp, humidity):
+    return temp + (0.5555 * (6.11 * np.exp(5417.7530 * ((1/273.16) - (1/(temp+273.15)))) * (humidity/100) - 10))
+
+
+def legacy_classify(heat_index):
+    if heat_index < 24:
+        return "muito confortável"
+    elif heat_index < 27:
+        return "confortável"
+    elif heat_index < 30:
+        return "levemente desconfortável"
+    elif heat_index < 33:
+        return "desconfortável"
+    return "muito desconfortável"
+
+
+def legacy_comfort(df):
+    indice = df.apply(lambda row: legacy_heat_index(row['temperatura'], row['umidade']), axis=1)
+    return indice, indice.apply(legacy_classify).value_counts().to_dict()
+
+
+def legacy_anomalies(df, zscores, threshold):
+    df = df.assign(temp_zscore=zscores)
+    rows = []
+    for _, row in df[df['temp_zscore'] > threshold].iterrows():
+        rows.append({
+            "timestamp": row['timestamp'].isoformat(),
+            "tipo": "temperatura",
+            "valor": round(float(row['temperatura']), 2),
+            "zscore": round(float(row['temp_zscore']), 2),
+            "gravidade": "alta" if row['temp_zscore'] > 4 else "moderada"
+        })
+    return rows
+
+
+def legacy_forecast_rows(forecast):
+    return [
+        {
+            "timestamp": row['ds'].isoformat(),
+            "previsto": round(row['yhat'], 2),
+            "limite_inferior": round(row['yhat_lower'], 2),
+            "limite_superior": round(row['yhat_upper'], 2)
+        }
+        for _, row in forecast.iterrows()
+    ]
+
+
+# --- Medição ---
+
+def timed(fn, *args, repeat=3):
+    best = np.inf
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def run(n: int, rng: np.random.Generator, skip_slow_above: int) -> None:
+    timestamps = np.datetime64("2024-01-01", "ns") + np.arange(n) * np.timedelta64(30, "s")
+    hours = np.arange(n) / 120
+    temperatura = 28 + 6 * np.sin(2 * np.pi * hours / 24) + rng.normal(0, 1.5, n)
+    umidade = 70 - 10 * np.sin(2 * np.pi * hours / 24) + rng.normal(0, 3, n)
+    df = pd.DataFrame({"timestamp": timestamps, "temperatura": temperatura, "umidade": umidade})
+    zscores = np.abs(stats.zscore(temperatura))
+
+    # Saída de previsão com uma linha por ponto
+    forecast = pd.DataFrame({
+        "ds": timestamps, "yhat": temperatura,
+        "yhat_lower": temperatura - 1, "yhat_upper": temperatura + 1
+    })
+
+    cases = [
+        ("índice de calor + conforto",
+         lambda: legacy_comfort(df),
+         lambda: kernels.value_counts(kernels.comfort_classes(kernels.heat_index(temperatura, umidade)))),
+        ("anomalias (|z| > 3)",
+         lambda: legacy_anomalies(df, zscores, 3.0),
+         lambda: kernels.anomaly_rows(timestamps, temperatura, zscores, 3.0, "temperatura")),
+        ("linhas de previsão",
+         lambda: legacy_forecast_rows(forecast),
+         lambda: kernels.forecast_rows(timestamps, temperatura, temperatura - 1, temperatura + 1)),
+    ]
+
+    print(f"\nN = {n:,} leituras")
+    print(f"{'caso':<34} {'pandas (s)':>11} {'kernel (s)':>11} {'ganho':>8}")
+    for name, legacy, kernel in cases:
+        kernel_time, _ = timed(kernel)
+        if n > skip_slow_above and name.startswith("índice"):
+            print(f"{name:<34} {'(pulado)':>11} {kernel_time:>11.4f} {'':>8}")
+            continue
+        legacy_time, _ = timed(legacy, repeat=1)
+        print(f"{name:<34} {legacy_time:>11.4f} {kernel_time:>11.4f} {legacy_time / kernel_time:>7.0f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument(
+        "--skip-slow-above", type=int, default=10_000_000,
+        help="não medir DataFrame.apply(axis=1) acima deste N"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    for n in args.sizes:
+        run(n, rng, args.skip_slow_above)
+
+
+if __name__ == "__main__":
+    main()
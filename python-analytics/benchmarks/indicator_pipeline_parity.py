@@ -0,0 +1,175 @@
+"""
+Paridade e tempo: indicadores no pipeline do MongoDB x caminho em Python
+
+Grava uma série sintética (intervalos irregulares, lacunas, picos e
+leituras sem temperatura/umidade) de um dispositivo temporário em 'dados' e
+chama o IndicatorsService duas vezes para cada indicador: com
+INDICATOR_PIPELINES_ENABLED (episódios e taxas calculados no MongoDB) e sem
+(leituras lidas em lotes e calculadas em Python, como no fallback).
+Compara as respostas campo a campo, exatamente por padrão (--tolerance
+aceita diferenças nos números arredondados), e mede o tempo de cada
+caminho. Sai com código 1 se alguma resposta divergir.
+
+A mesma comparação, sem MongoDB, roda nos testes
+(tests/test_indicator_pipeline_parity.py); este script confere o pipeline
+no servidor de verdade. Requer um MongoDB 5.0+ ($setWindowFields). Uso (a
+partir de python-analytics/):
+
+    MONGODB_URI=mongodb://localhost:27017 python benchmarks/indicator_pipeline_parity.py
+    python benchmarks/indicator_pipeline_parity.py --days 30 --step-seconds 60 --gaps 10
+"""
+import argparse
+import asyncio
+import math
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import Database  # noqa: E402
+from repositories.series_cache import series_cache  # noqa: E402
+from services import indicators_service  # noqa: E402
+from services.indicators_service import IndicatorsService  # noqa: E402
+
+# Diferença aceita nos números das respostas (--tolerance)
+FLOAT_TOLERANCE = 0.0
+
+# Fração de leituras sem temperatura ou sem umidade
+NULL_FRACTION = 0.02
+
+
+def synthetic_readings(device_id: str, days: int, step_seconds: int, gaps: int, rng: np.random.Generator):
+    """Leituras com ciclo diário, intervalos de 0,25-2,5x o passo, picos à tarde, nulos e lacunas de 3-8h"""
+    # Uma hora de folga no início para a janela dos indicadores cobrir tudo
+    start = datetime.now() - timedelta(days=days) + timedelta(hours=1)
+    steps = rng.uniform(0.25, 2.5, int(days * 86400 / step_seconds)) * step_seconds
+    offsets = np.round(np.cumsum(steps), 3)
+    offsets = offsets[offsets < days * 86400 - 7200]
+    keep = np.ones(len(offsets), dtype=bool)
+    for _ in range(gaps):
+        gap_start = rng.uniform(0, offsets[-1])
+        keep &= ~((offsets >= gap_start) & (offsets < gap_start + rng.uniform(3, 8) * 3600))
+    offsets = np.sort(offsets[keep])
+
+    hour = offsets / 3600 % 24
+    temperatura = 29 + 6 * np.sin(2 * np.pi * (hour - 9) / 24) + rng.normal(0, 0.8, len(offsets))
+    umidade = 72 + 18 * np.sin(2 * np.pi * (hour - 11) / 24) + rng.normal(0, 2, len(offsets))
+    return [
+        {
+            "dispositivo": device_id,
+            "timestamp": start + timedelta(seconds=float(s)),
+            "temperatura": None if missing_t else float(t),
+            "umidade": None if missing_u else float(u)
+        }
+        for s, t, u, missing_t, missing_u in zip(
+            offsets, temperatura, umidade,
+            rng.random(len(offsets)) < NULL_FRACTION,
+            rng.random(len(offsets)) < NULL_FRACTION
+        )
+    ]
+
+
+def same(expected, actual, tolerance: float = FLOAT_TOLERANCE) -> bool:
+    if isinstance(expected, dict):
+        return (
+            isinstance(actual, dict)
+            and expected.keys() == actual.keys()
+            and all(same(expected[k], actual[k], tolerance) for k in expected)
+        )
+    if isinstance(expected, list):
+        return (
+            isinstance(actual, list) and len(expected) == len(actual)
+            and all(same(e, a, tolerance) for e, a in zip(expected, actual))
+        )
+    if isinstance(expected, float) or isinstance(actual, float):
+        return (
+            isinstance(expected, (int, float)) and isinstance(actual, (int, float))
+            and math.isclose(expected, actual, rel_tol=0, abs_tol=tolerance)
+        )
+    return expected == actual
+
+
+def compare(label: str, expected: dict, actual: dict, tolerance: float) -> bool:
+    """Comparar as respostas campo a campo (expected: caminho em Python)"""
+    ok = True
+    for key in sorted(expected.keys() | actual.keys()):
+        field_ok = same(expected.get(key), actual.get(key), tolerance)
+        print(f"  {'ok ' if field_ok else 'ERRO'} {label}.{key}")
+        if not field_ok:
+            print(f"       python:   {expected.get(key)}\n       pipeline: {actual.get(key)}")
+        ok &= field_ok
+    return ok
+
+
+async def timed(call):
+    t0 = time.perf_counter()
+    result = await call()
+    return result, time.perf_counter() - t0
+
+
+async def run(args) -> bool:
+    await Database.connect_db()
+    collection = Database.get_collection("dados")
+    device_id = f"paridade_{os.getpid()}"
+    service = IndicatorsService()
+    pipelines_enabled = indicators_service.INDICATOR_PIPELINES_ENABLED
+
+    cases = [
+        ("IRF", lambda: service.get_fungus_risk_index(device_id, args.days)),
+        (f"TAC (> {args.limit}°C)", lambda: service.get_critical_time_above_limit(device_id, args.days, args.limit)),
+        ("taxa de umidade", lambda: service.get_humidity_rate(device_id, args.days))
+    ]
+
+    try:
+        docs = synthetic_readings(
+            device_id, args.days, args.step_seconds, args.gaps, np.random.default_rng(args.seed)
+        )
+        await collection.insert_many(docs)
+        print(f"{len(docs)} leituras em {args.days} dias")
+
+        ok = True
+        timings = []
+        for label, call in cases:
+            indicators_service.INDICATOR_PIPELINES_ENABLED = True
+            pipeline, pipeline_seconds = await timed(call)
+
+            # Caminho em Python sem reaproveitar leituras de consultas anteriores
+            indicators_service.INDICATOR_PIPELINES_ENABLED = False
+            series_cache.clear()
+            python, python_seconds = await timed(call)
+
+            print(label)
+            ok &= compare(label, python, pipeline, args.tolerance)
+            timings.append((label, python_seconds, pipeline_seconds))
+
+        print(f"\n{'indicador':<20} {'python (ms)':>12} {'pipeline (ms)':>14}")
+        for label, python_seconds, pipeline_seconds in timings:
+            print(f"{label:<20} {python_seconds * 1000:>12.1f} {pipeline_seconds * 1000:>14.1f}")
+        return ok
+    finally:
+        indicators_service.INDICATOR_PIPELINES_ENABLED = pipelines_enabled
+        await collection.delete_many({"dispositivo": device_id})
+        await Database.close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--step-seconds", type=int, default=120, help="intervalo entre leituras")
+    parser.add_argument("--gaps", type=int, default=4, help="quantidade de lacunas de 3-8h")
+    parser.add_argument("--limit", type=float, default=33.0, help="limite do TAC (°C)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--tolerance", type=float, default=FLOAT_TOLERANCE, help="diferença aceita nos números")
+    args = parser.parse_args()
+
+    ok = asyncio.run(run(args))
+    print("PARIDADE OK" if ok else "PARIDADE FALHOU")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Verificação do live buffer em um replica set
+
+Grava leituras de um dispositivo temporário em 'dados', inicia o change
+stream e confere que:
+
+1. a primeira consulta preenche o buffer a partir do banco (backfill) e é
+   servida da memória, com as mesmas leituras do banco;
+2. uma leitura inserida depois chega pelo stream e a consulta seguinte,
+   ainda servida da memória, já a inclui;
+3. com o stream encerrado, a consulta volta ao banco e continua completa.
+
+Sai com código 1 se alguma verificação falhar e mede o tempo de cada
+consulta. Requer replica set (change streams). Uso (a partir de
+python-analytics/):
+
+    MONGODB_URI="mongodb://localhost:27017/?replicaSet=rs0" python benchmarks/live_buffer_replica.py
+    python benchmarks/live_buffer_replica.py --hours 24 --step-seconds 30
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import Database  # noqa: E402
+from models.sensor_series import SensorSeries  # noqa: E402
+from repositories.live_buffer import live_buffers  # noqa: E402
+from repositories.sensor_repository import SensorRepository  # noqa: E402
+
+
+def reading(device_id: str, timestamp: datetime, rng: np.random.Generator) -> dict:
+    return {
+        "dispositivo": device_id,
+        "timestamp": timestamp,
+        "temperatura": float(28 + rng.normal(0, 1)),
+        "umidade": float(70 + rng.normal(0, 3))
+    }
+
+
+def same(expected: SensorSeries, actual: SensorSeries) -> bool:
+    return (
+        len(expected) == len(actual)
+        and bool((expected.timestamps == actual.timestamps).all())
+        and bool(np.allclose(expected.temperatura, actual.temperatura, equal_nan=True))
+        and bool(np.allclose(expected.umidade, actual.umidade, equal_nan=True))
+    )
+
+
+def check(label: str, ok: bool) -> bool:
+    print(f"  {'ok ' if ok else 'ERRO'} {label}")
+    return ok
+
+
+async def wait_for(condition, timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.05)
+    return True
+
+
+async def query(repository: SensorRepository, device_id: str, hours: int):
+    """(série, servida da memória?, segundos) de get_last_hours_series"""
+    served = live_buffers.served
+    t0 = time.perf_counter()
+    series = await repository.get_last_hours_series(device_id, hours)
+    return series, live_buffers.served > served, time.perf_counter() - t0
+
+
+async def run(args) -> bool:
+    await Database.connect_db()
+    collection = Database.get_collection("dados")
+    repository = SensorRepository()
+    device_id = f"buffer_check_{os.getpid()}"
+    rng = np.random.default_rng(args.seed)
+
+    # Histórico anterior ao stream, dentro da janela consultada
+    now = datetime.now()
+    offsets = range((args.hours - 1) * 3600, 0, -args.step_seconds)
+    await collection.insert_many([reading(device_id, now - timedelta(seconds=s), rng) for s in offsets])
+    print(f"{len(offsets)} leituras em {args.hours - 1}h para {device_id}")
+
+    def reference():
+        return repository.get_series(device_id, datetime.now() - timedelta(hours=args.hours))
+
+    live_buffers.enabled = True
+    live_buffers.start()
+    try:
+        if not check("change stream ativo", await wait_for(lambda: live_buffers.healthy)):
+            return False
+
+        series, from_memory, backfill_seconds = await query(repository, device_id, args.hours)
+        ok = check("primeira consulta preenche o buffer e é servida da memória",
+                   from_memory and live_buffers.backfills >= 1)
+        ok &= check("backfill igual ao banco", same(await reference(), series))
+
+        events = live_buffers.events
+        await collection.insert_one(reading(device_id, datetime.now(), rng))
+        ok &= check("leitura nova recebida pelo stream", await wait_for(lambda: live_buffers.events > events))
+        series, from_memory, memory_seconds = await query(repository, device_id, args.hours)
+        ok &= check("leitura nova servida da memória", from_memory)
+        ok &= check("buffer igual ao banco", same(await reference(), series))
+
+        # Stream encerrado: as consultas voltam ao banco
+        await live_buffers.stop()
+        await collection.insert_one(reading(device_id, datetime.now(), rng))
+        series, from_memory, fallback_seconds = await query(repository, device_id, args.hours)
+        ok &= check("sem stream, consulta vai ao banco", not from_memory)
+        ok &= check("fallback igual ao banco", same(await reference(), series))
+
+        print(f"\nBackfill (banco -> buffer): {backfill_seconds * 1000:8.2f} ms")
+        print(f"Servida da memória:         {memory_seconds * 1000:8.2f} ms")
+        print(f"Fallback (banco):           {fallback_seconds * 1000:8.2f} ms")
+        return ok
+    finally:
+        await live_buffers.stop()
+        await collection.delete_many({"dispositivo": device_id})
+        await Database.close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=int, default=24, help="janela consultada (<= LIVE_BUFFER_HOURS)")
+    parser.add_argument("--step-seconds", type=int, default=60, help="intervalo entre leituras do histórico")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    ok = asyncio.run(run(args))
+    print("LIVE BUFFER OK" if ok else "LIVE BUFFER FALHOU")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+from __future__ import annotations
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import multiprocessing
+import os
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _timed_call(fn: Callable, args: tuple, kwargs: dict):
+    """Executar fn no worker e medir início e duração (precisa ser picklable)"""
+    started_at = time.time()
+    result = fn(*args, **kwargs)
+    return result, started_at, time.time() - started_at
+
+
+class ComputeExecutor:
+    """
+    Executor para o processamento pesado (pandas/scipy/Prophet)
+
+    Tira o trabalho CPU-bound do event loop do uvicorn. O modo é definido
+    por COMPUTE_EXECUTOR_MODE ("thread" ou "process") e o número de workers
+    por COMPUTE_WORKERS. Criado e encerrado pelo lifespan da aplicação.
+    No modo "process" as funções e argumentos precisam ser picklable.
+    """
+
+    executor: Optional[Executor] = None
+    mode: str = "thread"
+    workers: int = 0
+
+    # Métricas
+    submitted: int = 0
+    completed: int = 0
+    failed: int = 0
+    total_run_time: float = 0.0
+    max_run_time: float = 0.0
+    total_queue_time: float = 0.0
+
+    @classmethod
+    def start(cls) -> None:
+        """Criar o pool de execução"""
+        if cls.executor is not None:
+            return
+
+        cls.mode = os.getenv("COMPUTE_EXECUTOR_MODE", "thread").lower()
+        cls.workers = int(os.getenv("COMPUTE_WORKERS", os.cpu_count() or 2))
+
+        if cls.mode == "process":
+            cls.executor = ProcessPoolExecutor(
+                max_workers=cls.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        elif cls.mode == "thread":
+            cls.executor = ThreadPoolExecutor(
+                max_workers=cls.workers,
+                thread_name_prefix="compute"
+            )
+        else:
+            raise ValueError(f"COMPUTE_EXECUTOR_MODE inválido: {cls.mode}")
+        print(f"✅ Executor de processamento iniciado ({cls.mode}, {cls.workers} workers)")
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """Encerrar o pool aguardando as tarefas em andamento"""
+        if cls.executor:
+            cls.executor.shutdown(wait=True, cancel_futures=True)
+            cls.executor = None
+            print("🔌 Executor de processamento encerrado")
+
+    @classmethod
+    async def run(cls, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Executar fn(*args, **kwargs) fora do event loop
+
+        Sem executor iniciado (ex.: fora do lifespan) usa o pool padrão do loop.
+        """
+        loop = asyncio.get_running_loop()
+        submitted_at = time.time()
+        cls.submitted += 1
+
+        try:
+            result, started_at, elapsed = await loop.run_in_executor(
+                cls.executor, _timed_call, fn, args, kwargs
+            )
+        except Exception:
+            cls.failed += 1
+            raise
+
+        cls.completed += 1
+        cls.total_run_time += elapsed
+        cls.max_run_time = max(cls.max_run_time, elapsed)
+        cls.total_queue_time += max(0.0, started_at - submitted_at)
+        return result
+
+    @classmethod
+    def stats(cls) -> Dict:
+        """Profundidade da fila e tempos de execução"""
+        finished = cls.completed + cls.failed
+        return {
+            "modo": cls.mode if cls.executor else "padrao_do_loop",
+            "workers": cls.workers,
+            "submetidas": cls.submitted,
+            "em_andamento_ou_fila": cls.submitted - finished,
+            "concluidas": cls.completed,
+            "falhas": cls.failed,
+            "tempo_execucao_medio_s": round(cls.total_run_time / cls.completed, 4) if cls.completed else None,
+            "tempo_execucao_maximo_s": round(cls.max_run_time, 4),
+            "tempo_fila_medio_s": round(cls.total_queue_time / cls.completed, 4) if cls.completed else None
+        }
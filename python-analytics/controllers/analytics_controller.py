@@ -1,15 +1,19 @@
 from fastapi import APIRouter, HTTPException, Query
 from datetime import datetime, timedelta
-from typing import Optional
-from services.analytics_service import AnalyticsService
+from typing import List, Optional
+import asyncio
+from services.analytics_service import BATCH_ANALYSES, AnalyticsService
+from services.dataset_loader import DeviceDatasetLoader
 from clients.openmeteo_client import OpenMeteoClient
 from repositories.sensor_repository import SensorRepository
+from utils.time_buckets import BUCKET_TIMEZONE
 from schemas.analytics_schemas import (
     StatisticsResponse,
     AnomalyResponse,
     TrendResponse,
     CorrelationResponse,
-    ComfortResponse
+    ComfortResponse,
+    BatchRequest
 )
 
 router = APIRouter(prefix="/api/analytics", tags=["Analytics"])
@@ -22,7 +26,8 @@ sensor_repository = SensorRepository()
 async def get_statistics(
     device_id: str,
     start_date: Optional[str] = None,
-    end_date: Optional[str] = None
+    end_date: Optional[str] = None,
+    hours: int = Query(24, ge=1, le=168, description="Janela recente (sem start_date/end_date)")
 ):
     """
     Obter estatísticas detalhadas de um dispositivo
@@ -30,12 +35,13 @@ async def get_statistics(
     - **device_id**: ID do dispositivo
     - **start_date**: Data inicial (formato: YYYY-MM-DD)
     - **end_date**: Data final (formato: YYYY-MM-DD)
+    - **hours**: Sem datas, janela das últimas horas (1-168), servida pelos acumuladores online
     """
     try:
         start = datetime.fromisoformat(start_date) if start_date else None
         end = datetime.fromisoformat(end_date) if end_date else None
         
-        stats = await analytics_service.get_basic_statistics(device_id, start, end)
+        stats = await analytics_service.get_basic_statistics(device_id, start, end, hours=hours)
         
         if "erro" in stats:
             raise HTTPException(status_code=404, detail=stats["erro"])
@@ -46,6 +52,118 @@ async def get_statistics(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/quantis/{device_id}")
+async def get_quantiles(
+    device_id: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    days: int = Query(30, ge=1, le=365, description="Janela recente (sem start_date)"),
+    iqr_k: float = Query(1.5, ge=0.5, le=5.0, description="Fator do critério IQR")
+):
+    """
+    Percentis, IQR e limites de outliers de um intervalo qualquer
+    
+    - **device_id**: ID do dispositivo
+    - **start_date** / **end_date**: Intervalo (formato: YYYY-MM-DD); sem datas, últimos `days` dias
+    - **days**: Número de dias (1-365)
+    - **iqr_k**: Fator k dos limites Q1 - k·IQR e Q3 + k·IQR
+    
+    Calculado mesclando os sketches de quantis dos agregados horários e
+    diários (erro máximo de 0,05 nos percentis), sem ler as leituras brutas
+    """
+    try:
+        start = datetime.fromisoformat(start_date) if start_date else datetime.now() - timedelta(days=days)
+        end = datetime.fromisoformat(end_date) if end_date else None
+        
+        result = await analytics_service.get_quantiles(device_id, start, end, iqr_k)
+        
+        if "erro" in result:
+            raise HTTPException(status_code=404, detail=result["erro"])
+        
+        return result
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Formato de data inválido: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/agregados/{device_id}")
+async def get_buckets(
+    device_id: str,
+    granularidade: str = Query("1h", pattern="^(1m|5m|15m|1h|6h|1d)$"),
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    days: int = Query(7, ge=1, le=365, description="Janela recente (sem start_date)"),
+    fuso: str = Query(BUCKET_TIMEZONE, description="Fuso horário dos intervalos")
+):
+    """
+    Médias, mínimos e máximos por intervalo de tempo
+    
+    - **device_id**: ID do dispositivo
+    - **granularidade**: 1m, 5m, 15m, 1h, 6h ou 1d
+    - **start_date** / **end_date**: Intervalo (formato: YYYY-MM-DD); sem datas, últimos `days` dias
+    - **days**: Número de dias (1-365)
+    - **fuso**: Fuso horário que alinha os intervalos (padrão America/Recife)
+    
+    Agrupado no MongoDB com $dateTrunc; de 1h para cima, a partir dos agregados horários
+    """
+    try:
+        start = datetime.fromisoformat(start_date) if start_date else datetime.now() - timedelta(days=days)
+        end = datetime.fromisoformat(end_date) if end_date else None
+        
+        result = await analytics_service.get_buckets(device_id, start, end, granularidade, fuso)
+        
+        if "erro" in result:
+            status = 404 if result["erro"] == "Nenhum dado encontrado" else 400
+            raise HTTPException(status_code=status, detail=result["erro"])
+        
+        return result
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Formato de data inválido: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/serie/{device_id}")
+async def get_chart_series(
+    device_id: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    days: int = Query(7, ge=1, le=365, description="Janela recente (sem start_date)"),
+    pontos: int = Query(500, ge=10, le=5000, description="Número de pontos desejado"),
+    metodo: str = Query("lttb", pattern="^(lttb|m4)$")
+):
+    """
+    Série reduzida para gráficos
+    
+    - **device_id**: ID do dispositivo
+    - **start_date** / **end_date**: Intervalo (formato: YYYY-MM-DD); sem datas, últimos `days` dias
+    - **days**: Número de dias (1-365)
+    - **pontos**: Pontos por grandeza (10-5000)
+    - **metodo**: lttb (exatamente `pontos` pontos, preserva a forma) ou
+      m4 (mín/máx/primeiro/último por coluna de `pontos`/4 pixels)
+    
+    Intervalos com menos leituras que `pontos` são devolvidos sem redução
+    """
+    try:
+        start = datetime.fromisoformat(start_date) if start_date else datetime.now() - timedelta(days=days)
+        end = datetime.fromisoformat(end_date) if end_date else None
+        
+        result = await analytics_service.get_chart_series(device_id, start, end, pontos, metodo)
+        
+        if "erro" in result:
+            raise HTTPException(status_code=404, detail=result["erro"])
+        
+        return result
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Formato de data inválido: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/anomalias/{device_id}", response_model=AnomalyResponse)
 async def detect_anomalies(
     device_id: str,
@@ -89,16 +207,20 @@ async def get_trends(
 @router.get("/correlacao/{device_id}", response_model=CorrelationResponse)
 async def get_correlation(
     device_id: str,
-    days: int = Query(7, ge=1, le=30)
+    days: int = Query(7, ge=1, le=30),
+    spearman: bool = Query(True, description="Calcular Spearman (exige as leituras brutas)")
 ):
     """
     Análise de correlação entre temperatura e umidade
     
     - **device_id**: ID do dispositivo
     - **days**: Número de dias para análise (1-30)
+    - **spearman**: Incluir a correlação de Spearman (Pearson vem dos agregados)
     """
     try:
-        correlation = await analytics_service.get_correlation_analysis(device_id, days)
+        correlation = await analytics_service.get_correlation_analysis(
+            device_id, days, spearman=spearman
+        )
         
         if "erro" in correlation:
             raise HTTPException(status_code=400, detail=correlation["erro"])
@@ -107,6 +229,34 @@ async def get_correlation(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/correlacao-silos")
+async def get_cross_device_correlation(
+    days: int = Query(7, ge=1, le=90),
+    bin_minutes: int = Query(60, ge=5, le=1440, description="Intervalo da grade comum (minutos)"),
+    dispositivos: Optional[List[str]] = Query(None, description="IDs (padrão: todos)")
+):
+    """
+    Correlação de temperatura e umidade entre silos
+    
+    - **days**: Número de dias para análise (1-90)
+    - **bin_minutes**: Intervalo da grade de tempo comum (5-1440)
+    - **dispositivos**: Restringir a estes dispositivos (repetir o parâmetro)
+    
+    Matrizes de Pearson e Spearman (par a par, sobre os intervalos em que os
+    dois dispositivos têm leitura) e os pares que mais variam juntos
+    """
+    try:
+        result = await analytics_service.get_cross_device_correlation(days, bin_minutes, dispositivos)
+        
+        if "erro" in result:
+            raise HTTPException(status_code=400, detail=result["erro"])
+        
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/conforto/{device_id}", response_model=ComfortResponse)
 async def get_comfort_analysis(
     device_id: str,
@@ -204,12 +354,18 @@ async def get_device_summary(
     - **days**: Número de dias para análise
     """
     try:
+        # Buscar uma única vez a janela mais larga; cada análise recebe uma fatia
+        loader = DeviceDatasetLoader(device_id, sensor_repository)
+        await loader.preload(max(24, days * 24))
+        
         # Executar múltiplas análises em paralelo
-        stats = await analytics_service.get_basic_statistics(device_id)
-        trends = await analytics_service.get_trends(device_id, days)
-        correlation = await analytics_service.get_correlation_analysis(device_id, days)
-        anomalies = await analytics_service.detect_anomalies(device_id, days * 24)
-        comfort = await analytics_service.get_comfort_analysis(device_id, days * 24)
+        stats, trends, correlation, anomalies, comfort = await asyncio.gather(
+            analytics_service.get_basic_statistics(device_id, loader=loader),
+            analytics_service.get_trends(device_id, days, loader=loader),
+            analytics_service.get_correlation_analysis(device_id, days, loader=loader),
+            analytics_service.detect_anomalies(device_id, days * 24, loader=loader),
+            analytics_service.get_comfort_analysis(device_id, days * 24, loader=loader)
+        )
         
         # Gerar insights
         insights = []
@@ -242,6 +398,44 @@ async def get_device_summary(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/lote/{analise}")
+async def get_analysis_batch(
+    analise: str,
+    request: BatchRequest = BatchRequest(),
+    hours: int = Query(24, ge=1, le=168, description="Janela de estatisticas, anomalias e conforto"),
+    days: int = Query(7, ge=1, le=30, description="Janela de tendencias e correlacao"),
+    threshold: float = Query(3.0, ge=1.0, le=5.0),
+    spearman: bool = Query(True, description="Calcular Spearman (correlacao)")
+):
+    """
+    Análise para vários dispositivos em uma única requisição
+    
+    - **analise**: estatisticas, anomalias, tendencias, correlacao ou conforto
+    - **dispositivos** (corpo): lista de IDs ou "all" (padrão)
+    - **hours** / **days**: Janela da análise
+    - **threshold**: Limite de Z-score das anomalias
+    
+    As leituras de todos os dispositivos são buscadas com uma única consulta;
+    "resultados" traz a resposta de cada dispositivo (com "erro" quando não houver dados)
+    """
+    if analise not in BATCH_ANALYSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Análise inválida. Use: {', '.join(BATCH_ANALYSES)}"
+        )
+    
+    try:
+        results = await analytics_service.get_batch(
+            analise, request.device_ids(), hours, days, threshold, spearman
+        )
+        return {
+            "analise": analise,
+            "total_dispositivos": len(results),
+            "resultados": results
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/dispositivos")
 async def list_devices():
     """Listar todos os dispositivos disponíveis"""
@@ -1,5 +1,10 @@
 from fastapi import APIRouter, HTTPException, Query
 from services.forecast_service import ForecastService
+from services.forecast_job_service import ForecastJobService, forecast_jobs
+from services.fleet_forecast_service import FLEET_FORECAST_WORKERS, fleet_forecasts
+from services.dataset_loader import DeviceDatasetLoader
+from utils.time_buckets import BUCKET_TIMEZONE
+import asyncio
 
 
 router = APIRouter(prefix="/api/forecast", tags=["Forecast & Advanced Analytics"])
@@ -10,22 +15,29 @@ forecast_service = ForecastService()
 async def forecast_temperature(
     device_id: str,
     days_history: int = Query(30, ge=7, le=90),
-    days_forecast: int = Query(7, ge=1, le=30)
+    days_forecast: int = Query(7, ge=1, le=30),
+    engine: str = Query("prophet", pattern="^(prophet|harmonico)$")
 ):
     """
-    Prever temperatura usando Prophet
+    Prever temperatura usando Prophet ou regressão harmônica
     
     - **device_id**: ID do dispositivo
     - **days_history**: Dias de histórico para treinar (7-90)
     - **days_forecast**: Dias para prever (1-30)
+    - **engine**: prophet (padrão) ou harmonico (tendência + Fourier diário/semanal
+      por mínimos quadrados; milissegundos, não requer Prophet)
+    
+    Com Prophet, usa o modelo já treinado para o dispositivo/histórico quando
+    válido; a idade do modelo é retornada em "modelo".
     
-    Requer: pip install prophet
+    engine=prophet requer: pip install prophet
     """
     try:
         result = await forecast_service.forecast_temperature(
             device_id,
             days_history,
-            days_forecast
+            days_forecast,
+            engine=engine
         )
         
         if "erro" in result:
@@ -39,20 +51,25 @@ async def forecast_temperature(
 async def forecast_humidity(
     device_id: str,
     days_history: int = Query(30, ge=7, le=90),
-    days_forecast: int = Query(7, ge=1, le=30)
+    days_forecast: int = Query(7, ge=1, le=30),
+    engine: str = Query("prophet", pattern="^(prophet|harmonico)$")
 ):
     """
-    Prever umidade usando Prophet
+    Prever umidade usando Prophet ou regressão harmônica
     
     - **device_id**: ID do dispositivo
     - **days_history**: Dias de histórico (7-90)
     - **days_forecast**: Dias para prever (1-30)
+    - **engine**: prophet (padrão) ou harmonico (rápido, não requer Prophet)
+    
+    Com Prophet, usa o modelo já treinado quando válido (idade retornada em "modelo")
     """
     try:
         result = await forecast_service.forecast_humidity(
             device_id,
             days_history,
-            days_forecast
+            days_forecast,
+            engine=engine
         )
         
         if "erro" in result:
@@ -62,24 +79,112 @@ async def forecast_humidity(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/jobs/{metrica}/{device_id}", status_code=202)
+async def submit_forecast_job(
+    metrica: str,
+    device_id: str,
+    days_history: int = Query(30, ge=7, le=90),
+    days_forecast: int = Query(7, ge=1, le=30)
+):
+    """
+    Submeter previsão em segundo plano
+    
+    - **metrica**: temperatura ou umidade
+    - **device_id**: ID do dispositivo
+    - **days_history**: Dias de histórico (7-90)
+    - **days_forecast**: Dias para prever (1-30)
+    
+    Retorna 202 com o job_id. Uma submissão idêntica a um job em andamento
+    recebe o mesmo job (coalescido=true). Consulte GET /api/forecast/jobs/{job_id}.
+    """
+    try:
+        job = forecast_jobs.submit(device_id, metrica, days_history, days_forecast)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if "erro" in job:
+        status = 400 if metrica not in ForecastJobService.METRICS else 503
+        raise HTTPException(status_code=status, detail=job["erro"])
+    
+    return {
+        **job,
+        "url_status": f"/api/forecast/jobs/{job['job_id']}"
+    }
+
+@router.get("/jobs/{job_id}")
+async def get_forecast_job(job_id: str):
+    """
+    Consultar status e resultado de uma previsão submetida
+    
+    - **job_id**: ID retornado na submissão
+    
+    Status: pendente, executando, concluido (com "resultado") ou erro (com "erro")
+    """
+    job = forecast_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado ou expirado")
+    return job
+
+@router.post("/frota", status_code=202)
+async def start_fleet_forecast(
+    days_history: int = Query(30, ge=7, le=90),
+    days_forecast: int = Query(7, ge=1, le=30),
+    engine: str = Query("prophet", pattern="^(prophet|harmonico)$"),
+    workers: int = Query(FLEET_FORECAST_WORKERS, ge=1, le=64)
+):
+    """
+    Previsão em lote de todos os dispositivos
+    
+    - **days_history**: Dias de histórico (7-90)
+    - **days_forecast**: Dias para prever (1-30)
+    - **engine**: prophet ou harmonico
+    - **workers**: Processos usados nos treinos
+    
+    Roda em segundo plano (uma execução por vez) e grava as previsões na
+    coleção 'previsoes'; /temperatura e /umidade passam a servi-las enquanto
+    estiverem atualizadas. Acompanhe em GET /api/forecast/frota.
+    """
+    try:
+        return fleet_forecasts.start(
+            days_history=days_history,
+            days_forecast=days_forecast,
+            engine=engine,
+            workers=workers
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/frota")
+async def get_fleet_forecast_status():
+    """
+    Estado da última previsão em lote da frota
+    
+    Retorna status, dispositivos processados, previsões gravadas, falhas e duração
+    """
+    if fleet_forecasts.last_run is None:
+        raise HTTPException(status_code=404, detail="Nenhuma previsão em lote executada")
+    return fleet_forecasts.last_run
+
 @router.get("/padroes/{device_id}")
 async def analyze_patterns(
     device_id: str,
-    days: int = Query(30, ge=7, le=90)
+    days: int = Query(30, ge=7, le=90),
+    fuso: str = Query(BUCKET_TIMEZONE, description="Fuso horário das horas e dias")
 ):
     """
     Analisar padrões temporais (horário, semanal)
     
     - **device_id**: ID do dispositivo
     - **days**: Período de análise (7-90 dias)
+    - **fuso**: Fuso horário que define hora do dia e dia da semana (padrão America/Recife)
     
     Identifica:
     - Horários de pico e mínimo
     - Padrões por hora do dia
-    - Padrões por dia da semana
+    - Padrões por dia da semana (e grade dia × hora)
     """
     try:
-        result = await forecast_service.analyze_patterns(device_id, days)
+        result = await forecast_service.analyze_patterns(device_id, days, timezone=fuso)
         
         if "erro" in result:
             raise HTTPException(status_code=400, detail=result["erro"])
@@ -134,27 +239,34 @@ async def full_forecast_analysis(
     - **days_forecast**: Dias para prever
     """
     try:
-        # Executar múltiplas análises
-        temp_forecast = await forecast_service.forecast_temperature(
-            device_id,
-            days_history,
-            days_forecast
-        )
-        
-        humidity_forecast = await forecast_service.forecast_humidity(
-            device_id,
-            days_history,
-            days_forecast
-        )
+        # Buscar o histórico uma única vez e compartilhar entre as análises
+        loader = DeviceDatasetLoader(device_id)
+        await loader.preload(days_history * 24)
         
-        patterns = await forecast_service.analyze_patterns(
-            device_id,
-            days_history
-        )
-        
-        energy = await forecast_service.energy_analysis(
-            device_id,
-            days_history
+        # Executar múltiplas análises
+        temp_forecast, humidity_forecast, patterns, energy = await asyncio.gather(
+            forecast_service.forecast_temperature(
+                device_id,
+                days_history,
+                days_forecast,
+                loader=loader
+            ),
+            forecast_service.forecast_humidity(
+                device_id,
+                days_history,
+                days_forecast,
+                loader=loader
+            ),
+            forecast_service.analyze_patterns(
+                device_id,
+                days_history,
+                loader=loader
+            ),
+            forecast_service.energy_analysis(
+                device_id,
+                days_history,
+                loader=loader
+            )
         )
         
         return {
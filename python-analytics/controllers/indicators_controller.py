@@ -1,5 +1,7 @@
 from fastapi import APIRouter, HTTPException, Query
-from services.indicators_service import IndicatorsService
+from services.indicators_service import BATCH_INDICATORS, IndicatorsService
+from schemas.analytics_schemas import BatchRequest
+from utils.time_buckets import BUCKET_TIMEZONE
 
 
 router = APIRouter(prefix="/api/indicators", tags=["Indicators"])
@@ -9,18 +11,20 @@ indicators_service = IndicatorsService()
 @router.get("/amplitude-termica/{device_id}")
 async def get_thermal_amplitude(
     device_id: str,
-    days: int = Query(7, ge=1, le=30)
+    days: int = Query(7, ge=1, le=30),
+    fuso: str = Query(BUCKET_TIMEZONE, description="Fuso horário dos dias")
 ):
     """
     Amplitude Térmica Diária
     
     - **device_id**: ID do dispositivo
     - **days**: Número de dias (1-30)
+    - **fuso**: Fuso horário que define os dias (padrão America/Recife)
     
     Retorna máx-mín de cada dia para medir estabilidade
     """
     try:
-        result = await indicators_service.get_thermal_amplitude(device_id, days)
+        result = await indicators_service.get_thermal_amplitude(device_id, days, fuso)
         
         if "erro" in result:
             return {"success": False, **result}
@@ -55,15 +59,15 @@ async def get_humidity_rate(
 @router.get("/indice-fungos/{device_id}")
 async def get_fungus_risk_index(
     device_id: str,
-    days: int = Query(7, ge=1, le=30)
+    days: int = Query(7, ge=1, le=90)
 ):
     """
     Índice de Risco de Fungos (IRF)
     
     - **device_id**: ID do dispositivo
-    - **days**: Número de dias (1-30)
+    - **days**: Número de dias (1-90)
     
-    Função de T > 30°C e UR > 75%
+    Função de T > 30°C e UR > 75%; horas por nível ponderadas pelo tempo
     """
     try:
         result = await indicators_service.get_fungus_risk_index(device_id, days)
@@ -78,22 +82,62 @@ async def get_fungus_risk_index(
 @router.get("/tempo-critico/{device_id}")
 async def get_critical_time(
     device_id: str,
-    days: int = Query(7, ge=1, le=30)
+    days: int = Query(7, ge=1, le=90),
+    limite: float = Query(35.0, ge=-20, le=80, description="Limite de temperatura (°C)")
 ):
     """
     Horas Acima de Limite Crítico (TAC)
     
     - **device_id**: ID do dispositivo
-    - **days**: Número de dias (1-30)
+    - **days**: Número de dias (1-90)
+    - **limite**: Limite de temperatura em °C (padrão 35)
     
-    Tempo acumulado com T > 35°C
+    Tempo acumulado com T > limite e períodos contínuos mais longos
     """
     try:
-        result = await indicators_service.get_critical_time_above_limit(device_id, days)
+        result = await indicators_service.get_critical_time_above_limit(device_id, days, limite)
         
         if "erro" in result:
             return {"success": False, **result}
         
         return {"success": True, "data": result}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/lote/{indicador}")
+async def get_indicator_batch(
+    indicador: str,
+    request: BatchRequest = BatchRequest(),
+    days: int = Query(7, ge=1, le=90),
+    limite: float = Query(35.0, ge=-20, le=80, description="Limite de temperatura (°C), só tempo-critico")
+):
+    """
+    Indicador para vários dispositivos em uma única requisição
+    
+    - **indicador**: amplitude-termica, taxa-umidade, indice-fungos ou tempo-critico
+    - **dispositivos** (corpo): lista de IDs ou "all" (padrão)
+    - **days**: Número de dias (1-90)
+    - **limite**: Limite de temperatura do tempo-critico (padrão 35)
+    
+    Os dispositivos são calculados em paralelo, com concorrência limitada
+    (INDICATOR_BATCH_CONCURRENCY); "data" traz o resultado de cada
+    dispositivo (com "erro" quando não houver dados)
+    """
+    if indicador not in BATCH_INDICATORS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Indicador inválido. Use: {', '.join(BATCH_INDICATORS)}"
+        )
+    
+    try:
+        results = await indicators_service.get_batch(
+            indicador, request.device_ids(), days, limite
+        )
+        return {
+            "success": True,
+            "indicador": indicador,
+            "total_dispositivos": len(results),
+            "data": results
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
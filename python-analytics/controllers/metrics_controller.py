@@ -7,10 +7,15 @@ router = APIRouter(prefix="/api/metrics", tags=["Metrics"])
 metrics_service = MetricsService()
 
 @router.get("/global")
-async def get_global_metrics():
+async def get_global_metrics(
+    temp_limite: float = Query(35.0, description="Temperatura de alerta (°C)"),
+    umid_limite: float = Query(80.0, ge=0, le=100, description="Umidade de alerta (%)")
+):
     """
     Obter métricas globais de todos os silos
     
+    - **temp_limite** / **umid_limite**: Limites para contar um silo em alerta
+    
     Retorna:
     - Total de silos ativos
     - Silos em alerta
@@ -19,7 +24,7 @@ async def get_global_metrics():
     - Variações
     """
     try:
-        metrics = await metrics_service.get_global_metrics()
+        metrics = await metrics_service.get_global_metrics(temp_limite, umid_limite)
         return {
             "success": True,
             "data": metrics
@@ -33,16 +38,20 @@ async def get_global_metrics():
 @router.get("/dispositivo/{device_id}")
 async def get_device_metrics(
     device_id: str,
-    limit: int = Query(100, ge=10, le=1000, description="Número de leituras para análise")
+    limit: int = Query(100, ge=10, le=1000, description="Número de leituras para análise"),
+    temp_limite: float = Query(35.0, description="Temperatura de alerta (°C)"),
+    umid_limite: float = Query(80.0, ge=0, le=100, description="Umidade de alerta (%)")
 ):
     """
     Obter métricas de um dispositivo específico
     
     - **device_id**: ID do dispositivo
     - **limit**: Número de leituras para análise (10-1000)
+    - **temp_limite** / **umid_limite**: Limites de alerta; os episódios de alerta
+      são contados nas leituras analisadas, com duração ponderada pelo tempo
     """
     try:
-        metrics = await metrics_service.get_device_metrics(device_id, limit)
+        metrics = await metrics_service.get_device_metrics(device_id, limit, temp_limite, umid_limite)
         
         if not metrics:
             raise HTTPException(
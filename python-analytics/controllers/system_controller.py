@@ -0,0 +1,142 @@
+from fastapi import APIRouter, HTTPException
+from repositories.series_cache import series_cache
+from repositories.live_buffer import live_buffers
+from repositories.online_stats import online_stats
+from repositories.profile_store import profile_store
+from repositories.rollup_repository import RollupRepository
+from config.compute_executor import ComputeExecutor
+from repositories.forecast_model_store import model_store
+from services.forecast_job_service import forecast_jobs
+
+
+router = APIRouter(prefix="/api/system", tags=["System"])
+
+@router.get("/cache")
+async def get_cache_stats():
+    """
+    Contadores do cache de séries por dispositivo
+
+    Retorna acertos, falhas, despejos, bytes em uso e documentos buscados
+    """
+    try:
+        return {
+            "success": True,
+            "data": series_cache.stats()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/buffers")
+async def get_live_buffer_stats():
+    """
+    Estado dos buffers alimentados pelo change stream
+
+    Retorna se o stream está saudável, dispositivos em buffer e consultas atendidas
+    """
+    try:
+        return {
+            "success": True,
+            "data": live_buffers.stats()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/estatisticas-online")
+async def get_online_stats():
+    """
+    Estado dos acumuladores online por dispositivo
+
+    Retorna dispositivos carregados (e o limite), bytes em uso, cargas
+    iniciais, atualizações incrementais, despejos e eventos recebidos pelo
+    change stream
+    """
+    try:
+        return {
+            "success": True,
+            "data": online_stats.stats()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/agregados")
+async def get_rollup_status():
+    """
+    Estado dos agregados horários/diários
+
+    Retorna a marca d'água (até onde as leituras inseridas já foram
+    agregadas), a última atualização e a defasagem em segundos
+    """
+    try:
+        return {
+            "success": True,
+            "data": await RollupRepository().status()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/perfis")
+async def get_profile_stats():
+    """
+    Estado dos perfis hora do dia × dia da semana por dispositivo
+
+    Retorna perfis carregados, bytes em uso, cargas iniciais,
+    atualizações incrementais e eventos recebidos pelo change stream
+    """
+    try:
+        return {
+            "success": True,
+            "data": profile_store.stats()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/executor")
+async def get_executor_stats():
+    """
+    Métricas do executor de processamento pesado
+
+    Retorna modo, workers, tarefas na fila/em andamento e tempos de execução
+    """
+    try:
+        return {
+            "success": True,
+            "data": ComputeExecutor.stats()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/modelos")
+async def get_model_store_stats():
+    """
+    Estado do armazenamento de modelos de previsão
+
+    Retorna modelos conhecidos, treinos realizados e previsões atendidas por modelo salvo
+    """
+    try:
+        return {
+            "success": True,
+            "data": {
+                **model_store.stats(),
+                "modelos": [
+                    {"dispositivo": device_id, "metrica": metric, "dias_historico": days}
+                    for device_id, metric, days in model_store.keys()
+                ]
+            }
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/jobs")
+async def get_forecast_job_stats():
+    """
+    Fila de previsões assíncronas
+
+    Retorna jobs por status e quantas submissões foram coalescidas
+    """
+    try:
+        return {
+            "success": True,
+            "data": forecast_jobs.stats()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,41 @@
+"""
+Previsão em lote de toda a frota (para agendamento noturno, ex.: cron)
+
+Uso (a partir de python-analytics/):
+
+    python fleet_forecast.py
+    python fleet_forecast.py --days-history 30 --days-forecast 7 --engine prophet --workers 8
+
+Grava as previsões na coleção 'previsoes', de onde /api/forecast/temperatura
+e /umidade passam a servi-las.
+"""
+import argparse
+import asyncio
+import json
+from config.database import Database
+from repositories.forecast_repository import ForecastRepository
+from services.fleet_forecast_service import FLEET_FORECAST_WORKERS, FleetForecastService
+
+
+async def main(args: argparse.Namespace) -> None:
+    await Database.connect_db()
+    try:
+        await ForecastRepository().ensure_indexes()
+        result = await FleetForecastService().run(
+            days_history=args.days_history,
+            days_forecast=args.days_forecast,
+            engine=args.engine,
+            workers=args.workers
+        )
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    finally:
+        await Database.close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Previsão em lote de todos os dispositivos")
+    parser.add_argument("--days-history", type=int, default=30)
+    parser.add_argument("--days-forecast", type=int, default=7)
+    parser.add_argument("--engine", choices=["prophet", "harmonico"], default="prophet")
+    parser.add_argument("--workers", type=int, default=FLEET_FORECAST_WORKERS)
+    asyncio.run(main(parser.parse_args()))
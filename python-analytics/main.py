@@ -2,29 +2,63 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from config.database import Database
+from config.compute_executor import ComputeExecutor
+from repositories.sensor_repository import SensorRepository
+from repositories.rollup_repository import RollupRepository
+from repositories.forecast_repository import ForecastRepository
+from repositories.live_buffer import live_buffers
+from services.forecast_service import ForecastService
 from controllers.analytics_controller import router as analytics_router
 from clients.openmeteo_client import OpenMeteoClient
+import asyncio
 import os
 
 # Instância global do cliente weather
 weather_client = None
 
+# Tarefa de atualização dos agregados horários/diários
+rollup_task = None
+
+# Tarefa de retreino agendado dos modelos de previsão
+refit_task = None
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Gerenciar lifecycle da aplicação"""
     # Startup
     print("🚀 Iniciando API Python Analytics...")
     await Database.connect_db()
+    await SensorRepository().ensure_indexes()
+    await ForecastRepository().ensure_indexes()
     
-    global weather_client
+    # Pool para o processamento pesado (COMPUTE_EXECUTOR_MODE / COMPUTE_WORKERS)
+    ComputeExecutor.start()
+    
+    global weather_client, rollup_task, refit_task
     weather_client = OpenMeteoClient()
     
+    rollups = RollupRepository()
+    await rollups.ensure_indexes()
+    rollup_task = asyncio.create_task(rollups.run_periodic_refresh())
+    
+    # Buffers em memória alimentados pelo change stream (LIVE_BUFFER_ENABLED)
+    live_buffers.start()
+    
+    # Retreino dos modelos Prophet salvos que expiraram ou receberam leituras novas
+    refit_task = asyncio.create_task(ForecastService().run_periodic_refit())
+    
     print("✅ API pronta para receber requisições")
     
     yield
     
     # Shutdown
     print("🔌 Encerrando conexões...")
+    if rollup_task:
+        rollup_task.cancel()
+    if refit_task:
+        refit_task.cancel()
+    await live_buffers.stop()
+    ComputeExecutor.shutdown()
     await Database.close_db()
     if weather_client:
         await weather_client.close()
@@ -58,6 +92,10 @@ app.include_router(metrics_router)
 from controllers.indicators_controller import router as indicators_router
 app.include_router(indicators_router)
 
+# Importar rota de sistema (cache e execução)
+from controllers.system_controller import router as system_router
+app.include_router(system_router)
+
 # Importar e incluir rota de forecast (opcional se Prophet instalado)
 try:
     from controllers.forecast_controller import router as forecast_router
@@ -0,0 +1,153 @@
+from __future__ import annotations
+from typing import Dict, Iterable, Optional, Sequence
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# Campos projetados nas consultas colunares (sem _id e sem dispositivo)
+SERIES_PROJECTION = {"_id": 0, "timestamp": 1, "temperatura": 1, "umidade": 1}
+
+
+def _float_or_nan(value) -> float:
+    """Converter valor do documento para float (None/ausente vira NaN)"""
+    return np.nan if value is None else value
+
+
+class SensorSeries:
+    """
+    Série temporal colunar de um dispositivo
+
+    Mantém as leituras em arrays NumPy contíguos, ordenados por timestamp:
+    - timestamps: datetime64[ns]
+    - temperatura: float64
+    - umidade: float64
+    """
+
+    __slots__ = ("timestamps", "temperatura", "umidade")
+
+    def __init__(
+        self,
+        timestamps: np.ndarray,
+        temperatura: np.ndarray,
+        umidade: np.ndarray
+    ):
+        self.timestamps = timestamps
+        self.temperatura = temperatura
+        self.umidade = umidade
+
+    @classmethod
+    def empty(cls) -> SensorSeries:
+        """Série sem leituras"""
+        return cls(
+            np.empty(0, dtype="datetime64[ns]"),
+            np.empty(0, dtype=np.float64),
+            np.empty(0, dtype=np.float64)
+        )
+
+    @classmethod
+    def from_documents(cls, docs: Sequence[Dict]) -> SensorSeries:
+        """Decodificar um lote de documentos projetados em arrays"""
+        count = len(docs)
+        if count == 0:
+            return cls.empty()
+
+        timestamps = np.array([doc["timestamp"] for doc in docs], dtype="datetime64[ns]")
+        temperatura = np.fromiter(
+            (_float_or_nan(doc.get("temperatura")) for doc in docs),
+            dtype=np.float64,
+            count=count
+        )
+        umidade = np.fromiter(
+            (_float_or_nan(doc.get("umidade")) for doc in docs),
+            dtype=np.float64,
+            count=count
+        )
+        return cls(timestamps, temperatura, umidade)
+
+    @classmethod
+    def concat(cls, chunks: Iterable[SensorSeries]) -> SensorSeries:
+        """Concatenar lotes consecutivos em uma única série"""
+        chunks = [chunk for chunk in chunks if len(chunk)]
+        if not chunks:
+            return cls.empty()
+        if len(chunks) == 1:
+            return chunks[0]
+
+        return cls(
+            np.concatenate([c.timestamps for c in chunks]),
+            np.concatenate([c.temperatura for c in chunks]),
+            np.concatenate([c.umidade for c in chunks])
+        )
+
+    def between(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> SensorSeries:
+        """Fatia [start, end] da série como views dos arrays (sem cópia)"""
+        lo = 0
+        hi = len(self)
+        if start is not None:
+            lo = int(np.searchsorted(self.timestamps, np.datetime64(start, "ns"), side="left"))
+        if end is not None:
+            hi = int(np.searchsorted(self.timestamps, np.datetime64(end, "ns"), side="right"))
+
+        return SensorSeries(
+            self.timestamps[lo:hi],
+            self.temperatura[lo:hi],
+            self.umidade[lo:hi]
+        )
+
+    def resample(self, bin_minutes: int) -> SensorSeries:
+        """
+        Médias por intervalo de `bin_minutes`, como
+        SensorRepository.get_resampled_series faz no MongoDB
+
+        Intervalos alinhados como o $dateTrunc (a partir de 2000-01-01),
+        cada um no instante médio das suas leituras (ms); médias ignoram
+        NaN e intervalos sem leituras não aparecem.
+        """
+        if not len(self):
+            return self
+
+        ms = self.timestamps.astype("datetime64[ms]").astype(np.int64)
+        origin = np.datetime64("2000-01-01", "ms").astype(np.int64)
+        bins = (ms - origin) // (bin_minutes * 60_000)
+        starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+        counts = np.diff(np.r_[starts, len(ms)])
+
+        def mean(values: np.ndarray) -> np.ndarray:
+            valid = ~np.isnan(values)
+            n = np.add.reduceat(valid.astype(np.int64), starts)
+            sums = np.add.reduceat(np.where(valid, values, 0.0), starts)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return np.where(n > 0, sums / n, np.nan)
+
+        instants = np.add.reduceat(ms.astype(np.float64), starts) / counts
+        return SensorSeries(
+            instants.astype(np.int64).astype("datetime64[ms]").astype("datetime64[ns]"),
+            mean(self.temperatura),
+            mean(self.umidade)
+        )
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def nbytes(self) -> int:
+        """Memória ocupada pelos arrays"""
+        return self.timestamps.nbytes + self.temperatura.nbytes + self.umidade.nbytes
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """DataFrame com as colunas timestamp, temperatura e umidade (sem cópia)"""
+        if not len(self):
+            return pd.DataFrame()
+
+        return pd.DataFrame(
+            {
+                "timestamp": self.timestamps,
+                "temperatura": self.temperatura,
+                "umidade": self.umidade
+            },
+            copy=False
+        )
@@ -0,0 +1,246 @@
+"""
+Armazenamento em disco dos modelos Prophet treinados
+
+Cada modelo é identificado por (dispositivo, métrica, dias de histórico) e
+gravado em MODEL_STORE_DIR como JSON (prophet.serialize), acompanhado de um
+arquivo .meta.json com a data do treino, o número de leituras usadas e o
+timestamp da última leitura do treino. As requisições apenas executam
+predict sobre o modelo salvo; o retreino acontece quando o modelo passa de
+FORECAST_MODEL_MAX_AGE_HOURS ou quando chegam FORECAST_REFIT_NEW_READINGS
+leituras novas desde o treino.
+
+As gravações usam arquivos temporários de nome único seguidos de
+os.replace. A previsão da frota treina cada modelo em um arquivo de staging
+e só troca o modelo salvo (modelo e metadados juntos) com o lock do modelo.
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
+import asyncio
+import json
+import os
+import re
+import tempfile
+import threading
+import uuid
+
+MODEL_STORE_DIR = os.getenv(
+    "MODEL_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model_store")
+)
+FORECAST_MODEL_MAX_AGE_HOURS = float(os.getenv("FORECAST_MODEL_MAX_AGE_HOURS", 24))
+FORECAST_REFIT_NEW_READINGS = int(os.getenv("FORECAST_REFIT_NEW_READINGS", 500))
+FORECAST_REFIT_INTERVAL_SECONDS = int(os.getenv("FORECAST_REFIT_INTERVAL_SECONDS", 3600))
+# Modelos desserializados mantidos em memória por processo
+FORECAST_LOADED_MODELS_MAX = int(os.getenv("FORECAST_LOADED_MODELS_MAX", 32))
+# Metadados e locks de modelos mantidos em memória (os demais são relidos do disco)
+FORECAST_MODEL_ENTRIES_MAX = int(os.getenv("FORECAST_MODEL_ENTRIES_MAX", 1000))
+
+ModelKey = Tuple[str, str, int]
+
+# Modelos já desserializados neste processo, por caminho (invalidados pelo
+# mtime), em ordem LRU. load_model roda nas threads do ComputeExecutor:
+# o acesso ao cache passa por _loaded_models_lock
+_loaded_models: OrderedDict[str, Tuple[float, object]] = OrderedDict()
+_loaded_models_lock = threading.Lock()
+
+
+def _write_atomic(path: str, content: str) -> None:
+    # Nome temporário único: processos e workers podem gravar o mesmo caminho
+    with tempfile.NamedTemporaryFile(
+        "w",
+        encoding="utf-8",
+        dir=os.path.dirname(path),
+        prefix=f"{os.path.basename(path)}.",
+        suffix=".tmp",
+        delete=False
+    ) as f:
+        f.write(content)
+    try:
+        os.replace(f.name, path)
+    except BaseException:
+        os.remove(f.name)
+        raise
+
+
+def save_model(model, path: str) -> None:
+    """Serializar o modelo treinado (chamado no worker do ComputeExecutor)"""
+    from prophet.serialize import model_to_json
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _write_atomic(path, model_to_json(model))
+
+
+def load_model(path: str):
+    """Carregar o modelo salvo, reaproveitando o já desserializado se não mudou"""
+    from prophet.serialize import model_from_json
+
+    mtime = os.path.getmtime(path)
+    with _loaded_models_lock:
+        cached = _loaded_models.get(path)
+        if cached is not None and cached[0] == mtime:
+            _loaded_models.move_to_end(path)
+            return cached[1]
+
+    # Desserializar fora do lock (duas threads podem carregar o mesmo modelo)
+    with open(path, "r", encoding="utf-8") as f:
+        model = model_from_json(f.read())
+    with _loaded_models_lock:
+        _loaded_models[path] = (mtime, model)
+        _loaded_models.move_to_end(path)
+        while len(_loaded_models) > max(FORECAST_LOADED_MODELS_MAX, 1):
+            _loaded_models.popitem(last=False)
+    return model
+
+
+class ForecastModelStore:
+    """
+    Metadados e caminhos dos modelos Prophet salvos em disco
+
+    Metadados e locks ficam em memória em ordem LRU, limitados a
+    max_entries modelos: metadados despejados são relidos do disco e locks
+    só são descartados quando livres.
+    """
+
+    def __init__(
+        self,
+        directory: str = MODEL_STORE_DIR,
+        max_age_hours: float = FORECAST_MODEL_MAX_AGE_HOURS,
+        refit_new_readings: int = FORECAST_REFIT_NEW_READINGS,
+        max_entries: int = FORECAST_MODEL_ENTRIES_MAX
+    ):
+        self.directory = directory
+        self.max_age_hours = max_age_hours
+        self.refit_new_readings = refit_new_readings
+        self.max_entries = max(max_entries, 1)
+        self._meta: OrderedDict[ModelKey, Dict] = OrderedDict()
+        self._locks: OrderedDict[ModelKey, asyncio.Lock] = OrderedDict()
+        self.fits = 0
+        self.reuses = 0
+
+    def _basename(self, key: ModelKey) -> str:
+        device_id, metric, days_history = key
+        safe_device = re.sub(r"[^A-Za-z0-9_.-]", "_", device_id)
+        return os.path.join(self.directory, f"{safe_device}__{metric}__{days_history}d")
+
+    def model_path(self, key: ModelKey) -> str:
+        return f"{self._basename(key)}.json"
+
+    def staging_path(self, key: ModelKey) -> str:
+        """Caminho único para treinar fora do lock (instalado depois com install_model)"""
+        return f"{self._basename(key)}.{os.getpid()}.{uuid.uuid4().hex}.staging"
+
+    def lock(self, key: ModelKey) -> asyncio.Lock:
+        """Lock por modelo, para que requisições simultâneas não treinem em dobro"""
+        if key not in self._locks:
+            self._locks[key] = asyncio.Lock()
+            if len(self._locks) > self.max_entries:
+                # Descartar os locks livres mais antigos (um lock em uso nunca sai)
+                idle = [k for k, l in self._locks.items() if not l.locked() and k != key]
+                for old in idle[:len(self._locks) - self.max_entries]:
+                    del self._locks[old]
+        self._locks.move_to_end(key)
+        return self._locks[key]
+
+    def _remember_meta(self, key: ModelKey, meta: Dict) -> None:
+        self._meta[key] = meta
+        self._meta.move_to_end(key)
+        while len(self._meta) > self.max_entries:
+            self._meta.popitem(last=False)
+
+    def get_meta(self, key: ModelKey) -> Optional[Dict]:
+        """Metadados do modelo salvo (None se ainda não treinado)"""
+        if key in self._meta:
+            self._meta.move_to_end(key)
+            return self._meta[key]
+
+        meta_path = f"{self._basename(key)}.meta.json"
+        if not (os.path.exists(meta_path) and os.path.exists(self.model_path(key))):
+            return None
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        meta = {
+            **raw,
+            "treinado_em": datetime.fromisoformat(raw["treinado_em"]),
+            "ultima_leitura": datetime.fromisoformat(raw["ultima_leitura"])
+        }
+        self._remember_meta(key, meta)
+        return meta
+
+    def save_meta(self, key: ModelKey, meta: Dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        _write_atomic(
+            f"{self._basename(key)}.meta.json",
+            json.dumps({
+                **meta,
+                "dispositivo": key[0],
+                "metrica": key[1],
+                "dias_historico": key[2],
+                "treinado_em": meta["treinado_em"].isoformat(),
+                "ultima_leitura": meta["ultima_leitura"].isoformat()
+            })
+        )
+        self._remember_meta(key, meta)
+
+    def install_model(self, key: ModelKey, staging_path: str, meta: Dict) -> bool:
+        """
+        Trocar o modelo salvo por um treinado em staging_path (chamar com lock(key))
+
+        Se o modelo atual foi treinado depois deste, o novo é descartado.
+        Retorna se o modelo foi instalado.
+        """
+        current = self.get_meta(key)
+        if current is not None and current["treinado_em"] > meta["treinado_em"]:
+            self.discard_staging(staging_path)
+            return False
+        os.replace(staging_path, self.model_path(key))
+        self.save_meta(key, meta)
+        return True
+
+    @staticmethod
+    def discard_staging(staging_path: str) -> None:
+        try:
+            os.remove(staging_path)
+        except FileNotFoundError:
+            pass
+
+    def keys(self) -> List[ModelKey]:
+        """Modelos conhecidos (em memória ou com metadados em disco)"""
+        keys = set(self._meta)
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if not name.endswith(".meta.json"):
+                    continue
+                try:
+                    with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+                        raw = json.load(f)
+                    keys.add((raw["dispositivo"], raw["metrica"], int(raw["dias_historico"])))
+                except (OSError, ValueError, KeyError):
+                    continue
+        return sorted(keys)
+
+    def age_hours(self, meta: Dict) -> float:
+        return (datetime.now() - meta["treinado_em"]).total_seconds() / 3600
+
+    def is_expired(self, meta: Dict) -> bool:
+        return self.age_hours(meta) >= self.max_age_hours
+
+    def stats(self) -> Dict:
+        return {
+            "diretorio": self.directory,
+            "modelos_em_memoria": len(self._meta),
+            "max_modelos_em_memoria": self.max_entries,
+            # Deste processo (workers do ComputeExecutor têm o próprio cache)
+            "modelos_desserializados": len(_loaded_models),
+            "max_modelos_desserializados": FORECAST_LOADED_MODELS_MAX,
+            "idade_maxima_horas": self.max_age_hours,
+            "leituras_novas_para_retreino": self.refit_new_readings,
+            "treinos": self.fits,
+            "reutilizacoes": self.reuses
+        }
+
+
+# Instância compartilhada por todo o processo
+model_store = ForecastModelStore()
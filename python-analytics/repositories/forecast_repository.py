@@ -0,0 +1,68 @@
+from __future__ import annotations
+from typing import Dict, List, Optional, TYPE_CHECKING
+from pymongo import ReplaceOne
+from config.database import Database
+
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorCollection
+
+# Coleção com as previsões geradas pela execução em lote da frota
+FORECASTS_COLLECTION = "previsoes"
+
+
+class ForecastRepository:
+    """
+    Previsões pré-calculadas por dispositivo
+
+    Um documento por (dispositivo, metrica, motor, dias_historico), substituído
+    a cada execução em lote, com a lista de previsões horárias e os dados do
+    modelo usado.
+    """
+
+    @property
+    def collection(self) -> AsyncIOMotorCollection:
+        return Database.get_collection(FORECASTS_COLLECTION)
+
+    async def ensure_indexes(self) -> None:
+        await self.collection.create_index(
+            [("dispositivo", 1), ("metrica", 1), ("motor", 1), ("dias_historico", 1)],
+            unique=True
+        )
+
+    async def save_many(self, forecasts: List[Dict]) -> int:
+        """Gravar (substituindo) as previsões de uma execução em lote"""
+        if not forecasts:
+            return 0
+
+        operations = [
+            ReplaceOne(
+                {
+                    "dispositivo": f["dispositivo"],
+                    "metrica": f["metrica"],
+                    "motor": f["motor"],
+                    "dias_historico": f["dias_historico"]
+                },
+                f,
+                upsert=True
+            )
+            for f in forecasts
+        ]
+        result = await self.collection.bulk_write(operations, ordered=False)
+        return result.upserted_count + result.modified_count
+
+    async def get(
+        self,
+        device_id: str,
+        metric: str,
+        engine: str,
+        days_history: int
+    ) -> Optional[Dict]:
+        return await self.collection.find_one(
+            {
+                "dispositivo": device_id,
+                "metrica": metric,
+                "motor": engine,
+                "dias_historico": days_history
+            },
+            {"_id": 0}
+        )
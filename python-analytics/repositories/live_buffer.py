@@ -0,0 +1,307 @@
+"""
+Buffers em memória alimentados por change stream da coleção 'dados'
+
+Com LIVE_BUFFER_ENABLED=true, uma tarefa iniciada no lifespan observa as
+inserções em 'dados' e anexa cada leitura a um ring buffer por dispositivo.
+Consultas get_last_hours cuja janela esteja inteiramente coberta pelo buffer
+são respondidas da memória, sem ida ao MongoDB.
+
+Change streams exigem replica set. Para testar localmente:
+
+    mongod --replSet rs0 --dbpath /tmp/rs0 --port 27017
+    mongosh --eval 'rs.initiate()'
+    MONGODB_URI="mongodb://localhost:27017/?replicaSet=rs0" LIVE_BUFFER_ENABLED=true python main.py
+
+Na primeira consulta de cada dispositivo, o buffer é preenchido com as
+leituras das últimas LIVE_BUFFER_HOURS horas do banco (backfill), então as
+janelas passam a ser servidas da memória sem esperar o stream acumular a
+janela inteira. O backfill não é repassado aos consumidores do stream.
+
+Se o stream cair, os buffers deixam de ser usados (as consultas voltam ao
+banco) até a reconexão; se não for possível retomar do último resume token,
+os buffers são descartados e a cobertura recomeça do zero.
+
+Verificação em um replica set: benchmarks/live_buffer_replica.py.
+"""
+from __future__ import annotations
+from typing import Callable, Dict, List, Optional, Set, TYPE_CHECKING
+from datetime import datetime, timedelta
+import asyncio
+import os
+import numpy as np
+from pymongo.errors import OperationFailure
+from config.database import Database
+from models.sensor_series import SensorSeries
+
+if TYPE_CHECKING:
+    from repositories.sensor_repository import SensorRepository
+
+LIVE_BUFFER_ENABLED = os.getenv("LIVE_BUFFER_ENABLED", "false").lower() == "true"
+LIVE_BUFFER_HOURS = int(os.getenv("LIVE_BUFFER_HOURS", 24))
+# Capacidade por dispositivo (padrão: 1 leitura a cada 30s durante a janela)
+LIVE_BUFFER_CAPACITY = int(os.getenv("LIVE_BUFFER_CAPACITY", LIVE_BUFFER_HOURS * 120))
+
+# Espera entre tentativas de reconexão (segundos)
+RECONNECT_DELAYS = (1, 2, 5, 10, 30)
+
+
+class DeviceRingBuffer:
+    """Ring buffer de tamanho fixo com as leituras mais recentes de um dispositivo"""
+
+    __slots__ = ("timestamps", "temperatura", "umidade", "next", "size", "covered_since", "ordered")
+
+    def __init__(self, capacity: int, covered_since: datetime):
+        self.timestamps = np.empty(capacity, dtype="datetime64[ns]")
+        self.temperatura = np.empty(capacity, dtype=np.float64)
+        self.umidade = np.empty(capacity, dtype=np.float64)
+        self.next = 0
+        self.size = 0
+        # A partir de quando o buffer contém todas as leituras do dispositivo
+        self.covered_since = np.datetime64(covered_since, "ns")
+        self.ordered = True
+
+    @classmethod
+    def from_series(cls, capacity: int, covered_since: datetime, series: SensorSeries) -> DeviceRingBuffer:
+        """Buffer preenchido com uma série ordenada (mantém as `capacity` leituras mais novas)"""
+        buffer = cls(capacity, covered_since)
+        n = len(series)
+        if n > capacity:
+            buffer.covered_since = max(
+                buffer.covered_since, series.timestamps[n - capacity - 1] + np.timedelta64(1, "ns")
+            )
+            n = capacity
+        buffer.timestamps[:n] = series.timestamps[len(series) - n:]
+        buffer.temperatura[:n] = series.temperatura[len(series) - n:]
+        buffer.umidade[:n] = series.umidade[len(series) - n:]
+        buffer.next = n % capacity
+        buffer.size = n
+        return buffer
+
+    def append(self, timestamp: datetime, temperatura, umidade) -> None:
+        capacity = len(self.timestamps)
+        ts = np.datetime64(timestamp, "ns")
+
+        if self.size == capacity:
+            # Sobrescrevendo a leitura mais antiga: a cobertura passa a começar
+            # logo depois dela
+            self.covered_since = max(self.covered_since, self.timestamps[self.next] + np.timedelta64(1, "ns"))
+        if self.size and ts < self.timestamps[self.next - 1]:
+            self.ordered = False
+
+        self.timestamps[self.next] = ts
+        self.temperatura[self.next] = np.nan if temperatura is None else temperatura
+        self.umidade[self.next] = np.nan if umidade is None else umidade
+        self.next = (self.next + 1) % capacity
+        self.size = min(self.size + 1, capacity)
+
+    def snapshot(self, start: np.datetime64) -> SensorSeries:
+        """Cópia ordenada das leituras com timestamp >= start"""
+        capacity = len(self.timestamps)
+        order = (np.arange(self.size) + (self.next - self.size)) % capacity
+        timestamps = self.timestamps[order]
+        temperatura = self.temperatura[order]
+        umidade = self.umidade[order]
+
+        if not self.ordered:
+            idx = np.argsort(timestamps, kind="stable")
+            timestamps, temperatura, umidade = timestamps[idx], temperatura[idx], umidade[idx]
+
+        lo = int(np.searchsorted(timestamps, start, side="left"))
+        return SensorSeries(timestamps[lo:], temperatura[lo:], umidade[lo:])
+
+    @property
+    def nbytes(self) -> int:
+        return self.timestamps.nbytes + self.temperatura.nbytes + self.umidade.nbytes
+
+
+class LiveBufferManager:
+    """Mantém os ring buffers por dispositivo a partir do change stream"""
+
+    def __init__(
+        self,
+        enabled: bool = LIVE_BUFFER_ENABLED,
+        horizon_hours: int = LIVE_BUFFER_HOURS,
+        capacity: int = LIVE_BUFFER_CAPACITY
+    ):
+        self.enabled = enabled
+        self.horizon_hours = horizon_hours
+        self.capacity = capacity
+        self.buffers: Dict[str, DeviceRingBuffer] = {}
+        self.healthy = False
+        self.stream_started_at: Optional[datetime] = None
+        self.resume_token = None
+        self.events = 0
+        self.reconnections = 0
+        self.served = 0
+        self.backfills = 0
+        self.last_error: Optional[str] = None
+        # Dispositivos já preenchidos desde o início do stream atual
+        self._backfilled: Set[str] = set()
+        self._backfill_locks: Dict[str, asyncio.Lock] = {}
+        # Outros consumidores das inserções (ex.: estatísticas online)
+        self.listeners: List[Callable[[Dict], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def subscribe(self, listener: Callable[[Dict], None]) -> None:
+        """Registrar um consumidor chamado a cada leitura inserida"""
+        self.listeners.append(listener)
+
+    def start(self) -> None:
+        """Iniciar a tarefa de observação (no lifespan da aplicação)"""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._watch_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.healthy = False
+
+    async def _watch_loop(self) -> None:
+        attempt = 0
+        while True:
+            try:
+                await self._watch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"⚠️ Change stream de 'dados' interrompido: {e}")
+            # Stream encerrado: consultas voltam ao banco até reconectar
+            if self.healthy:
+                attempt = 0
+            self.healthy = False
+            self.reconnections += 1
+            await asyncio.sleep(RECONNECT_DELAYS[min(attempt, len(RECONNECT_DELAYS) - 1)])
+            attempt += 1
+
+    async def _watch(self) -> None:
+        collection = Database.get_collection("dados")
+        pipeline = [{"$match": {"operationType": "insert"}}]
+
+        try:
+            async with collection.watch(pipeline, resume_after=self.resume_token) as stream:
+                await self._consume(stream)
+        except OperationFailure:
+            if self.resume_token is None:
+                raise
+            # Não foi possível retomar (histórico perdido): descartar os buffers
+            self.resume_token = None
+            async with collection.watch(pipeline) as stream:
+                await self._consume(stream)
+
+    async def _consume(self, stream) -> None:
+        if self.resume_token is None:
+            # Stream novo: a cobertura começa agora
+            self.buffers.clear()
+            self._backfilled.clear()
+            self.stream_started_at = datetime.now()
+        self.healthy = True
+        print("✅ Change stream de 'dados' ativo")
+
+        async for change in stream:
+            self._apply(change["fullDocument"])
+            self.resume_token = stream.resume_token
+
+    def _apply(self, doc: Dict) -> None:
+        device_id = doc.get("dispositivo")
+        timestamp = doc.get("timestamp")
+        if device_id is None or timestamp is None:
+            return
+
+        buffer = self.buffers.get(device_id)
+        if buffer is None:
+            # Dispositivo sem buffer: cobertura começa no início do stream
+            buffer = DeviceRingBuffer(self.capacity, self.stream_started_at)
+            self.buffers[device_id] = buffer
+        buffer.append(timestamp, doc.get("temperatura"), doc.get("umidade"))
+        self.events += 1
+        for listener in self.listeners:
+            listener(doc)
+
+    def get_last_hours(self, device_id: str, hours: int) -> Optional[SensorSeries]:
+        """
+        Leituras das últimas `hours` horas, se cobertas pelo buffer
+
+        Retorna None quando a consulta deve ir ao banco: buffers desativados,
+        stream fora do ar ou janela maior que a cobertura disponível.
+        """
+        if not self.healthy or hours > self.horizon_hours:
+            return None
+
+        start = np.datetime64(datetime.now() - timedelta(hours=hours), "ns")
+        buffer = self.buffers.get(device_id)
+        if buffer is None:
+            # Sem leituras desde o início do stream: só é vazio se o stream
+            # já cobre a janela inteira
+            if self.stream_started_at and np.datetime64(self.stream_started_at, "ns") <= start:
+                self.served += 1
+                return SensorSeries.empty()
+            return None
+
+        if buffer.covered_since > start:
+            return None
+
+        self.served += 1
+        return buffer.snapshot(start)
+
+    async def backfill(self, repository: SensorRepository, device_id: str) -> bool:
+        """
+        Preencher o buffer do dispositivo com as últimas horas do banco
+
+        Feito uma vez por dispositivo a cada stream novo. As leituras do banco
+        anteriores à primeira recebida pelo stream são colocadas antes
+        das do buffer (as demais já chegaram pelo stream). Retorna False se
+        nada foi feito: stream fora do ar, dispositivo já preenchido ou stream
+        reiniciado durante a busca.
+        """
+        if not self.healthy or device_id in self._backfilled:
+            return False
+
+        lock = self._backfill_locks.setdefault(device_id, asyncio.Lock())
+        async with lock:
+            if not self.healthy or device_id in self._backfilled:
+                return False
+            start = datetime.now() - timedelta(hours=self.horizon_hours)
+            stream_started_at = self.stream_started_at
+            series = await repository.get_series(device_id, start)
+
+            # Um stream novo descartou os buffers enquanto o banco respondia
+            if not self.healthy or self.stream_started_at != stream_started_at:
+                return False
+
+            buffer = self.buffers.get(device_id)
+            if buffer is not None and buffer.size:
+                streamed = buffer.snapshot(np.datetime64(start, "ns"))
+                series = SensorSeries.concat([
+                    series.between(end=streamed.timestamps[0] - np.timedelta64(1, "ns")),
+                    streamed
+                ])
+            self.buffers[device_id] = DeviceRingBuffer.from_series(self.capacity, start, series)
+            self._backfilled.add(device_id)
+            self.backfills += 1
+            return True
+
+    def stats(self) -> Dict:
+        return {
+            "ativo": self.enabled,
+            "stream_saudavel": self.healthy,
+            "stream_iniciado_em": self.stream_started_at.isoformat() if self.stream_started_at else None,
+            "janela_horas": self.horizon_hours,
+            "capacidade_por_dispositivo": self.capacity,
+            "dispositivos": len(self.buffers),
+            "bytes": sum(b.nbytes for b in self.buffers.values()),
+            "eventos": self.events,
+            "consultas_atendidas": self.served,
+            "backfills": self.backfills,
+            "reconexoes": self.reconnections,
+            "ultimo_erro": self.last_error
+        }
+
+
+# Instância compartilhada (iniciada pelo lifespan em main.py)
+live_buffers = LiveBufferManager()
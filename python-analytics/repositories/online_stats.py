@@ -0,0 +1,299 @@
+"""
+Estatísticas online por dispositivo em buckets de tempo
+
+Para cada dispositivo, um ring de buckets de ONLINE_STATS_BUCKET_MINUTES
+minutos guarda contagem, média, M2 (Welford), mínimo e máximo de
+temperatura e umidade, cobrindo as últimas ONLINE_STATS_HOURS horas. As
+leituras novas atualizam os buckets à medida que chegam: pelo change stream
+(quando o live buffer está ativo e saudável) ou, caso contrário, buscando no
+banco apenas as leituras posteriores à última já incorporada. Uma janela
+qualquer dentro do horizonte é respondida combinando os buckets (fórmula de
+Chan et al.), sem reler as leituras brutas.
+
+A janela é alinhada aos buckets: o primeiro bucket pode incluir leituras de
+até ONLINE_STATS_BUCKET_MINUTES antes do início pedido. Leituras inseridas
+com timestamp anterior à última já incorporada não são vistas até a
+entrada ser recarregada (como no cache de séries).
+
+Cada dispositivo ocupa um ring de tamanho fixo (~225 KB com os valores
+padrão); acima de ONLINE_STATS_MAX_DEVICES dispositivos, o menos consultado
+recentemente é descartado e recarregado na próxima consulta.
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Dict, List, Optional, TYPE_CHECKING
+from datetime import datetime, timedelta
+import asyncio
+import os
+import numpy as np
+from models.sensor_series import SensorSeries
+from repositories.live_buffer import live_buffers
+from utils.chunk_aggregators import GroupedMomentsAggregator, MomentsAggregator
+
+if TYPE_CHECKING:
+    from repositories.sensor_repository import SensorRepository
+
+ONLINE_STATS_BUCKET_MINUTES = int(os.getenv("ONLINE_STATS_BUCKET_MINUTES", 5))
+ONLINE_STATS_HOURS = int(os.getenv("ONLINE_STATS_HOURS", 7 * 24))
+ONLINE_STATS_MAX_DEVICES = int(os.getenv("ONLINE_STATS_MAX_DEVICES", 500))
+
+FIELDS = ("temperatura", "umidade")
+
+# Sentinelas de timestamp (ns) para buckets vazios
+_TS_MAX = np.iinfo(np.int64).max
+_TS_MIN = np.iinfo(np.int64).min
+
+
+class WindowMoments:
+    """Resultado de uma janela: momentos por campo, total de leituras e período coberto"""
+
+    __slots__ = ("readings", "fields", "start", "end")
+
+    def __init__(self, readings: int):
+        self.readings = readings
+        self.fields: Dict[str, MomentsAggregator] = {}
+        self.start: Optional[np.datetime64] = None
+        self.end: Optional[np.datetime64] = None
+
+
+class DeviceMoments:
+    """Ring de buckets de tempo com os momentos de temperatura e umidade"""
+
+    def __init__(self, horizon_hours: int, bucket_minutes: int):
+        self.bucket_ns = bucket_minutes * 60 * 10**9
+        self.n_slots = horizon_hours * 60 // bucket_minutes + 1
+        # Bucket (índice absoluto) ocupando cada posição do ring; -1 = vazio
+        self.ids = np.full(self.n_slots, -1, dtype=np.int64)
+        self.readings_per_slot = np.zeros(self.n_slots, dtype=np.int64)
+        self.first_ns = np.full(self.n_slots, _TS_MAX, dtype=np.int64)
+        self.last_ns = np.full(self.n_slots, _TS_MIN, dtype=np.int64)
+        self.moments = {field: GroupedMomentsAggregator(self.n_slots) for field in FIELDS}
+        self.min = {field: np.full(self.n_slots, np.inf) for field in FIELDS}
+        self.max = {field: np.full(self.n_slots, -np.inf) for field in FIELDS}
+        self.last_timestamp: Optional[np.datetime64] = None
+        self.readings = 0
+
+    def add(self, series: SensorSeries) -> None:
+        """Incorporar leituras (vetorizado por bucket)"""
+        if len(series) == 0:
+            return
+
+        ts_ns = series.timestamps.astype("datetime64[ns]").astype(np.int64)
+        buckets = ts_ns // self.bucket_ns
+        newest = max(int(buckets.max()), int(self.ids.max()))
+
+        # Buckets novos ocupam a posição do ring; os já sobrescritos por
+        # buckets mais novos (fora do horizonte) são descartados
+        keep = buckets > newest - self.n_slots
+        slots = buckets % self.n_slots
+        stale = self.ids[slots] > buckets
+        keep &= ~stale
+        if not keep.any():
+            return
+        ts_ns, buckets, slots = ts_ns[keep], buckets[keep], slots[keep]
+
+        reset = np.unique(slots[self.ids[slots] < buckets])
+        if len(reset):
+            self._reset(reset)
+        self.ids[slots] = buckets
+
+        np.add.at(self.readings_per_slot, slots, 1)
+        np.minimum.at(self.first_ns, slots, ts_ns)
+        np.maximum.at(self.last_ns, slots, ts_ns)
+        for field in FIELDS:
+            values = getattr(series, field)[keep]
+            self.moments[field].update(slots, values)
+            valid = ~np.isnan(values)
+            np.fmin.at(self.min[field], slots[valid], values[valid])
+            np.fmax.at(self.max[field], slots[valid], values[valid])
+
+        last = series.timestamps[-1]
+        if self.last_timestamp is None or last > self.last_timestamp:
+            self.last_timestamp = last
+        self.readings += int(keep.sum())
+
+    def _reset(self, slots: np.ndarray) -> None:
+        self.ids[slots] = -1
+        self.readings_per_slot[slots] = 0
+        self.first_ns[slots] = _TS_MAX
+        self.last_ns[slots] = _TS_MIN
+        for field in FIELDS:
+            moments = self.moments[field]
+            moments.count[slots] = 0
+            moments.mean[slots] = 0.0
+            moments.m2[slots] = 0.0
+            self.min[field][slots] = np.inf
+            self.max[field][slots] = -np.inf
+
+    def window(self, start: datetime) -> WindowMoments:
+        """Momentos combinados dos buckets a partir do que contém `start`"""
+        first_bucket = int(np.datetime64(start, "ns").astype(np.int64)) // self.bucket_ns
+        selected = np.flatnonzero(self.ids >= first_bucket)
+
+        result = WindowMoments(int(self.readings_per_slot[selected].sum()))
+        for field in FIELDS:
+            moments = self.moments[field]
+            n = moments.count[selected]
+            acc = MomentsAggregator()
+            total = int(n.sum())
+            if total:
+                means = moments.mean[selected]
+                mean = float((n * means).sum() / total)
+                acc.count = total
+                acc.mean = mean
+                acc.m2 = float(moments.m2[selected].sum() + (n * (means - mean) ** 2).sum())
+                acc.min = float(self.min[field][selected].min())
+                acc.max = float(self.max[field][selected].max())
+            result.fields[field] = acc
+
+        if result.readings:
+            result.start = np.datetime64(int(self.first_ns[selected].min()), "ns")
+            result.end = np.datetime64(int(self.last_ns[selected].max()), "ns")
+        return result
+
+    @property
+    def nbytes(self) -> int:
+        arrays = [self.ids, self.readings_per_slot, self.first_ns, self.last_ns]
+        for field in FIELDS:
+            m = self.moments[field]
+            arrays += [m.count, m.mean, m.m2, self.min[field], self.max[field]]
+        return sum(a.nbytes for a in arrays)
+
+
+class _Entry:
+    __slots__ = ("moments", "lock", "loading", "pending", "synced_reconnections")
+
+    def __init__(self, moments: DeviceMoments):
+        self.moments = moments
+        self.lock = asyncio.Lock()
+        self.loading = True
+        # Leituras do change stream recebidas durante a carga inicial
+        self.pending: List[Dict] = []
+        self.synced_reconnections = -1
+
+
+class OnlineStatsStore:
+    """Acumuladores por dispositivo, carregados sob demanda e mantidos incrementalmente"""
+
+    def __init__(
+        self,
+        horizon_hours: int = ONLINE_STATS_HOURS,
+        bucket_minutes: int = ONLINE_STATS_BUCKET_MINUTES,
+        max_devices: int = ONLINE_STATS_MAX_DEVICES
+    ):
+        self.horizon_hours = horizon_hours
+        self.bucket_minutes = bucket_minutes
+        self.max_devices = max_devices
+        # Ordem de uso: o menos consultado recentemente primeiro
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self.loads = 0
+        self.evictions = 0
+        self.catch_ups = 0
+        self.documents_fetched = 0
+        self.stream_events = 0
+        self.served = 0
+
+    def apply(self, doc: Dict) -> None:
+        """Incorporar uma leitura recebida pelo change stream"""
+        entry = self._entries.get(doc.get("dispositivo"))
+        if entry is None or doc.get("timestamp") is None:
+            return
+        if entry.loading:
+            entry.pending.append(doc)
+            return
+
+        moments = entry.moments
+        ts = np.datetime64(doc["timestamp"], "ns")
+        if moments.last_timestamp is not None and ts <= moments.last_timestamp:
+            return
+        moments.add(SensorSeries.from_documents([doc]))
+        self.stream_events += 1
+
+    async def get_window(
+        self,
+        repository: SensorRepository,
+        device_id: str,
+        hours: int
+    ) -> WindowMoments:
+        """Momentos das últimas `hours` horas (hours <= horizon_hours)"""
+        entry = self._entries.get(device_id)
+        if entry is None:
+            entry = _Entry(DeviceMoments(self.horizon_hours, self.bucket_minutes))
+            self._entries[device_id] = entry
+            self._evict()
+        else:
+            self._entries.move_to_end(device_id)
+
+        async with entry.lock:
+            if entry.loading:
+                await self._load(repository, device_id, entry)
+            elif not self._stream_covers(entry):
+                await self._catch_up(repository, device_id, entry)
+
+        self.served += 1
+        return entry.moments.window(datetime.now() - timedelta(hours=hours))
+
+    def _stream_covers(self, entry: _Entry) -> bool:
+        """O change stream entregou todas as leituras desde a última sincronização?"""
+        return live_buffers.healthy and entry.synced_reconnections == live_buffers.reconnections
+
+    async def _load(self, repository: SensorRepository, device_id: str, entry: _Entry) -> None:
+        start = datetime.now() - timedelta(hours=self.horizon_hours)
+        entry.synced_reconnections = live_buffers.reconnections
+        try:
+            async for chunk in repository.iter_series(device_id, start):
+                entry.moments.add(chunk)
+                self.documents_fetched += len(chunk)
+        except BaseException:
+            if self._entries.get(device_id) is entry:
+                del self._entries[device_id]
+            raise
+
+        # Leituras que chegaram pelo stream durante a carga
+        entry.loading = False
+        pending, entry.pending = entry.pending, []
+        for doc in pending:
+            self.apply(doc)
+        self.loads += 1
+
+    async def _catch_up(self, repository: SensorRepository, device_id: str, entry: _Entry) -> None:
+        moments = entry.moments
+        entry.synced_reconnections = live_buffers.reconnections
+        if moments.last_timestamp is None:
+            after = datetime.now() - timedelta(hours=self.horizon_hours)
+        else:
+            after = moments.last_timestamp.astype("datetime64[us]").item()
+
+        async for chunk in repository.iter_series(device_id, after, start_exclusive=True):
+            moments.add(chunk)
+            self.documents_fetched += len(chunk)
+        self.catch_ups += 1
+
+    def _evict(self) -> None:
+        """Descartar os dispositivos menos consultados acima do limite (mantém o mais recente)"""
+        while len(self._entries) > max(self.max_devices, 1):
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "dispositivos": len(self._entries),
+            "max_dispositivos": self.max_devices,
+            "janela_maxima_horas": self.horizon_hours,
+            "bucket_minutos": self.bucket_minutes,
+            "bytes": sum(e.moments.nbytes for e in self._entries.values()),
+            "cargas_iniciais": self.loads,
+            "atualizacoes_incrementais": self.catch_ups,
+            "despejos": self.evictions,
+            "eventos_stream": self.stream_events,
+            "documentos_lidos": self.documents_fetched,
+            "consultas_atendidas": self.served
+        }
+
+
+# Instância compartilhada (alimentada também pelo change stream do live buffer)
+online_stats = OnlineStatsStore()
+live_buffers.subscribe(online_stats.apply)
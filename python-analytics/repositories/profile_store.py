@@ -0,0 +1,261 @@
+"""
+Perfis de hora do dia × dia da semana por dispositivo
+
+Cada dispositivo tem um ring de buckets de uma hora (DeviceMoments, o mesmo
+acumulador das estatísticas online) indexado pelo horário local do fuso: o
+índice absoluto do bucket já determina a hora do dia e o dia da semana, e
+o perfil de qualquer janela dentro do horizonte sai de np.bincount sobre os
+momentos dos buckets (fórmula de Chan et al.), sem reler as leituras.
+
+As leituras novas entram como nas estatísticas online: pelo change stream
+(quando o live buffer está ativo e saudável) ou buscando no banco apenas as
+leituras posteriores à última já incorporada. A janela é alinhada à hora
+local: o primeiro bucket pode incluir leituras de até uma hora antes do
+início pedido.
+"""
+from __future__ import annotations
+from typing import Dict, List, Optional, TYPE_CHECKING
+from datetime import datetime, timedelta
+import asyncio
+import os
+import numpy as np
+from models.sensor_series import SensorSeries
+from repositories.live_buffer import live_buffers
+from repositories.online_stats import FIELDS, DeviceMoments
+from utils.chunk_aggregators import GroupedMomentsAggregator
+from utils.time_buckets import BUCKET_TIMEZONE, local_timestamps
+
+if TYPE_CHECKING:
+    from repositories.sensor_repository import SensorRepository
+
+PROFILE_HOURS = int(os.getenv("PROFILE_HOURS", 90 * 24))
+
+# Dias da semana na ordem dos índices (segunda = 0, como datetime.weekday)
+WEEKDAYS = ("segunda", "terça", "quarta", "quinta", "sexta", "sábado", "domingo")
+
+# Dia da semana do bucket 0 (1970-01-01, quinta-feira)
+_EPOCH_WEEKDAY = 3
+
+_HOUR_NS = 3600 * 10**9
+
+
+def _combine(
+    groups: np.ndarray,
+    count: np.ndarray,
+    mean: np.ndarray,
+    m2: np.ndarray,
+    n_groups: int
+) -> GroupedMomentsAggregator:
+    """Combinar momentos de vários buckets por grupo (Chan et al., vetorizado)"""
+    result = GroupedMomentsAggregator(n_groups)
+    n = np.bincount(groups, weights=count, minlength=n_groups)
+    sums = np.bincount(groups, weights=count * mean, minlength=n_groups)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        group_mean = np.where(n > 0, sums / n, 0.0)
+    result.count = n.astype(np.int64)
+    result.mean = group_mean
+    result.m2 = np.bincount(
+        groups,
+        weights=m2 + count * (mean - group_mean[groups]) ** 2,
+        minlength=n_groups
+    )
+    return result
+
+
+class WeeklyProfile:
+    """Momentos de cada campo por dia da semana × hora (índice dia * 24 + hora)"""
+
+    __slots__ = ("readings", "fields")
+
+    def __init__(self, readings: int):
+        self.readings = readings
+        self.fields: Dict[str, GroupedMomentsAggregator] = {}
+
+    def _regroup(self, field: str, groups: np.ndarray, n_groups: int) -> GroupedMomentsAggregator:
+        cells = self.fields[field]
+        return _combine(groups, cells.count, cells.mean, cells.m2, n_groups)
+
+    def by_hour(self, field: str) -> GroupedMomentsAggregator:
+        """Momentos por hora do dia (24 grupos)"""
+        return self._regroup(field, np.arange(7 * 24) % 24, 24)
+
+    def by_weekday(self, field: str) -> GroupedMomentsAggregator:
+        """Momentos por dia da semana (7 grupos)"""
+        return self._regroup(field, np.arange(7 * 24) // 24, 7)
+
+
+class DeviceProfile:
+    """Buckets horários no horário local de um fuso, com os momentos de cada campo"""
+
+    def __init__(self, horizon_hours: int, timezone: str = BUCKET_TIMEZONE):
+        self.timezone = timezone
+        self.moments = DeviceMoments(horizon_hours, 60)
+        # Última leitura incorporada (UTC, como no banco)
+        self.last_timestamp: Optional[np.datetime64] = None
+
+    def add(self, series: SensorSeries) -> None:
+        """Incorporar leituras (timestamps UTC)"""
+        if len(series) == 0:
+            return
+        self.moments.add(SensorSeries(
+            local_timestamps(series.timestamps, self.timezone),
+            series.temperatura,
+            series.umidade
+        ))
+        last = series.timestamps[-1]
+        if self.last_timestamp is None or last > self.last_timestamp:
+            self.last_timestamp = last
+
+    def profile(self, start: datetime) -> WeeklyProfile:
+        """Perfil dos buckets a partir da hora local que contém `start` (UTC)"""
+        start_local = local_timestamps(np.array([start], dtype="datetime64[ns]"), self.timezone)[0]
+        first_bucket = int(start_local.astype(np.int64)) // _HOUR_NS
+
+        moments = self.moments
+        selected = np.flatnonzero(moments.ids >= first_bucket)
+        ids = moments.ids[selected]
+        groups = ((ids // 24 + _EPOCH_WEEKDAY) % 7) * 24 + ids % 24
+
+        result = WeeklyProfile(int(moments.readings_per_slot[selected].sum()))
+        for field in FIELDS:
+            acc = moments.moments[field]
+            result.fields[field] = _combine(
+                groups, acc.count[selected], acc.mean[selected], acc.m2[selected], 7 * 24
+            )
+        return result
+
+    @property
+    def nbytes(self) -> int:
+        return self.moments.nbytes
+
+
+class _Entry:
+    __slots__ = ("profile", "lock", "loading", "pending", "synced_reconnections")
+
+    def __init__(self, profile: DeviceProfile):
+        self.profile = profile
+        self.lock = asyncio.Lock()
+        self.loading = True
+        # Leituras do change stream recebidas durante a carga inicial
+        self.pending: List[Dict] = []
+        self.synced_reconnections = -1
+
+
+class ProfileStore:
+    """Perfis por dispositivo e fuso, carregados sob demanda e mantidos incrementalmente"""
+
+    def __init__(self, horizon_hours: int = PROFILE_HOURS):
+        self.horizon_hours = horizon_hours
+        # dispositivo -> fuso -> perfil
+        self._entries: Dict[str, Dict[str, _Entry]] = {}
+        self.loads = 0
+        self.catch_ups = 0
+        self.documents_fetched = 0
+        self.stream_events = 0
+        self.served = 0
+
+    def apply(self, doc: Dict) -> None:
+        """Incorporar uma leitura recebida pelo change stream"""
+        entries = self._entries.get(doc.get("dispositivo"))
+        if not entries or doc.get("timestamp") is None:
+            return
+
+        ts = np.datetime64(doc["timestamp"], "ns")
+        series = None
+        for entry in entries.values():
+            if entry.loading:
+                entry.pending.append(doc)
+                continue
+            profile = entry.profile
+            if profile.last_timestamp is not None and ts <= profile.last_timestamp:
+                continue
+            if series is None:
+                series = SensorSeries.from_documents([doc])
+            profile.add(series)
+            self.stream_events += 1
+
+    async def get_profile(
+        self,
+        repository: SensorRepository,
+        device_id: str,
+        hours: int,
+        timezone: str = BUCKET_TIMEZONE
+    ) -> WeeklyProfile:
+        """Perfil das últimas `hours` horas (hours <= horizon_hours)"""
+        entries = self._entries.setdefault(device_id, {})
+        entry = entries.get(timezone)
+        if entry is None:
+            entry = _Entry(DeviceProfile(self.horizon_hours, timezone))
+            entries[timezone] = entry
+
+        async with entry.lock:
+            if entry.loading:
+                await self._load(repository, device_id, timezone, entry)
+            elif not self._stream_covers(entry):
+                await self._catch_up(repository, device_id, entry)
+
+        self.served += 1
+        return entry.profile.profile(datetime.now() - timedelta(hours=hours))
+
+    def _stream_covers(self, entry: _Entry) -> bool:
+        """O change stream entregou todas as leituras desde a última sincronização?"""
+        return live_buffers.healthy and entry.synced_reconnections == live_buffers.reconnections
+
+    async def _load(
+        self,
+        repository: SensorRepository,
+        device_id: str,
+        timezone: str,
+        entry: _Entry
+    ) -> None:
+        start = datetime.now() - timedelta(hours=self.horizon_hours)
+        entry.synced_reconnections = live_buffers.reconnections
+        try:
+            async for chunk in repository.iter_series(device_id, start):
+                entry.profile.add(chunk)
+                self.documents_fetched += len(chunk)
+        except BaseException:
+            del self._entries[device_id][timezone]
+            raise
+
+        # Leituras que chegaram pelo stream durante a carga
+        entry.loading = False
+        pending, entry.pending = entry.pending, []
+        for doc in pending:
+            self.apply(doc)
+        self.loads += 1
+
+    async def _catch_up(self, repository: SensorRepository, device_id: str, entry: _Entry) -> None:
+        profile = entry.profile
+        entry.synced_reconnections = live_buffers.reconnections
+        if profile.last_timestamp is None:
+            after = datetime.now() - timedelta(hours=self.horizon_hours)
+        else:
+            after = profile.last_timestamp.astype("datetime64[us]").item()
+
+        async for chunk in repository.iter_series(device_id, after, start_exclusive=True):
+            profile.add(chunk)
+            self.documents_fetched += len(chunk)
+        self.catch_ups += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        entries = [e for by_zone in self._entries.values() for e in by_zone.values()]
+        return {
+            "dispositivos": len(self._entries),
+            "perfis": len(entries),
+            "janela_maxima_horas": self.horizon_hours,
+            "bytes": sum(e.profile.nbytes for e in entries),
+            "cargas_iniciais": self.loads,
+            "atualizacoes_incrementais": self.catch_ups,
+            "eventos_stream": self.stream_events,
+            "documentos_lidos": self.documents_fetched,
+            "consultas_atendidas": self.served
+        }
+
+
+# Instância compartilhada (alimentada também pelo change stream do live buffer)
+profile_store = ProfileStore()
+live_buffers.subscribe(profile_store.apply)
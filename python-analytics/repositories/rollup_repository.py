@@ -0,0 +1,614 @@
+from __future__ import annotations
+from typing import List, Dict, Optional, Tuple, TYPE_CHECKING
+from datetime import datetime, timedelta, timezone
+from config.database import Database
+from utils.quantile_sketch import SKETCH_SCALE
+from utils.regression_sums import ROLLUP_FIELDS
+from utils.time_buckets import date_trunc
+from bson import ObjectId
+import asyncio
+import os
+import uuid
+
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorCollection
+
+# Coleções com os agregados por dispositivo
+HOURLY_COLLECTION = "dados_rollup_hora"
+DAILY_COLLECTION = "dados_rollup_dia"
+CONTROL_COLLECTION = "dados_rollup_controle"
+
+# Janela relida a cada ciclo: leituras inseridas (_id) ou com timestamp
+# desde o início do ciclo anterior menos isso têm seus buckets recalculados,
+# cobrindo ObjectIds gerados fora de ordem e inserções atrasadas
+ROLLUP_RESCAN = timedelta(minutes=int(os.getenv("ROLLUP_RESCAN_MINUTES", 15)))
+
+# Validade do lock de um ciclo de atualização; renovado enquanto o ciclo roda
+LOCK_TIMEOUT = timedelta(minutes=5)
+
+ROLLUP_REFRESH_SECONDS = int(os.getenv("ROLLUP_REFRESH_SECONDS", 60))
+
+# As leituras dos agregados só disparam um ciclo de atualização se a última
+# atualização for mais antiga que isso (ex.: tarefa periódica parada);
+# normalmente quem atualiza é run_periodic_refresh
+ROLLUP_MAX_STALENESS_SECONDS = int(os.getenv("ROLLUP_MAX_STALENESS_SECONDS", 5 * ROLLUP_REFRESH_SECONDS))
+
+# Intervalos (dispositivo, horas) recalculados por agregação
+ROLLUP_REFRESH_BATCH = int(os.getenv("ROLLUP_REFRESH_BATCH", 200))
+
+# Versão do formato dos buckets; ao mudar, os agregados são recalculados do zero
+# (2: histogramas de quantis temp_hist/umidade_hist; 3: somas de regressão reg_*;
+# 4: buckets recalculados por inteiro, controle por executado_em)
+ROLLUP_VERSION = 4
+
+# Campos de cada bucket além de dispositivo, inicio e dos histogramas
+BUCKET_FIELDS = (
+    "leituras",
+    "temp_soma", "temp_soma_quadrados", "temp_min", "temp_max",
+    "umidade_soma", "umidade_soma_quadrados", "umidade_min", "umidade_max",
+    "primeira_leitura", "ultima_leitura",
+    *ROLLUP_FIELDS.values()
+)
+
+# Histograma -> grandeza das leituras
+HISTOGRAMS = {"temp_hist": "temperatura", "umidade_hist": "umidade"}
+
+
+def _regression_sums() -> Dict:
+    """Acumuladores das somas reg_* (só leituras com temperatura e umidade)"""
+    complete = {"$and": [{"$gt": ["$temperatura", -1e12]}, {"$gt": ["$umidade", -1e12]}]}
+    # Tempo em horas desde o início da hora
+    tau = {"$divide": [
+        {"$subtract": ["$timestamp", {"$dateTrunc": {"date": "$timestamp", "unit": "hour"}}]},
+        3600 * 1000
+    ]}
+    terms = {
+        "n": 1,
+        "t": tau,
+        "tt": {"$multiply": [tau, tau]},
+        "x": "$temperatura",
+        "xx": {"$multiply": ["$temperatura", "$temperatura"]},
+        "y": "$umidade",
+        "yy": {"$multiply": ["$umidade", "$umidade"]},
+        "tx": {"$multiply": [tau, "$temperatura"]},
+        "ty": {"$multiply": [tau, "$umidade"]},
+        "xy": {"$multiply": ["$temperatura", "$umidade"]}
+    }
+    return {
+        ROLLUP_FIELDS[name]: {"$sum": {"$cond": [complete, term, 0]}}
+        for name, term in terms.items()
+    }
+
+
+def _shifted_regression_sums(offset: str) -> Dict:
+    """Somar as reg_* de buckets horários com t deslocado de `offset` horas"""
+    def field(name: str) -> str:
+        return f"${ROLLUP_FIELDS[name]}"
+
+    terms = {name: field(name) for name in ROLLUP_FIELDS}
+    # t' = t + c: Σt' = Σt + cn, Σt'² = Σt² + 2cΣt + c²n, Σt'x = Σtx + cΣx
+    terms["t"] = {"$add": [field("t"), {"$multiply": [offset, field("n")]}]}
+    terms["tt"] = {"$add": [
+        field("tt"),
+        {"$multiply": [2, offset, field("t")]},
+        {"$multiply": [offset, offset, field("n")]}
+    ]}
+    terms["tx"] = {"$add": [field("tx"), {"$multiply": [offset, field("x")]}]}
+    terms["ty"] = {"$add": [field("ty"), {"$multiply": [offset, field("y")]}]}
+    return {ROLLUP_FIELDS[name]: {"$sum": term} for name, term in terms.items()}
+
+
+def _histogram(name: str) -> Dict:
+    """Expressão: entradas {h, k, v} do bucket -> histograma {"<bin>": contagem}"""
+    return {"$arrayToObject": {"$map": {
+        "input": {"$filter": {"input": "$bins", "cond": {"$eq": ["$$this.h", name]}}},
+        "in": {"k": "$$this.k", "v": "$$this.v"}
+    }}}
+
+
+def _assemble(collection_name: str) -> List[Dict]:
+    """
+    Juntar, por bucket, o documento de somas e as contagens por bin e
+    substituir o bucket inteiro na coleção de destino
+    """
+    return [
+        {"$group": {
+            "_id": {"dispositivo": "$dispositivo", "inicio": "$inicio"},
+            # Só o documento de somas tem esses campos ($max ignora ausentes)
+            **{field: {"$max": f"${field}"} for field in BUCKET_FIELDS},
+            "bins": {"$push": {"h": "$histograma", "k": "$k", "v": "$v"}}
+        }},
+        {"$project": {
+            "_id": 0,
+            "dispositivo": "$_id.dispositivo",
+            "inicio": "$_id.inicio",
+            **{field: 1 for field in BUCKET_FIELDS},
+            **{name: _histogram(name) for name in HISTOGRAMS}
+        }},
+        {"$merge": {
+            "into": collection_name,
+            "on": ["dispositivo", "inicio"],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert"
+        }}
+    ]
+
+
+def _runs(starts: List[datetime], step: timedelta) -> List[Tuple[datetime, datetime]]:
+    """Inícios de bucket -> intervalos [início, fim) contíguos"""
+    runs = []
+    for start in sorted(starts):
+        if runs and runs[-1][1] == start:
+            runs[-1] = (runs[-1][0], start + step)
+        else:
+            runs.append((start, start + step))
+    return runs
+
+
+class RollupRepository:
+    """
+    Agregados horários e diários mantidos de forma incremental
+
+    Cada bucket (dispositivo, inicio) guarda contagem, soma, soma dos
+    quadrados, mínimo e máximo de temperatura e umidade, além do primeiro
+    e do último timestamp e de um histograma de quantis por grandeza
+    (temp_hist/umidade_hist, ver utils/quantile_sketch.py) e das somas de
+    regressão (reg_*, ver utils/regression_sums.py).
+
+    A cada atualização os buckets horários tocados por leituras recentes
+    (inseridas ou com timestamp desde o ciclo anterior, menos
+    ROLLUP_RESCAN) são recalculados por inteiro a partir de 'dados', e os
+    diários correspondentes a partir dos horários, substituindo os
+    existentes via $merge. Repetir um ciclo (falha no meio, queda do
+    processo, dois processos com o lock) não conta leituras em dobro.
+
+    As consultas não atualizam os agregados a cada leitura: a atualização
+    fica com a tarefa periódica, e a defasagem é exposta por status().
+    """
+
+    @property
+    def raw_collection(self) -> AsyncIOMotorCollection:
+        return Database.get_collection("dados")
+
+    @property
+    def hourly_collection(self) -> AsyncIOMotorCollection:
+        return Database.get_collection(HOURLY_COLLECTION)
+
+    @property
+    def daily_collection(self) -> AsyncIOMotorCollection:
+        return Database.get_collection(DAILY_COLLECTION)
+
+    @property
+    def control_collection(self) -> AsyncIOMotorCollection:
+        return Database.get_collection(CONTROL_COLLECTION)
+
+    async def ensure_indexes(self) -> None:
+        """Índice único por (dispositivo, inicio), exigido pelo $merge"""
+        for collection in (self.hourly_collection, self.daily_collection):
+            await collection.create_index(
+                [("dispositivo", 1), ("inicio", 1)],
+                unique=True
+            )
+        # Busca das leituras recentes de todos os dispositivos a cada ciclo
+        await self.raw_collection.create_index([("timestamp", 1)])
+
+    async def refresh(self) -> bool:
+        """
+        Recalcular os buckets tocados por leituras novas desde o último ciclo
+
+        Retorna False se outro processo já estiver atualizando os agregados.
+        """
+        now = datetime.now()
+        owner = uuid.uuid4().hex
+        control = await self.control_collection.find_one_and_update(
+            {
+                "_id": "rollups",
+                "$or": [
+                    {"lock_ate": {"$exists": False}},
+                    {"lock_ate": None},
+                    {"lock_ate": {"$lt": now}}
+                ]
+            },
+            {"$set": {"lock_ate": now + LOCK_TIMEOUT, "lock_dono": owner}},
+            upsert=False
+        )
+        if control is None:
+            try:
+                await self.control_collection.insert_one(
+                    {"_id": "rollups", "lock_ate": now + LOCK_TIMEOUT, "lock_dono": owner}
+                )
+                control = {}
+            except Exception:
+                # Documento de controle existe e está travado por outro processo
+                return False
+
+        heartbeat = asyncio.create_task(self._hold_lock(owner))
+        try:
+            if control.get("executado_em") is None or control.get("versao", 1) < ROLLUP_VERSION:
+                # Primeira execução ou formato antigo: recalcular todos os buckets
+                await self.hourly_collection.delete_many({})
+                await self.daily_collection.delete_many({})
+                await self._aggregate(self.raw_collection, self._hourly_pipeline({}))
+                await self._aggregate(self.hourly_collection, self._daily_pipeline({}))
+            else:
+                await self._refresh_recent(control["executado_em"] - ROLLUP_RESCAN)
+        except Exception:
+            await self.control_collection.update_one(
+                {"_id": "rollups", "lock_dono": owner},
+                {"$set": {"lock_ate": None, "lock_dono": None}}
+            )
+            raise
+        finally:
+            heartbeat.cancel()
+
+        await self.control_collection.update_one(
+            {"_id": "rollups", "lock_dono": owner},
+            {"$set": {
+                "executado_em": now,
+                "atualizado_em": datetime.now(),
+                "lock_ate": None,
+                "lock_dono": None,
+                "versao": ROLLUP_VERSION
+            }}
+        )
+        return True
+
+    async def _refresh_recent(self, since: datetime) -> None:
+        """Recalcular as horas (e os dias) com leituras inseridas ou datadas desde `since`"""
+        # ObjectIds carregam o instante em UTC; o controle usa o horário local
+        since_id = ObjectId.from_datetime(since.astimezone(timezone.utc))
+        touched = await self.raw_collection.aggregate([
+            {"$match": {"$or": [{"_id": {"$gte": since_id}}, {"timestamp": {"$gte": since}}]}},
+            {"$group": {"_id": {
+                "dispositivo": "$dispositivo",
+                "inicio": {"$dateTrunc": {"date": "$timestamp", "unit": "hour"}}
+            }}}
+        ]).to_list(length=None)
+
+        hours: Dict[str, List[datetime]] = {}
+        for doc in touched:
+            if doc["_id"]["inicio"] is not None:
+                hours.setdefault(doc["_id"]["dispositivo"], []).append(doc["_id"]["inicio"])
+
+        hourly = [
+            {"dispositivo": device_id, "timestamp": {"$gte": start, "$lt": end}}
+            for device_id, starts in hours.items()
+            for start, end in _runs(starts, timedelta(hours=1))
+        ]
+        daily = [
+            {"dispositivo": device_id, "inicio": {"$gte": start, "$lt": end}}
+            for device_id, starts in hours.items()
+            for start, end in _runs(
+                list({s.replace(hour=0) for s in starts}), timedelta(days=1)
+            )
+        ]
+        # Os diários saem dos horários: só depois de todas as horas recalculadas
+        for i in range(0, len(hourly), ROLLUP_REFRESH_BATCH):
+            batch = hourly[i:i + ROLLUP_REFRESH_BATCH]
+            await self._aggregate(self.raw_collection, self._hourly_pipeline({"$or": batch}))
+        for i in range(0, len(daily), ROLLUP_REFRESH_BATCH):
+            batch = daily[i:i + ROLLUP_REFRESH_BATCH]
+            await self._aggregate(self.hourly_collection, self._daily_pipeline({"$or": batch}))
+
+    async def _hold_lock(self, owner: str) -> None:
+        """Renovar o lock enquanto o ciclo roda (cancelada ao terminar)"""
+        while True:
+            await asyncio.sleep(LOCK_TIMEOUT.total_seconds() / 3)
+            await self.control_collection.update_one(
+                {"_id": "rollups", "lock_dono": owner},
+                {"$set": {"lock_ate": datetime.now() + LOCK_TIMEOUT}}
+            )
+
+    @staticmethod
+    async def _aggregate(collection: AsyncIOMotorCollection, pipeline: List[Dict]) -> None:
+        await collection.aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+
+    async def status(self) -> Dict:
+        """
+        Marca d'água e defasagem dos agregados
+
+        - marca_dagua: instante (horário local, como datetime.now()) até o
+          qual as leituras inseridas já estão nos agregados
+        - defasagem_segundos: tempo desde a última atualização
+
+        Ambos None se os agregados ainda não foram calculados no formato atual.
+        """
+        now = datetime.now()
+        control = await self.control_collection.find_one({"_id": "rollups"}) or {}
+        current = control.get("executado_em") is not None and control.get("versao", 1) >= ROLLUP_VERSION
+        updated_at = control.get("atualizado_em") if current else None
+        lock = control.get("lock_ate")
+        return {
+            "marca_dagua": control["executado_em"] if current else None,
+            "atualizado_em": updated_at,
+            "defasagem_segundos": round((now - updated_at).total_seconds(), 1) if updated_at else None,
+            "defasagem_maxima_segundos": ROLLUP_MAX_STALENESS_SECONDS,
+            "atualizando": lock is not None and lock > now
+        }
+
+    async def ensure_fresh(self) -> Dict:
+        """
+        Atualizar os agregados só se estiverem defasados além de
+        ROLLUP_MAX_STALENESS_SECONDS (ou nunca calculados); retorna o status
+        """
+        status = await self.status()
+        lag = status["defasagem_segundos"]
+        if lag is None or lag > ROLLUP_MAX_STALENESS_SECONDS:
+            if await self.refresh():
+                status = await self.status()
+        return status
+
+    def _hourly_pipeline(self, match: Dict) -> List[Dict]:
+        """Buckets horários das leituras de `match`, recalculados por inteiro"""
+        bucket = {
+            "dispositivo": "$dispositivo",
+            "inicio": {"$dateTrunc": {"date": "$timestamp", "unit": "hour"}}
+        }
+
+        def bins(name: str) -> List[Dict]:
+            # Contagem por (bucket, bin), sem listar as leituras; nulos e NaN
+            # ficam de fora ($gt numérico)
+            field = HISTOGRAMS[name]
+            return [
+                {"$match": {**match, field: {"$gt": -1e12}}},
+                {"$group": {
+                    "_id": {**bucket, "bin": {"$round": [{"$multiply": [f"${field}", SKETCH_SCALE]}, 0]}},
+                    "v": {"$sum": 1}
+                }},
+                {"$project": {
+                    "_id": 0,
+                    "dispositivo": "$_id.dispositivo",
+                    "inicio": "$_id.inicio",
+                    "histograma": name,
+                    "k": {"$toString": {"$toLong": "$_id.bin"}},
+                    "v": 1
+                }}
+            ]
+
+        return [
+            {"$match": match},
+            {"$group": {
+                "_id": bucket,
+                "leituras": {"$sum": 1},
+                "temp_soma": {"$sum": "$temperatura"},
+                "temp_soma_quadrados": {"$sum": {"$multiply": ["$temperatura", "$temperatura"]}},
+                "temp_min": {"$min": "$temperatura"},
+                "temp_max": {"$max": "$temperatura"},
+                "umidade_soma": {"$sum": "$umidade"},
+                "umidade_soma_quadrados": {"$sum": {"$multiply": ["$umidade", "$umidade"]}},
+                "umidade_min": {"$min": "$umidade"},
+                "umidade_max": {"$max": "$umidade"},
+                "primeira_leitura": {"$min": "$timestamp"},
+                "ultima_leitura": {"$max": "$timestamp"},
+                **_regression_sums()
+            }},
+            {"$set": {"dispositivo": "$_id.dispositivo", "inicio": "$_id.inicio"}},
+            {"$unset": "_id"},
+            *[
+                {"$unionWith": {"coll": self.raw_collection.name, "pipeline": bins(name)}}
+                for name in HISTOGRAMS
+            ],
+            *_assemble(HOURLY_COLLECTION)
+        ]
+
+    def _daily_pipeline(self, match: Dict) -> List[Dict]:
+        """Buckets diários a partir dos horários de `match`, recalculados por inteiro"""
+        day = {"$dateTrunc": {"date": "$inicio", "unit": "day"}}
+        bucket = {"dispositivo": "$dispositivo", "inicio": "$dia"}
+
+        def bins(name: str) -> List[Dict]:
+            return [
+                {"$match": match},
+                {"$project": {
+                    "dispositivo": 1,
+                    "dia": day,
+                    "entrada": {"$objectToArray": {"$ifNull": [f"${name}", {}]}}
+                }},
+                {"$unwind": "$entrada"},
+                {"$group": {"_id": {**bucket, "k": "$entrada.k"}, "v": {"$sum": "$entrada.v"}}},
+                {"$project": {
+                    "_id": 0,
+                    "dispositivo": "$_id.dispositivo",
+                    "inicio": "$_id.inicio",
+                    "histograma": name,
+                    "k": "$_id.k",
+                    "v": 1
+                }}
+            ]
+
+        return [
+            {"$match": match},
+            {"$set": {
+                "dia": day,
+                # Horas do início do dia ao início do bucket horário
+                "deslocamento": {"$divide": [{"$subtract": ["$inicio", day]}, 3600 * 1000]}
+            }},
+            {"$group": {
+                "_id": bucket,
+                "leituras": {"$sum": "$leituras"},
+                "temp_soma": {"$sum": "$temp_soma"},
+                "temp_soma_quadrados": {"$sum": "$temp_soma_quadrados"},
+                "temp_min": {"$min": "$temp_min"},
+                "temp_max": {"$max": "$temp_max"},
+                "umidade_soma": {"$sum": "$umidade_soma"},
+                "umidade_soma_quadrados": {"$sum": "$umidade_soma_quadrados"},
+                "umidade_min": {"$min": "$umidade_min"},
+                "umidade_max": {"$max": "$umidade_max"},
+                "primeira_leitura": {"$min": "$primeira_leitura"},
+                "ultima_leitura": {"$max": "$ultima_leitura"},
+                **_shifted_regression_sums("$deslocamento")
+            }},
+            {"$set": {"dispositivo": "$_id.dispositivo", "inicio": "$_id.inicio"}},
+            {"$unset": "_id"},
+            *[
+                {"$unionWith": {"coll": HOURLY_COLLECTION, "pipeline": bins(name)}}
+                for name in HISTOGRAMS
+            ],
+            *_assemble(DAILY_COLLECTION)
+        ]
+
+    async def get_hourly(
+        self,
+        device_id: str,
+        start_date: datetime,
+        end_date: Optional[datetime] = None
+    ) -> List[Dict]:
+        """Buckets horários a partir da hora que contém start_date"""
+        await self.ensure_fresh()
+        return await self._get_buckets(
+            self.hourly_collection,
+            device_id,
+            start_date.replace(minute=0, second=0, microsecond=0),
+            end_date
+        )
+
+    async def get_daily(
+        self,
+        device_id: str,
+        start_date: datetime,
+        end_date: Optional[datetime] = None
+    ) -> List[Dict]:
+        """Buckets diários a partir do dia que contém start_date"""
+        await self.ensure_fresh()
+        return await self._get_buckets(
+            self.daily_collection,
+            device_id,
+            start_date.replace(hour=0, minute=0, second=0, microsecond=0),
+            end_date
+        )
+
+    async def aggregate_buckets(
+        self,
+        match: Dict,
+        granularity: str,
+        timezone: str,
+        by_device: bool = False
+    ) -> List[Dict]:
+        """
+        Reagrupar os buckets horários em buckets de `granularity` no fuso pedido
+
+        Só é exato para granularidades múltiplas de 1h em fusos com
+        deslocamento de horas inteiras (ver utils/time_buckets.py). Médias
+        dividem a soma pela contagem do histograma, que exclui leituras nulas.
+        """
+        await self.ensure_fresh()
+        bucket = date_trunc("$inicio", granularity, timezone)
+        group_id = {"dispositivo": "$dispositivo", "inicio": bucket} if by_device else bucket
+        sort = {"_id.dispositivo": 1, "_id.inicio": 1} if by_device else {"_id": 1}
+        
+        def histogram_count(field: str) -> Dict:
+            return {"$sum": {"$sum": {"$map": {
+                "input": {"$objectToArray": {"$ifNull": [f"${field}", {}]}},
+                "as": "entry",
+                "in": "$$entry.v"
+            }}}}
+        
+        def mean(prefix: str) -> Dict:
+            return {"$cond": [
+                {"$gt": [f"${prefix}_n", 0]},
+                {"$divide": [f"${prefix}_soma", f"${prefix}_n"]},
+                None
+            ]}
+        
+        project = {
+            "_id": 0,
+            "inicio": "$_id.inicio" if by_device else "$_id",
+            "leituras": 1,
+            "temp_media": mean("temp"),
+            "temp_min": 1,
+            "temp_max": 1,
+            "umidade_media": mean("umidade"),
+            "umidade_min": 1,
+            "umidade_max": 1,
+            "primeira_leitura": 1,
+            "ultima_leitura": 1
+        }
+        if by_device:
+            project["dispositivo"] = "$_id.dispositivo"
+        
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": group_id,
+                "leituras": {"$sum": "$leituras"},
+                "temp_soma": {"$sum": "$temp_soma"},
+                "temp_n": histogram_count("temp_hist"),
+                "temp_min": {"$min": "$temp_min"},
+                "temp_max": {"$max": "$temp_max"},
+                "umidade_soma": {"$sum": "$umidade_soma"},
+                "umidade_n": histogram_count("umidade_hist"),
+                "umidade_min": {"$min": "$umidade_min"},
+                "umidade_max": {"$max": "$umidade_max"},
+                "primeira_leitura": {"$min": "$primeira_leitura"},
+                "ultima_leitura": {"$max": "$ultima_leitura"}
+            }},
+            {"$sort": sort},
+            {"$project": project}
+        ]
+        return await self.hourly_collection.aggregate(pipeline).to_list(length=None)
+
+    async def get_range(
+        self,
+        device_id: str,
+        start_date: datetime,
+        end_date: Optional[datetime] = None
+    ) -> List[Dict]:
+        """
+        Buckets que cobrem [start_date, end_date] com o menor número de documentos
+
+        Dias inteiros vêm dos agregados diários e as pontas do intervalo dos
+        horários (a partir da hora que contém start_date).
+        """
+        end = end_date or datetime.now()
+        first_day = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        if first_day < start_date.replace(minute=0, second=0, microsecond=0):
+            first_day += timedelta(days=1)
+        last_day = end.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        if first_day >= last_day:
+            return await self.get_hourly(device_id, start_date, end_date)
+
+        await self.ensure_fresh()
+        start_hour = start_date.replace(minute=0, second=0, microsecond=0)
+        head = []
+        if start_hour < first_day:
+            head = await self._get_buckets(
+                self.hourly_collection, device_id, start_hour,
+                first_day - timedelta(microseconds=1)
+            )
+        days = await self._get_buckets(
+            self.daily_collection, device_id, first_day,
+            last_day - timedelta(microseconds=1)
+        )
+        tail = await self._get_buckets(
+            self.hourly_collection, device_id, last_day, end_date
+        )
+        return head + days + tail
+
+    async def _get_buckets(
+        self,
+        collection: AsyncIOMotorCollection,
+        device_id: str,
+        start_date: datetime,
+        end_date: Optional[datetime]
+    ) -> List[Dict]:
+        time_filter = {"$gte": start_date}
+        if end_date:
+            time_filter["$lte"] = end_date
+
+        cursor = collection.find(
+            {"dispositivo": device_id, "inicio": time_filter},
+            {"_id": 0}
+        ).sort("inicio", 1)
+        return await cursor.to_list(length=None)
+
+    async def run_periodic_refresh(self, interval: int = ROLLUP_REFRESH_SECONDS) -> None:
+        """Manter os agregados atualizados em segundo plano"""
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Erro ao atualizar agregados: {e}")
+            await asyncio.sleep(interval)
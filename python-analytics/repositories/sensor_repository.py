@@ -1,13 +1,23 @@
 from __future__ import annotations
-from typing import List, Dict, Optional, TYPE_CHECKING
+from typing import AsyncIterator, List, Dict, Optional, Union, TYPE_CHECKING
 from datetime import datetime, timedelta
 from config.database import Database # Importa a classe Database
+from models.sensor_series import SensorSeries, SERIES_PROJECTION
+from repositories.rollup_repository import RollupRepository
+from repositories.series_cache import series_cache
+from repositories.live_buffer import live_buffers
+from utils.time_buckets import BUCKET_TIMEZONE, HOURLY_MULTIPLES, date_trunc, whole_hour_offsets
+from utils.episode_pipeline import episode_pipeline, hours_between
 from bson import ObjectId
+import numpy as np
 
 if TYPE_CHECKING:
     # Apenas para type hinting, evita a necessidade de import síncrono
     from motor.motor_asyncio import AsyncIOMotorCollection
 
+# Tamanho dos lotes lidos do cursor nas consultas colunares
+SERIES_BATCH_SIZE = 5000
+
 class SensorRepository:
     """Repositório para operações com dados de sensores"""
     
@@ -23,6 +33,11 @@ class SensorRepository:
         # um método assíncrono do repositório é invocado.
         return Database.get_collection("dados")
     
+    @property
+    def rollups(self) -> RollupRepository:
+        """Agregados horários/diários mantidos incrementalmente"""
+        return RollupRepository()
+    
     async def get_by_device(
         self,
         device_id: str,
@@ -59,10 +74,460 @@ class SensorRepository:
         }).sort("timestamp", 1)
         return await cursor.to_list(length=None)
     
+    async def iter_series(
+        self,
+        device_id: str,
+        start_date: datetime,
+        end_date: Optional[datetime] = None,
+        batch_size: int = SERIES_BATCH_SIZE,
+        start_exclusive: bool = False
+    ) -> AsyncIterator[SensorSeries]:
+        """
+        Iterar sobre as leituras em lotes colunares de tamanho fixo
+
+        Apenas um lote fica em memória por vez, então o consumo de memória
+        não cresce com o tamanho da janela.
+        """
+        time_filter = {"$gt" if start_exclusive else "$gte": start_date}
+        if end_date:
+            time_filter["$lte"] = end_date
+
+        cursor = self.collection.find(
+            {"dispositivo": device_id, "timestamp": time_filter},
+            SERIES_PROJECTION
+        ).sort("timestamp", 1).batch_size(batch_size)
+
+        while True:
+            docs = await cursor.to_list(length=batch_size)
+            if not docs:
+                break
+            yield SensorSeries.from_documents(docs)
+
+    async def iter_last_hours(
+        self,
+        device_id: str,
+        hours: int = 24,
+        batch_size: int = SERIES_BATCH_SIZE
+    ) -> AsyncIterator[SensorSeries]:
+        time_limit = datetime.now() - timedelta(hours=hours)
+        async for chunk in self.iter_series(device_id, time_limit, batch_size=batch_size):
+            yield chunk
+
+    async def get_series(
+        self,
+        device_id: str,
+        start_date: datetime,
+        end_date: Optional[datetime] = None,
+        start_exclusive: bool = False
+    ) -> SensorSeries:
+        """
+        Buscar leituras já decodificadas em arrays NumPy
+
+        Projeta apenas timestamp, temperatura e umidade e decodifica cada
+        lote do cursor direto para arrays, sem materializar a lista de dicts.
+        """
+        chunks = [
+            chunk
+            async for chunk in self.iter_series(
+                device_id,
+                start_date,
+                end_date,
+                start_exclusive=start_exclusive
+            )
+        ]
+        return SensorSeries.concat(chunks)
+
+    async def get_series_bulk(
+        self,
+        start_date: datetime,
+        device_ids: Optional[List[str]] = None,
+        end_date: Optional[datetime] = None
+    ) -> Dict[str, SensorSeries]:
+        """
+        Séries de vários dispositivos em uma única consulta ($in)
+
+        O cursor vem ordenado por (dispositivo, timestamp), então as leituras
+        de cada dispositivo ficam contíguas: os lotes são decodificados em
+        arrays únicos e cada dispositivo recebe uma fatia deles (views, sem
+        cópia). device_ids=None traz todos os dispositivos com leituras.
+        """
+        match = {"timestamp": {"$gte": start_date}}
+        if end_date:
+            match["timestamp"]["$lte"] = end_date
+        if device_ids is not None:
+            match["dispositivo"] = {"$in": device_ids}
+        
+        # dispositivo decrescente + timestamp crescente é o percurso reverso
+        # do índice (dispositivo 1, timestamp -1), sem ordenação em memória
+        cursor = self.collection.find(
+            match,
+            {**SERIES_PROJECTION, "dispositivo": 1}
+        ).sort([("dispositivo", -1), ("timestamp", 1)]).batch_size(SERIES_BATCH_SIZE)
+        
+        chunks: List[SensorSeries] = []
+        devices: List[str] = []
+        while True:
+            docs = await cursor.to_list(length=SERIES_BATCH_SIZE)
+            if not docs:
+                break
+            chunks.append(SensorSeries.from_documents(docs))
+            devices.extend(doc["dispositivo"] for doc in docs)
+        
+        if not devices:
+            return {}
+        
+        series = SensorSeries.concat(chunks)
+        labels = np.array(devices, dtype=object)
+        bounds = np.flatnonzero(labels[1:] != labels[:-1]) + 1
+        starts = np.concatenate([[0], bounds])
+        ends = np.concatenate([bounds, [len(labels)]])
+        return {
+            labels[lo]: SensorSeries(
+                series.timestamps[lo:hi],
+                series.temperatura[lo:hi],
+                series.umidade[lo:hi]
+            )
+            for lo, hi in zip(starts.tolist(), ends.tolist())
+        }
+
+    def _resample_pipeline(
+        self,
+        match: Dict,
+        bin_minutes: int,
+        by_device: bool = False
+    ) -> List[Dict]:
+        """Pipeline de médias por intervalo (opcionalmente separadas por dispositivo)"""
+        bucket = {"$dateTrunc": {
+            "date": "$timestamp",
+            "unit": "minute",
+            "binSize": bin_minutes
+        }}
+        group_id = {"dispositivo": "$dispositivo", "inicio": bucket} if by_device else bucket
+        sort = {"_id.dispositivo": 1, "_id.inicio": 1} if by_device else {"_id": 1}
+        
+        project = {
+            "_id": 0,
+            "timestamp": {"$toDate": "$timestamp"},
+            "temperatura": 1,
+            "umidade": 1
+        }
+        if by_device:
+            project["dispositivo"] = "$_id.dispositivo"
+        
+        return [
+            {"$match": match},
+            {"$group": {
+                "_id": group_id,
+                "timestamp": {"$avg": {"$toLong": "$timestamp"}},
+                "temperatura": {"$avg": "$temperatura"},
+                "umidade": {"$avg": "$umidade"}
+            }},
+            {"$sort": sort},
+            {"$project": project}
+        ]
+    
+    async def get_resampled_series(
+        self,
+        device_id: str,
+        start_date: datetime,
+        end_date: Optional[datetime] = None,
+        bin_minutes: int = 60
+    ) -> SensorSeries:
+        """
+        Série reamostrada no servidor: médias por intervalo de `bin_minutes`
+
+        Agrupa as leituras com $dateTrunc e devolve, por intervalo, as médias
+        de temperatura e umidade no instante médio das leituras do intervalo
+        (e não no início dele), o que evita deslocar a sazonalidade e trata
+        intervalos parciais. Intervalos sem leituras não aparecem no
+        resultado: lacunas ficam como ausência de pontos, sem interpolação.
+        """
+        match = {"dispositivo": device_id, "timestamp": {"$gte": start_date}}
+        if end_date:
+            match["timestamp"]["$lte"] = end_date
+        
+        pipeline = self._resample_pipeline(match, bin_minutes)
+        docs = await self.collection.aggregate(pipeline).to_list(length=None)
+        return SensorSeries.from_documents(docs)
+    
+    async def get_resampled_series_bulk(
+        self,
+        start_date: datetime,
+        device_ids: Optional[List[str]] = None,
+        bin_minutes: int = 60
+    ) -> Dict[str, SensorSeries]:
+        """
+        Séries reamostradas de vários dispositivos em uma única agregação
+
+        Mesmo cálculo de get_resampled_series, agrupando também por
+        dispositivo; os documentos são lidos em lotes e separados por
+        dispositivo à medida que chegam (o resultado vem ordenado).
+        """
+        match = {"timestamp": {"$gte": start_date}}
+        if device_ids is not None:
+            match["dispositivo"] = {"$in": device_ids}
+        
+        pipeline = self._resample_pipeline(match, bin_minutes, by_device=True)
+        cursor = self.collection.aggregate(pipeline, allowDiskUse=True)
+        
+        docs_by_device: Dict[str, List[Dict]] = {}
+        while True:
+            docs = await cursor.to_list(length=SERIES_BATCH_SIZE)
+            if not docs:
+                break
+            for doc in docs:
+                docs_by_device.setdefault(doc["dispositivo"], []).append(doc)
+        
+        return {
+            device_id: SensorSeries.from_documents(docs)
+            for device_id, docs in docs_by_device.items()
+        }
+
+    async def get_buckets(
+        self,
+        device_id: str,
+        start_date: datetime,
+        end_date: Optional[datetime] = None,
+        granularity: str = "1h",
+        timezone: str = BUCKET_TIMEZONE
+    ) -> List[Dict]:
+        """
+        Agregados por intervalo (1m/5m/15m/1h/6h/1d) alinhados ao fuso pedido
+
+        Cada bucket traz inicio (data UTC do início local do intervalo),
+        leituras, média/mínimo/máximo de temperatura e umidade e a primeira
+        e a última leitura, em ordem de inicio.
+        """
+        return await self._bucket_docs([device_id], start_date, end_date, granularity, timezone)
+    
+    async def get_buckets_bulk(
+        self,
+        start_date: datetime,
+        device_ids: Optional[List[str]] = None,
+        end_date: Optional[datetime] = None,
+        granularity: str = "1h",
+        timezone: str = BUCKET_TIMEZONE
+    ) -> Dict[str, List[Dict]]:
+        """Mesmo cálculo de get_buckets para vários dispositivos em uma única agregação"""
+        docs = await self._bucket_docs(
+            device_ids, start_date, end_date, granularity, timezone, by_device=True
+        )
+        buckets: Dict[str, List[Dict]] = {}
+        for doc in docs:
+            buckets.setdefault(doc.pop("dispositivo"), []).append(doc)
+        return buckets
+    
+    async def _bucket_docs(
+        self,
+        device_ids: Optional[List[str]],
+        start_date: datetime,
+        end_date: Optional[datetime],
+        granularity: str,
+        timezone: str,
+        by_device: bool = False
+    ) -> List[Dict]:
+        """
+        Granularidades de 1h para cima são reagrupadas a partir dos agregados
+        horários (a partir da hora que contém start_date); as menores, ou
+        fusos com deslocamento fracionário, agregam as leituras brutas.
+        """
+        device_filter = {"$in": device_ids} if device_ids is not None else {"$exists": True}
+        
+        if granularity in HOURLY_MULTIPLES and whole_hour_offsets(
+            timezone, start_date, end_date or datetime.now()
+        ):
+            time_filter = {"$gte": start_date.replace(minute=0, second=0, microsecond=0)}
+            if end_date:
+                time_filter["$lte"] = end_date
+            return await self.rollups.aggregate_buckets(
+                {"dispositivo": device_filter, "inicio": time_filter},
+                granularity, timezone, by_device
+            )
+        
+        time_filter = {"$gte": start_date}
+        if end_date:
+            time_filter["$lte"] = end_date
+        bucket = date_trunc("$timestamp", granularity, timezone)
+        group_id = {"dispositivo": "$dispositivo", "inicio": bucket} if by_device else bucket
+        sort = {"_id.dispositivo": 1, "_id.inicio": 1} if by_device else {"_id": 1}
+        
+        project = {
+            "_id": 0,
+            "inicio": "$_id.inicio" if by_device else "$_id",
+            "leituras": 1,
+            "temp_media": 1,
+            "temp_min": 1,
+            "temp_max": 1,
+            "umidade_media": 1,
+            "umidade_min": 1,
+            "umidade_max": 1,
+            "primeira_leitura": 1,
+            "ultima_leitura": 1
+        }
+        if by_device:
+            project["dispositivo"] = "$_id.dispositivo"
+        
+        pipeline = [
+            {"$match": {"dispositivo": device_filter, "timestamp": time_filter}},
+            {"$group": {
+                "_id": group_id,
+                "leituras": {"$sum": 1},
+                "temp_media": {"$avg": "$temperatura"},
+                "temp_min": {"$min": "$temperatura"},
+                "temp_max": {"$max": "$temperatura"},
+                "umidade_media": {"$avg": "$umidade"},
+                "umidade_min": {"$min": "$umidade"},
+                "umidade_max": {"$max": "$umidade"},
+                "primeira_leitura": {"$min": "$timestamp"},
+                "ultima_leitura": {"$max": "$timestamp"}
+            }},
+            {"$sort": sort},
+            {"$project": project}
+        ]
+        return await self.collection.aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+
+    async def summarize_episodes(
+        self,
+        device_id: str,
+        hours: int,
+        value: Union[str, Dict],
+        conditions: Dict[str, Dict],
+        top: int = 5
+    ) -> Dict:
+        """
+        Resumo dos episódios de cada condição na janela recente, calculado
+        no MongoDB (ver utils/episode_pipeline.py); só o resumo é transferido
+        """
+        time_limit = datetime.now() - timedelta(hours=hours)
+        pipeline = episode_pipeline(
+            {"dispositivo": device_id, "timestamp": {"$gte": time_limit}},
+            value,
+            conditions,
+            top=top
+        )
+        docs = await self.collection.aggregate(pipeline, allowDiskUse=True).to_list(length=1)
+        return docs[0] if docs else {}
+
+    async def get_humidity_rate_stats(
+        self,
+        device_id: str,
+        hours: int,
+        min_interval_hours: float,
+        max_abs_rate: float
+    ) -> Dict:
+        """
+        Estatísticas de ΔU/Δt (%/h) entre leituras consecutivas, no MongoDB
+        
+        $setWindowFields traz a leitura anterior; intervalos menores que
+        min_interval_hours e taxas fora de ±max_abs_rate são descartados
+        antes do $group (como no cálculo com NumPy). Retorna leituras,
+        taxas válidas, média, máximo, mínimo e média do valor absoluto.
+        """
+        time_limit = datetime.now() - timedelta(hours=hours)
+        rate = {"$cond": [
+            {"$gte": ["$dt", min_interval_hours]},
+            {"$divide": [{"$subtract": ["$umidade", "$umidade_anterior"]}, "$dt"]},
+            None
+        ]}
+        # null e NaN ficam fora da faixa (ordenam antes dos números)
+        valid = {"$and": [{"$gte": ["$taxa", -max_abs_rate]}, {"$lte": ["$taxa", max_abs_rate]}]}
+        
+        def valid_rate(expression):
+            return {"$cond": [valid, expression, None]}
+        
+        pipeline = [
+            {"$match": {"dispositivo": device_id, "timestamp": {"$gte": time_limit}}},
+            {"$project": {"_id": 0, "timestamp": 1, "umidade": 1}},
+            {"$setWindowFields": {
+                "sortBy": {"timestamp": 1},
+                "output": {
+                    "timestamp_anterior": {"$shift": {"output": "$timestamp", "by": -1}},
+                    "umidade_anterior": {"$shift": {"output": "$umidade", "by": -1}}
+                }
+            }},
+            {"$set": {"dt": {"$cond": [
+                {"$eq": ["$timestamp_anterior", None]},
+                None,
+                hours_between("$timestamp", "$timestamp_anterior")
+            ]}}},
+            {"$set": {"taxa": rate}},
+            {"$group": {
+                "_id": None,
+                "leituras": {"$sum": 1},
+                "taxas": {"$sum": {"$cond": [valid, 1, 0]}},
+                "media": {"$avg": valid_rate("$taxa")},
+                "maxima": {"$max": valid_rate("$taxa")},
+                "minima": {"$min": valid_rate("$taxa")},
+                "media_abs": {"$avg": valid_rate({"$abs": "$taxa"})}
+            }}
+        ]
+        docs = await self.collection.aggregate(pipeline, allowDiskUse=True).to_list(length=1)
+        return docs[0] if docs else {"leituras": 0, "taxas": 0}
+
+    async def get_last_hours_series(
+        self,
+        device_id: str,
+        hours: int = 24
+    ) -> SensorSeries:
+        """Janela recente: buffer do change stream, cache de séries ou banco"""
+        live = live_buffers.get_last_hours(device_id, hours)
+        if live is None and hours <= live_buffers.horizon_hours and await live_buffers.backfill(self, device_id):
+            live = live_buffers.get_last_hours(device_id, hours)
+        if live is not None:
+            return live
+        
+        if hours <= series_cache.max_hours:
+            return await series_cache.get_last_hours(self, device_id, hours)
+        
+        time_limit = datetime.now() - timedelta(hours=hours)
+        return await self.get_series(device_id, time_limit)
+
+    async def count_since(self, device_id: str, since: datetime) -> int:
+        """Quantidade de leituras do dispositivo posteriores a `since`"""
+        return await self.collection.count_documents({
+            "dispositivo": device_id,
+            "timestamp": {"$gt": since}
+        })
+    
+    async def get_latest_timestamp(self, device_id: str) -> Optional[datetime]:
+        """Timestamp da leitura mais recente do dispositivo"""
+        doc = await self.collection.find_one(
+            {"dispositivo": device_id},
+            {"_id": 0, "timestamp": 1},
+            sort=[("timestamp", -1)]
+        )
+        return doc["timestamp"] if doc else None
+
+    async def ensure_indexes(self) -> None:
+        """Garantir o índice composto (dispositivo, timestamp) usado nas consultas"""
+        await self.collection.create_index([("dispositivo", 1), ("timestamp", -1)])
+    
+    async def get_latest_per_device(self) -> List[Dict]:
+        """
+        Última leitura de cada dispositivo em uma única agregação
+
+        O $sort por (dispositivo, timestamp) seguido de $group/$first é
+        atendido pelo índice composto, sem uma consulta por dispositivo.
+        """
+        pipeline = [
+            {"$sort": {"dispositivo": 1, "timestamp": -1}},
+            {"$group": {
+                "_id": "$dispositivo",
+                "temperatura": {"$first": "$temperatura"},
+                "umidade": {"$first": "$umidade"},
+                "timestamp": {"$first": "$timestamp"}
+            }}
+        ]
+        return await self.collection.aggregate(pipeline).to_list(length=None)
+    
     async def get_all_devices(self) -> List[str]:
         # Usa o property self.collection
         return await self.collection.distinct("dispositivo")
     
+    async def get_active_devices(self, start_date: datetime) -> List[str]:
+        """Dispositivos com leituras desde start_date (em ordem)"""
+        return sorted(await self.collection.distinct("dispositivo", {"timestamp": {"$gte": start_date}}))
+    
     async def get_statistics(
         self,
         device_id: str,
@@ -95,53 +560,38 @@ class SensorRepository:
     async def get_hourly_averages(
         self,
         device_id: str,
-        days: int = 7
+        days: int = 7,
+        timezone: str = BUCKET_TIMEZONE
     ) -> List[Dict]:
+        """Médias horárias (inicio, temp_media, umidade_media, leituras)"""
         time_limit = datetime.now() - timedelta(days=days)
-        pipeline = [
-            {"$match": {
-                "dispositivo": device_id,
-                "timestamp": {"$gte": time_limit}
-            }},
-            {"$group": {
-                "_id": {
-                    "year": {"$year": "$timestamp"},
-                    "month": {"$month": "$timestamp"},
-                    "day": {"$dayOfMonth": "$timestamp"},
-                    "hour": {"$hour": "$timestamp"}
-                },
-                "temp_media": {"$avg": "$temperatura"},
-                "umidade_media": {"$avg": "$umidade"},
-                "leituras": {"$sum": 1}
-            }},
-            {"$sort": {"_id": 1}}
+        buckets = await self.get_buckets(device_id, time_limit, granularity="1h", timezone=timezone)
+        return [
+            {
+                "inicio": b["inicio"],
+                "temp_media": b["temp_media"],
+                "umidade_media": b["umidade_media"],
+                "leituras": b["leituras"]
+            }
+            for b in buckets
         ]
-        # Usa o property self.collection
-        return await self.collection.aggregate(pipeline).to_list(length=None)
     
     async def get_daily_extremes(
         self,
         device_id: str,
-        days: int = 30
+        days: int = 30,
+        timezone: str = BUCKET_TIMEZONE
     ) -> List[Dict]:
+        """Extremos por dia local (inicio, temp_max, temp_min, umidade_max, umidade_min)"""
         time_limit = datetime.now() - timedelta(days=days)
-        pipeline = [
-            {"$match": {
-                "dispositivo": device_id,
-                "timestamp": {"$gte": time_limit}
-            }},
-            {"$group": {
-                "_id": {
-                    "year": {"$year": "$timestamp"},
-                    "month": {"$month": "$timestamp"},
-                    "day": {"$dayOfMonth": "$timestamp"}
-                },
-                "temp_max": {"$max": "$temperatura"},
-                "temp_min": {"$min": "$temperatura"},
-                "umidade_max": {"$max": "$umidade"},
-                "umidade_min": {"$min": "$umidade"}
-            }},
-            {"$sort": {"_id": 1}}
+        buckets = await self.get_buckets(device_id, time_limit, granularity="1d", timezone=timezone)
+        return [
+            {
+                "inicio": b["inicio"],
+                "temp_max": b["temp_max"],
+                "temp_min": b["temp_min"],
+                "umidade_max": b["umidade_max"],
+                "umidade_min": b["umidade_min"]
+            }
+            for b in buckets
         ]
-        # Usa o property self.collection
-        return await self.collection.aggregate(pipeline).to_list(length=None)
@@ -0,0 +1,161 @@
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Dict, TYPE_CHECKING
+from datetime import datetime, timedelta
+import asyncio
+import os
+from models.sensor_series import SensorSeries
+
+if TYPE_CHECKING:
+    from repositories.sensor_repository import SensorRepository
+
+# Orçamento de memória do cache (bytes) e maior janela mantida em cache
+SERIES_CACHE_MAX_BYTES = int(os.getenv("SERIES_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+SERIES_CACHE_MAX_HOURS = int(os.getenv("SERIES_CACHE_MAX_HOURS", 7 * 24))
+
+
+def _read_only(series: SensorSeries) -> SensorSeries:
+    """Marcar arrays como somente leitura (as fatias são compartilhadas)"""
+    for arr in (series.timestamps, series.temperatura, series.umidade):
+        arr.flags.writeable = False
+    return series
+
+
+class _CacheEntry:
+    __slots__ = ("series", "horizon_hours")
+
+    def __init__(self, series: SensorSeries, horizon_hours: int):
+        self.series = series
+        self.horizon_hours = horizon_hours
+
+
+class SeriesCache:
+    """
+    Cache read-through de séries por dispositivo
+
+    Cada entrada guarda as leituras das últimas `horizon_hours` horas do
+    dispositivo. Em um acerto, busca apenas os documentos mais novos que o
+    último timestamp em cache e descarta o início expirado da janela.
+    Entradas são removidas em ordem LRU quando o orçamento de memória é
+    excedido.
+
+    Leituras inseridas com timestamp anterior ao último já em cache não são
+    vistas até que a entrada seja recarregada (despejo ou clear()).
+
+    Cargas e atualizações de um mesmo dispositivo são serializadas por um
+    lock por dispositivo: requisições simultâneas não carregam a mesma
+    janela duas vezes, e uma atualização nunca sobrescreve uma carga maior
+    feita enquanto aguardava o banco.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = SERIES_CACHE_MAX_BYTES,
+        max_hours: int = SERIES_CACHE_MAX_HOURS
+    ):
+        self.max_bytes = max_bytes
+        self.max_hours = max_hours
+        self._entries: OrderedDict[str, _CacheEntry] = OrderedDict()
+        # Um lock por dispositivo (mantido após o despejo da entrada)
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.documents_fetched = 0
+
+    async def get_last_hours(
+        self,
+        repository: SensorRepository,
+        device_id: str,
+        hours: int
+    ) -> SensorSeries:
+        """Leituras das últimas `hours` horas, buscando só o que falta no MongoDB"""
+        lock = self._locks.setdefault(device_id, asyncio.Lock())
+        async with lock:
+            now = datetime.now()
+            start = now - timedelta(hours=hours)
+
+            entry = self._entries.get(device_id)
+            if entry is None or hours > entry.horizon_hours:
+                return await self._load(repository, device_id, hours, start)
+
+            self.hits += 1
+            self._entries.move_to_end(device_id)
+
+            # Buscar apenas documentos mais novos que o último em cache
+            series = entry.series
+            if len(series):
+                last = series.timestamps[-1].astype("datetime64[us]").item()
+                tail = await repository.get_series(device_id, last, start_exclusive=True)
+            else:
+                tail = await repository.get_series(device_id, now - timedelta(hours=entry.horizon_hours))
+            self.documents_fetched += len(tail)
+
+            # Descartar o início expirado e anexar as novas leituras
+            horizon_start = now - timedelta(hours=entry.horizon_hours)
+            updated = _read_only(SensorSeries.concat([series.between(horizon_start), tail]))
+            if self._entries.get(device_id) is entry:
+                self._replace(entry, updated)
+            # (despejada durante a busca: responde sem recolocar no cache)
+            return updated.between(start)
+
+    async def _load(
+        self,
+        repository: SensorRepository,
+        device_id: str,
+        hours: int,
+        start: datetime
+    ) -> SensorSeries:
+        """Carregar a janela completa e criar/substituir a entrada (com o lock do dispositivo)"""
+        self.misses += 1
+        series = _read_only(await repository.get_series(device_id, start))
+        self.documents_fetched += len(series)
+
+        entry = self._entries.get(device_id)
+        if entry is None:
+            entry = _CacheEntry(series, hours)
+            self._entries[device_id] = entry
+            self._bytes += series.nbytes
+        else:
+            entry.horizon_hours = max(entry.horizon_hours, hours)
+            self._replace(entry, series)
+
+        self._entries.move_to_end(device_id)
+        self._evict()
+        return series
+
+    def _replace(self, entry: _CacheEntry, series: SensorSeries) -> None:
+        self._bytes += series.nbytes - entry.series.nbytes
+        entry.series = series
+        self._evict()
+
+    def _evict(self) -> None:
+        """Remover entradas menos usadas até caber no orçamento (mantém a mais recente)"""
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.series.nbytes
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict:
+        """Contadores de uso do cache"""
+        total = self.hits + self.misses
+        return {
+            "dispositivos": len(self._entries),
+            "bytes": self._bytes,
+            "bytes_maximo": self.max_bytes,
+            "janela_maxima_horas": self.max_hours,
+            "acertos": self.hits,
+            "falhas": self.misses,
+            "taxa_acerto": round(self.hits / total, 4) if total else None,
+            "despejos": self.evictions,
+            "documentos_buscados": self.documents_fetched
+        }
+
+
+# Instância compartilhada por todos os repositórios do processo
+series_cache = SeriesCache()
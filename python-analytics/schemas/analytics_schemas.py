@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Literal, Optional, Any, Union
 
 class StatisticsResponse(BaseModel):
     """Schema para resposta de estatísticas"""
@@ -8,6 +8,8 @@ class StatisticsResponse(BaseModel):
     temperatura: Dict[str, Any]
     umidade: Dict[str, Any]
     total_leituras: int
+    erro_maximo_quartis: Optional[float] = None
+    periodo_quartis: Optional[Dict[str, str]] = None
 
 class AnomalyItem(BaseModel):
     """Schema para item de anomalia"""
@@ -51,7 +53,7 @@ class CorrelationResponse(BaseModel):
     dispositivo: str
     periodo_dias: int
     correlacao_pearson: CorrelationMetric
-    correlacao_spearman: CorrelationMetric
+    correlacao_spearman: Optional[CorrelationMetric] = None
 
 class ComfortResponse(BaseModel):
     """Schema para resposta de conforto"""
@@ -60,4 +62,14 @@ class ComfortResponse(BaseModel):
     indice_medio: float
     distribuicao_conforto: Dict[str, float]
     percentual_confortavel: float
-    recomendacoes: List[str]
\ No newline at end of file
+    recomendacoes: List[str]
+
+class BatchRequest(BaseModel):
+    """Schema para requisição em lote (lista de dispositivos ou "all")"""
+    dispositivos: Union[Literal["all"], List[str]] = "all"
+    
+    def device_ids(self) -> Optional[List[str]]:
+        """IDs pedidos sem repetição (None = todos os dispositivos)"""
+        if self.dispositivos == "all":
+            return None
+        return list(dict.fromkeys(self.dispositivos))
@@ -3,46 +3,466 @@ import numpy as np
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 from scipy import stats
-from sklearn.linear_model import LinearRegression
+import asyncio
 from repositories.sensor_repository import SensorRepository
+from repositories.online_stats import online_stats
+from models.sensor_series import SensorSeries
+from services.dataset_loader import DeviceDatasetLoader
+from config.compute_executor import ComputeExecutor
+from utils import kernels
+from utils.chunk_aggregators import MomentsAggregator
+from utils.quantile_sketch import QuantileSketch, SKETCH_ERROR_BOUND
+from utils.regression_sums import RegressionSums
+from utils import cross_correlation
+from utils.downsampling import downsample
+from utils import time_buckets
+import math
 import warnings
 warnings.filterwarnings('ignore')
 
+# Prefixo de cada grandeza nos documentos dos agregados
+ROLLUP_PREFIXES = {"temperatura": "temp", "umidade": "umidade"}
+
+# Máximo de buckets por consulta de get_buckets (ex.: 1m cobre ~7 dias)
+MAX_BUCKETS = 10000
+
+# Análises disponíveis no cálculo em lote (mesmos nomes das rotas)
+BATCH_ANALYSES = ("estatisticas", "anomalias", "tendencias", "correlacao", "conforto")
+
 class AnalyticsService:
     """Serviço para análises estatísticas e insights"""
     
     def __init__(self):
         self.repository = SensorRepository()
     
-    def _to_dataframe(self, data: List[Dict]) -> pd.DataFrame:
-        """Converter dados para DataFrame pandas"""
-        if not data:
-            return pd.DataFrame()
+    async def _last_hours(
+        self,
+        device_id: str,
+        hours: int,
+        loader: Optional[DeviceDatasetLoader] = None
+    ) -> SensorSeries:
+        """Buscar a janela no carregador da requisição (se houver) ou no repositório"""
+        if loader is not None:
+            return await loader.last_hours(hours)
+        return await self.repository.get_last_hours_series(device_id, hours)
+    
+    async def get_batch(
+        self,
+        analysis: str,
+        device_ids: Optional[List[str]] = None,
+        hours: int = 24,
+        days: int = 7,
+        threshold: float = 3.0,
+        spearman: bool = True
+    ) -> Dict[str, Dict]:
+        """
+        Uma análise para vários dispositivos (device_ids=None: todos)
+        
+        As leituras de todos os dispositivos vêm de uma única consulta
+        (DeviceDatasetLoader.preload_many); cada dispositivo é calculado
+        sobre a sua fatia, em paralelo no ComputeExecutor. `hours` vale para
+        estatisticas/anomalias/conforto e `days` para tendencias/correlacao.
+        """
+        if analysis not in BATCH_ANALYSES:
+            raise ValueError(f"Análise inválida: {analysis}")
         
-        df = pd.DataFrame(data)
-        if 'timestamp' in df.columns:
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df = df.sort_values('timestamp')
+        window = days * 24 if analysis in ("tendencias", "correlacao") else hours
+        loaders = await DeviceDatasetLoader.preload_many(device_ids, window, self.repository)
         
-        return df
+        def run(device_id: str, loader: DeviceDatasetLoader):
+            if analysis == "estatisticas":
+                return self.get_basic_statistics(device_id, loader=loader, hours=hours)
+            if analysis == "anomalias":
+                return self.detect_anomalies(device_id, hours, threshold, loader=loader)
+            if analysis == "tendencias":
+                return self.get_trends(device_id, days, loader=loader)
+            if analysis == "correlacao":
+                return self.get_correlation_analysis(device_id, days, loader=loader, spearman=spearman)
+            return self.get_comfort_analysis(device_id, hours, loader=loader)
+        
+        results = await asyncio.gather(*(run(d, l) for d, l in loaders.items()))
+        return dict(zip(loaders, results))
+    
+    @staticmethod
+    def _to_dataframe(series: SensorSeries) -> pd.DataFrame:
+        """Converter série colunar para DataFrame pandas (já ordenada por timestamp)"""
+        return series.to_dataframe()
     
     async def get_basic_statistics(
         self,
         device_id: str,
         start_date: Optional[datetime] = None,
-        end_date: Optional[datetime] = None
+        end_date: Optional[datetime] = None,
+        loader: Optional[DeviceDatasetLoader] = None,
+        hours: int = 24
     ) -> Dict:
-        """Estatísticas básicas (média, mediana, desvio padrão, etc.)"""
+        """
+        Estatísticas básicas (média, mediana, desvio padrão, etc.)
+        
+        Sem intervalo de datas, a janela das últimas `hours` horas vem dos
+        acumuladores online (média, desvio, mínimo e máximo, em buckets de 5
+        minutos) e dos sketches de quantis dos agregados (mediana e quartis,
+        em horas cheias). As duas janelas não coincidem exatamente: a dos
+        quartis vai em periodo_quartis e eles são limitados a [mínimo,
+        máximo]. Com intervalo, as horas
+        inteiras vêm dos agregados e só as pontas parciais são lidas do banco
+        (ver _range_summary). Com o carregador da requisição, o cálculo é
+        feito sobre as leituras dele.
+        """
         
         if start_date and end_date:
-            data = await self.repository.get_by_date_range(device_id, start_date, end_date)
+            summary = await self._range_summary(device_id, start_date, end_date)
+            if summary is None:
+                return {"erro": "Nenhum dado encontrado"}
+            return AnalyticsService._statistics_response(device_id, *summary)
+        
+        if loader is None and hours <= online_stats.horizon_hours:
+            window = await online_stats.get_window(self.repository, device_id, hours)
+            if not window.readings:
+                return {"erro": "Nenhum dado encontrado"}
+            # Quartis das horas cheias mais próximas da janela (a primeira hora
+            # só entra se ao menos metade dela estiver dentro); a janela deles
+            # vai em periodo_quartis
+            start = datetime.now() - timedelta(hours=hours) + timedelta(minutes=30)
+            buckets = await self.repository.rollups.get_range(
+                device_id, start.replace(minute=0, second=0, microsecond=0)
+            )
+            response = AnalyticsService._statistics_response(
+                device_id,
+                window.start,
+                window.end,
+                window.readings,
+                window.fields,
+                AnalyticsService._merge_sketches(buckets)
+            )
+            if buckets:
+                response["periodo_quartis"] = {
+                    "inicio": kernels.isoformat([buckets[0]['primeira_leitura']])[0],
+                    "fim": kernels.isoformat([max(b['ultima_leitura'] for b in buckets)])[0]
+                }
+            return response
+        
+        data = await self._last_hours(device_id, hours, loader)
+        
+        if not data:
+            return {"erro": "Nenhum dado encontrado"}
+        
+        return await ComputeExecutor.run(AnalyticsService._compute_basic_statistics, device_id, data)
+    
+    async def _split_range(
+        self,
+        device_id: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Tuple[List[Dict], SensorSeries]:
+        """
+        (buckets horários, leituras brutas) que cobrem exatamente [start_date, end_date)
+        
+        Os buckets horários só cobrem horas inteiras e só contêm as leituras
+        até a marca d'água dos agregados. As horas inteiras dentro do
+        intervalo e anteriores à marca d'água vêm dos agregados; as pontas
+        parciais (e o trecho ainda não agregado) são lidas do banco. Nenhuma
+        leitura fora do intervalo entra no resultado.
+        """
+        rollups = self.repository.rollups
+        first_hour = start_date.replace(minute=0, second=0, microsecond=0)
+        if first_hour < start_date:
+            first_hour += timedelta(hours=1)
+        last_hour = end_date.replace(minute=0, second=0, microsecond=0)
+        watermark = (await rollups.ensure_fresh())["marca_dagua"]
+        if watermark is None:
+            last_hour = first_hour
         else:
-            data = await self.repository.get_last_hours(device_id, 24)
+            last_hour = min(last_hour, watermark.replace(minute=0, second=0, microsecond=0))
+        
+        buckets = []
+        edges = [(start_date, end_date)]
+        if first_hour < last_hour:
+            buckets = await rollups.get_range(device_id, first_hour, last_hour - timedelta(microseconds=1))
+            edges = [(start_date, first_hour), (last_hour, end_date)]
+        
+        raw = SensorSeries.concat([
+            await self.repository.get_series(device_id, start, end - timedelta(microseconds=1))
+            for start, end in edges
+            if start < end
+        ])
+        return buckets, raw
+    
+    async def _range_summary(
+        self,
+        device_id: str,
+        start_date: datetime,
+        end_date: datetime
+    ) -> Optional[Tuple[datetime, datetime, int, Dict[str, MomentsAggregator], Dict[str, QuantileSketch]]]:
+        """
+        (primeira leitura, última leitura, total, momentos, sketches) de [start_date, end_date)
+        
+        Buckets e pontas brutas de _split_range: as leituras brutas são
+        somadas aos momentos e aos sketches dos agregados.
+        """
+        buckets, raw = await self._split_range(device_id, start_date, end_date)
+        if not buckets and not raw:
+            return None
+        
+        sketches = AnalyticsService._merge_sketches(buckets)
+        moments = AnalyticsService._rollup_moments(buckets, sketches)
+        for field in ROLLUP_PREFIXES:
+            values = getattr(raw, field)
+            moments[field].update(values)
+            sketches[field] = sketches[field].merge(QuantileSketch.from_values(values))
+        
+        inicio = [b['primeira_leitura'] for b in buckets]
+        fim = [b['ultima_leitura'] for b in buckets]
+        if raw:
+            inicio.append(raw.timestamps[0].astype("datetime64[us]").item())
+            fim.append(raw.timestamps[-1].astype("datetime64[us]").item())
+        total = sum(b['leituras'] for b in buckets) + len(raw)
+        return min(inicio), max(fim), total, moments, sketches
+    
+    @staticmethod
+    def _merge_sketches(buckets: List[Dict]) -> Dict[str, QuantileSketch]:
+        """Sketches de quantis do intervalo, mesclando os histogramas dos buckets"""
+        return {
+            field: QuantileSketch.from_histograms(b.get(f"{prefix}_hist") for b in buckets)
+            for field, prefix in ROLLUP_PREFIXES.items()
+        }
+    
+    @staticmethod
+    def _rollup_moments(buckets: List[Dict], sketches: Dict[str, QuantileSketch]) -> Dict[str, MomentsAggregator]:
+        """Momentos do intervalo a partir das somas dos buckets"""
+        result = {}
+        for field, prefix in ROLLUP_PREFIXES.items():
+            moments = MomentsAggregator()
+            # Leituras com valor (nulos não entram nas somas nem no histograma)
+            n = sketches[field].count
+            if n:
+                total = sum(b[f"{prefix}_soma"] for b in buckets)
+                squares = sum(b[f"{prefix}_soma_quadrados"] for b in buckets)
+                moments.count = n
+                moments.mean = total / n
+                moments.m2 = max(squares - total * total / n, 0.0)
+                moments.min = min(b[f"{prefix}_min"] for b in buckets if b.get(f"{prefix}_min") is not None)
+                moments.max = max(b[f"{prefix}_max"] for b in buckets if b.get(f"{prefix}_max") is not None)
+            result[field] = moments
+        return result
+    
+    @staticmethod
+    def _statistics_response(
+        device_id: str,
+        inicio,
+        fim,
+        total_leituras: int,
+        moments: Dict[str, MomentsAggregator],
+        sketches: Dict[str, QuantileSketch]
+    ) -> Dict:
+        """Resposta de estatísticas a partir de momentos e sketches de quantis"""
+        
+        def summary(field: str) -> Dict:
+            m = moments[field]
+            if m.count == 0:
+                return {
+                    "media": np.nan, "mediana": np.nan, "desvio_padrao": np.nan,
+                    "minimo": np.nan, "maximo": np.nan,
+                    "quartis": {"q1": np.nan, "q2": np.nan, "q3": np.nan}
+                }
+            # Sketches de outra janela (ou o erro de arredondamento) podem
+            # cair fora da faixa dos momentos
+            q1, q2, q3 = np.clip(sketches[field].quantiles([0.25, 0.5, 0.75]), m.min, m.max).tolist()
+            return {
+                "media": round(m.mean, 2),
+                "mediana": round(q2, 2),
+                "desvio_padrao": round(m.std, 2),
+                "minimo": round(m.min, 2),
+                "maximo": round(m.max, 2),
+                "quartis": {
+                    "q1": round(q1, 2),
+                    "q2": round(q2, 2),
+                    "q3": round(q3, 2)
+                }
+            }
+        
+        return {
+            "dispositivo": device_id,
+            "periodo": {
+                "inicio": kernels.isoformat([inicio])[0],
+                "fim": kernels.isoformat([fim])[0]
+            },
+            "temperatura": summary("temperatura"),
+            "umidade": summary("umidade"),
+            "total_leituras": int(total_leituras),
+            "erro_maximo_quartis": SKETCH_ERROR_BOUND
+        }
+    
+    async def get_quantiles(
+        self,
+        device_id: str,
+        start_date: datetime,
+        end_date: Optional[datetime] = None,
+        iqr_k: float = 1.5
+    ) -> Dict:
+        """Percentis e limites IQR de um intervalo qualquer, mesclando os sketches dos agregados"""
+        buckets = await self.repository.rollups.get_range(
+            device_id,
+            start_date,
+            end_date - timedelta(microseconds=1) if end_date else None
+        )
+        sketches = AnalyticsService._merge_sketches(buckets)
+        if not any(sketch.count for sketch in sketches.values()):
+            return {"erro": "Nenhum dado encontrado"}
+        # Leituras inseridas depois da marca d'água ainda não estão nos sketches
+        watermark = (await self.repository.rollups.status())["marca_dagua"]
+        
+        def summary(sketch: QuantileSketch) -> Dict:
+            p05, p25, p50, p75, p95 = sketch.quantiles([0.05, 0.25, 0.5, 0.75, 0.95])
+            _, _, lower, upper = sketch.iqr_bounds(iqr_k)
+            return {
+                "leituras": sketch.count,
+                "percentis": {
+                    "p05": round(p05, 2),
+                    "p25": round(p25, 2),
+                    "p50": round(p50, 2),
+                    "p75": round(p75, 2),
+                    "p95": round(p95, 2)
+                },
+                "iqr": round(p75 - p25, 2),
+                "limite_inferior": round(lower, 2),
+                "limite_superior": round(upper, 2)
+            }
+        
+        return {
+            "dispositivo": device_id,
+            "periodo": {
+                "inicio": min(b['primeira_leitura'] for b in buckets).isoformat(),
+                "fim": max(b['ultima_leitura'] for b in buckets).isoformat()
+            },
+            "temperatura": summary(sketches["temperatura"]),
+            "umidade": summary(sketches["umidade"]),
+            "fator_iqr": iqr_k,
+            "erro_maximo_percentis": SKETCH_ERROR_BOUND,
+            "erro_maximo_limites": round((1 + 2 * iqr_k) * SKETCH_ERROR_BOUND, 3),
+            "buckets_mesclados": len(buckets),
+            "agregados_ate": watermark.isoformat() if watermark else None
+        }
+    
+    async def get_buckets(
+        self,
+        device_id: str,
+        start_date: datetime,
+        end_date: Optional[datetime] = None,
+        granularity: str = "1h",
+        timezone: str = time_buckets.BUCKET_TIMEZONE
+    ) -> Dict:
+        """
+        Médias e extremos por intervalo (1m/5m/15m/1h/6h/1d) no fuso pedido
+        
+        end_date é exclusivo; o início de cada bucket vem no fuso da resposta.
+        """
+        if granularity not in time_buckets.GRANULARITIES:
+            return {"erro": f"Granularidade inválida. Use: {', '.join(time_buckets.GRANULARITIES)}"}
+        if time_buckets.get_zone(timezone) is None:
+            return {"erro": f"Fuso horário inválido: {timezone}"}
+        
+        span = (end_date or datetime.now()) - start_date
+        if span / time_buckets.bin_width(granularity) > MAX_BUCKETS:
+            return {"erro": f"Intervalo longo demais para {granularity} (máximo de {MAX_BUCKETS} buckets)"}
+        
+        buckets = await self.repository.get_buckets(
+            device_id,
+            start_date,
+            end_date - timedelta(microseconds=1) if end_date else None,
+            granularity,
+            timezone
+        )
+        if not buckets:
+            return {"erro": "Nenhum dado encontrado"}
+        
+        def value(v: Optional[float]) -> Optional[float]:
+            return None if v is None else round(v, 2)
+        
+        return {
+            "dispositivo": device_id,
+            "granularidade": granularity,
+            "fuso_horario": timezone,
+            "total_buckets": len(buckets),
+            "buckets": [
+                {
+                    "inicio": time_buckets.local_isoformat(b["inicio"], timezone),
+                    "leituras": b["leituras"],
+                    "temperatura": {
+                        "media": value(b["temp_media"]),
+                        "minima": value(b["temp_min"]),
+                        "maxima": value(b["temp_max"])
+                    },
+                    "umidade": {
+                        "media": value(b["umidade_media"]),
+                        "minima": value(b["umidade_min"]),
+                        "maxima": value(b["umidade_max"])
+                    }
+                }
+                for b in buckets
+            ]
+        }
+    
+    async def get_chart_series(
+        self,
+        device_id: str,
+        start_date: datetime,
+        end_date: Optional[datetime] = None,
+        points: int = 500,
+        method: str = "lttb"
+    ) -> Dict:
+        """
+        Série de um intervalo reduzida a ~`points` pontos para gráficos
+        
+        As leituras vêm do caminho colunar (buffer do change stream / cache
+        de séries para janelas recentes, consulta projetada para intervalos
+        fechados) e cada grandeza é reduzida com LTTB ou M4
+        (utils/downsampling.py). end_date é exclusivo.
+        """
+        if end_date is not None:
+            data = await self.repository.get_series(
+                device_id, start_date, end_date - timedelta(microseconds=1)
+            )
+        else:
+            hours = max(1, math.ceil((datetime.now() - start_date).total_seconds() / 3600))
+            data = (await self.repository.get_last_hours_series(device_id, hours)).between(start_date)
         
         if not data:
             return {"erro": "Nenhum dado encontrado"}
         
-        df = self._to_dataframe(data)
+        return await ComputeExecutor.run(
+            AnalyticsService._compute_chart_series, device_id, points, method, data
+        )
+    
+    @staticmethod
+    def _compute_chart_series(device_id: str, points: int, method: str, data: SensorSeries) -> Dict:
+        """Parte CPU-bound de get_chart_series (roda no ComputeExecutor)"""
+        seconds = (data.timestamps - data.timestamps[0]) / np.timedelta64(1, "s")
+        
+        result = {
+            "dispositivo": device_id,
+            "periodo": {
+                "inicio": kernels.isoformat(data.timestamps[:1])[0],
+                "fim": kernels.isoformat(data.timestamps[-1:])[0]
+            },
+            "metodo": method,
+            "pontos_alvo": points,
+            "total_leituras": len(data)
+        }
+        for field in ("temperatura", "umidade"):
+            values = getattr(data, field)
+            valid = np.flatnonzero(~np.isnan(values))
+            selected = valid[downsample(seconds[valid], values[valid], points, method)]
+            result[field] = [
+                {"timestamp": ts, "valor": round(v, 2)}
+                for ts, v in zip(kernels.isoformat(data.timestamps[selected]), values[selected].tolist())
+            ]
+        return result
+    
+    @staticmethod
+    def _compute_basic_statistics(device_id: str, data: SensorSeries) -> Dict:
+        """Parte CPU-bound de get_basic_statistics (roda no ComputeExecutor)"""
+        df = AnalyticsService._to_dataframe(data)
         
         return {
             "dispositivo": device_id,
@@ -81,11 +501,12 @@ class AnalyticsService:
         self,
         device_id: str,
         hours: int = 24,
-        threshold: float = 3.0
+        threshold: float = 3.0,
+        loader: Optional[DeviceDatasetLoader] = None
     ) -> Dict:
         """Detectar anomalias usando Z-score"""
         try:
-            data = await self.repository.get_last_hours(device_id, hours)
+            data = await self._last_hours(device_id, hours, loader)
             
             if not data or len(data) < 3:
                 return {
@@ -95,60 +516,9 @@ class AnalyticsService:
                     "anomalias": []
                 }
             
-            df = self._to_dataframe(data)
-            
-            # Verificar se há dados suficientes
-            if len(df) < 3:
-                return {
-                    "dispositivo": device_id,
-                    "periodo_horas": hours,
-                    "total_anomalias": 0,
-                    "anomalias": []
-                }
-            
-            # Calcular Z-score com tratamento de erro
-            try:
-                df['temp_zscore'] = np.abs(stats.zscore(df['temperatura'], nan_policy='omit'))
-                df['umid_zscore'] = np.abs(stats.zscore(df['umidade'], nan_policy='omit'))
-            except Exception as e:
-                print(f"⚠️ Erro ao calcular Z-score: {e}")
-                return {
-                    "dispositivo": device_id,
-                    "periodo_horas": hours,
-                    "total_anomalias": 0,
-                    "anomalias": []
-                }
-            
-            # Detectar anomalias
-            temp_anomalies = df[df['temp_zscore'] > threshold]
-            umid_anomalies = df[df['umid_zscore'] > threshold]
-            
-            anomalies = []
-            
-            for _, row in temp_anomalies.iterrows():
-                anomalies.append({
-                    "timestamp": row['timestamp'].isoformat(),
-                    "tipo": "temperatura",
-                    "valor": round(float(row['temperatura']), 2),
-                    "zscore": round(float(row['temp_zscore']), 2),
-                    "gravidade": "alta" if row['temp_zscore'] > 4 else "moderada"
-                })
-            
-            for _, row in umid_anomalies.iterrows():
-                anomalies.append({
-                    "timestamp": row['timestamp'].isoformat(),
-                    "tipo": "umidade",
-                    "valor": round(float(row['umidade']), 2),
-                    "zscore": round(float(row['umid_zscore']), 2),
-                    "gravidade": "alta" if row['umid_zscore'] > 4 else "moderada"
-                })
-            
-            return {
-                "dispositivo": device_id,
-                "periodo_horas": hours,
-                "total_anomalias": len(anomalies),
-                "anomalias": sorted(anomalies, key=lambda x: x['timestamp'], reverse=True)
-            }
+            return await ComputeExecutor.run(
+                AnalyticsService._compute_anomalies, device_id, hours, threshold, data
+            )
         except Exception as e:
             print(f"❌ Erro em detect_anomalies: {str(e)}")
             import traceback
@@ -161,96 +531,242 @@ class AnalyticsService:
                 "erro": str(e)
             }
     
+    @staticmethod
+    def _compute_anomalies(device_id: str, hours: int, threshold: float, data: SensorSeries) -> Dict:
+        """Parte CPU-bound de detect_anomalies (roda no ComputeExecutor)"""
+        # Verificar se há dados suficientes
+        if len(data) < 3:
+            return {
+                "dispositivo": device_id,
+                "periodo_horas": hours,
+                "total_anomalias": 0,
+                "anomalias": []
+            }
+        
+        # Calcular Z-score com tratamento de erro
+        try:
+            temp_zscore = np.abs(stats.zscore(data.temperatura, nan_policy='omit'))
+            umid_zscore = np.abs(stats.zscore(data.umidade, nan_policy='omit'))
+        except Exception as e:
+            print(f"⚠️ Erro ao calcular Z-score: {e}")
+            return {
+                "dispositivo": device_id,
+                "periodo_horas": hours,
+                "total_anomalias": 0,
+                "anomalias": []
+            }
+        
+        # Detectar anomalias
+        anomalies = (
+            kernels.anomaly_rows(data.timestamps, data.temperatura, temp_zscore, threshold, "temperatura")
+            + kernels.anomaly_rows(data.timestamps, data.umidade, umid_zscore, threshold, "umidade")
+        )
+        
+        return {
+            "dispositivo": device_id,
+            "periodo_horas": hours,
+            "total_anomalias": len(anomalies),
+            "anomalias": sorted(anomalies, key=lambda x: x['timestamp'], reverse=True)
+        }
+    
+    async def _regression_sums(
+        self,
+        device_id: str,
+        days: int,
+        loader: Optional[DeviceDatasetLoader] = None
+    ) -> RegressionSums:
+        """
+        Somas suficientes dos últimos `days` dias
+
+        Cobrem a mesma janela das leituras brutas (a do Spearman): as horas
+        inteiras vêm das somas reg_* dos agregados e as pontas, inclusive o
+        trecho ainda não agregado, das leituras (ver _split_range); com o
+        carregador da requisição, são calculadas sobre as leituras dele.
+        """
+        if loader is not None:
+            data = await loader.last_hours(days * 24)
+            if not data:
+                return RegressionSums()
+            return RegressionSums.from_arrays(data.timestamps, data.temperatura, data.umidade)
+        
+        end = datetime.now()
+        start = end - timedelta(days=days)
+        buckets, raw = await self._split_range(device_id, start, end)
+        # Origem comum às duas partes, para que as somas se combinem
+        return RegressionSums.from_buckets(buckets, origin=start).merge(
+            RegressionSums.from_arrays(raw.timestamps, raw.temperatura, raw.umidade, origin=start)
+        )
+    
     async def get_trends(
         self,
         device_id: str,
-        days: int = 7
+        days: int = 7,
+        loader: Optional[DeviceDatasetLoader] = None
     ) -> Dict:
-        """Análise de tendências usando regressão linear"""
-        data = await self.repository.get_last_hours(device_id, days * 24)
+        """Análise de tendências usando regressão linear (forma fechada sobre as somas)"""
+        sums = await self._regression_sums(device_id, days, loader)
         
-        if not data or len(data) < 10:
+        if sums.n < 10:
             return {"erro": "Dados insuficientes para análise de tendência"}
         
-        df = self._to_dataframe(data)
-        
-        # Preparar dados para regressão
-        df['timestamp_numeric'] = (df['timestamp'] - df['timestamp'].min()).dt.total_seconds()
-        
-        X = df['timestamp_numeric'].values.reshape(-1, 1)
-        
-        # Regressão para temperatura
-        temp_model = LinearRegression()
-        temp_model.fit(X, df['temperatura'].values)
-        temp_slope = temp_model.coef_[0]
-        temp_r2 = temp_model.score(X, df['temperatura'].values)
-        
-        # Regressão para umidade
-        umid_model = LinearRegression()
-        umid_model.fit(X, df['umidade'].values)
-        umid_slope = umid_model.coef_[0]
-        umid_r2 = umid_model.score(X, df['umidade'].values)
-        
-        # Converter tendência para unidade por hora
-        temp_trend_per_hour = temp_slope * 3600
-        umid_trend_per_hour = umid_slope * 3600
+        return AnalyticsService._trends_response(device_id, days, sums)
+    
+    @staticmethod
+    def _trends_response(device_id: str, days: int, sums: RegressionSums) -> Dict:
+        """Inclinação (por hora) e R² de cada grandeza em função do tempo"""
+        def trend(field: str) -> Dict:
+            slope, r2 = sums.trend(field)
+            return {
+                "tendencia": "aumentando" if slope > 0 else "diminuindo" if slope < 0 else "estável",
+                "variacao_por_hora": round(slope, 4),
+                "variacao_por_dia": round(slope * 24, 2),
+                "r_squared": round(r2, 4),
+                "confiabilidade": "alta" if r2 > 0.7 else "moderada" if r2 > 0.4 else "baixa"
+            }
         
         return {
             "dispositivo": device_id,
             "periodo_dias": days,
-            "temperatura": {
-                "tendencia": "aumentando" if temp_slope > 0 else "diminuindo" if temp_slope < 0 else "estável",
-                "variacao_por_hora": round(temp_trend_per_hour, 4),
-                "variacao_por_dia": round(temp_trend_per_hour * 24, 2),
-                "r_squared": round(temp_r2, 4),
-                "confiabilidade": "alta" if temp_r2 > 0.7 else "moderada" if temp_r2 > 0.4 else "baixa"
-            },
-            "umidade": {
-                "tendencia": "aumentando" if umid_slope > 0 else "diminuindo" if umid_slope < 0 else "estável",
-                "variacao_por_hora": round(umid_trend_per_hour, 4),
-                "variacao_por_dia": round(umid_trend_per_hour * 24, 2),
-                "r_squared": round(umid_r2, 4),
-                "confiabilidade": "alta" if umid_r2 > 0.7 else "moderada" if umid_r2 > 0.4 else "baixa"
-            }
+            "temperatura": trend("temperatura"),
+            "umidade": trend("umidade")
         }
     
     async def get_correlation_analysis(
         self,
         device_id: str,
-        days: int = 7
+        days: int = 7,
+        loader: Optional[DeviceDatasetLoader] = None,
+        spearman: bool = True
     ) -> Dict:
-        """Análise de correlação entre temperatura e umidade"""
-        data = await self.repository.get_last_hours(device_id, days * 24)
+        """
+        Análise de correlação entre temperatura e umidade
         
-        if not data or len(data) < 10:
-            return {"erro": "Dados insuficientes"}
+        Pearson sai das somas suficientes; Spearman depende dos postos das
+        leituras e é o único que precisa da série bruta (spearman=False o omite).
+        """
+        sums = await self._regression_sums(device_id, days, loader)
         
-        df = self._to_dataframe(data)
+        if sums.n < 10:
+            return {"erro": "Dados insuficientes"}
         
-        # Correlação de Pearson
-        pearson_corr, pearson_pvalue = stats.pearsonr(df['temperatura'], df['umidade'])
+        pearson_corr, pearson_pvalue = sums.pearson()
+        result = {
+            "dispositivo": device_id,
+            "periodo_dias": days,
+            "correlacao_pearson": AnalyticsService._correlation_metric(pearson_corr, pearson_pvalue)
+        }
         
-        # Correlação de Spearman
-        spearman_corr, spearman_pvalue = stats.spearmanr(df['temperatura'], df['umidade'])
+        if spearman:
+            data = await self._last_hours(device_id, days * 24, loader)
+            if not data:
+                return {"erro": "Dados insuficientes"}
+            spearman_corr, spearman_pvalue = await ComputeExecutor.run(
+                AnalyticsService._compute_spearman, data
+            )
+            result["correlacao_spearman"] = AnalyticsService._correlation_metric(
+                spearman_corr, spearman_pvalue
+            )
         
+        return result
+    
+    @staticmethod
+    def _compute_spearman(data: SensorSeries) -> Tuple[float, float]:
+        """Parte CPU-bound do Spearman (roda no ComputeExecutor)"""
+        valid = ~(np.isnan(data.temperatura) | np.isnan(data.umidade))
+        corr, pvalue = stats.spearmanr(data.temperatura[valid], data.umidade[valid])
+        return float(corr), float(pvalue)
+    
+    @staticmethod
+    def _correlation_metric(corr: float, pvalue: float) -> Dict:
         return {
-            "dispositivo": device_id,
+            "coeficiente": round(corr, 4),
+            "p_valor": round(pvalue, 6),
+            "significativo": pvalue < 0.05,
+            "interpretacao": AnalyticsService._interpret_correlation(corr)
+        }
+    
+    async def get_cross_device_correlation(
+        self,
+        days: int = 7,
+        bin_minutes: int = 60,
+        device_ids: Optional[List[str]] = None
+    ) -> Dict:
+        """
+        Matrizes de correlação de temperatura e umidade entre dispositivos
+        
+        Todas as séries vêm de uma única agregação (médias por intervalo de
+        `bin_minutes`), são alinhadas em uma grade comum e cada matriz sai
+        de uma operação matricial sobre a grade (utils/cross_correlation.py).
+        """
+        if device_ids is not None:
+            device_ids = list(dict.fromkeys(device_ids))
+        end = datetime.now()
+        start = end - timedelta(days=days)
+        series = await self.repository.get_resampled_series_bulk(start, device_ids, bin_minutes)
+        
+        ids = device_ids if device_ids is not None else sorted(series)
+        if sum(1 for d in ids if d in series) < 2:
+            return {"erro": "São necessários ao menos 2 dispositivos com dados"}
+        
+        return await ComputeExecutor.run(
+            AnalyticsService._compute_cross_correlation,
+            ids, series, start, end, days, bin_minutes
+        )
+    
+    @staticmethod
+    def _compute_cross_correlation(
+        device_ids: List[str],
+        series: Dict[str, SensorSeries],
+        start: datetime,
+        end: datetime,
+        days: int,
+        bin_minutes: int
+    ) -> Dict:
+        """Parte CPU-bound de get_cross_device_correlation (roda no ComputeExecutor)"""
+        def as_lists(matrix: np.ndarray, digits: int = 4) -> List[List[Optional[float]]]:
+            return [
+                [None if np.isnan(v) else round(v, digits) for v in row]
+                for row in matrix.tolist()
+            ]
+        
+        result = {
             "periodo_dias": days,
-            "correlacao_pearson": {
-                "coeficiente": round(pearson_corr, 4),
-                "p_valor": round(pearson_pvalue, 6),
-                "significativo": pearson_pvalue < 0.05,
-                "interpretacao": self._interpret_correlation(pearson_corr)
-            },
-            "correlacao_spearman": {
-                "coeficiente": round(spearman_corr, 4),
-                "p_valor": round(spearman_pvalue, 6),
-                "significativo": spearman_pvalue < 0.05,
-                "interpretacao": self._interpret_correlation(spearman_corr)
-            }
+            "intervalo_minutos": bin_minutes,
+            "dispositivos": device_ids,
+            "intervalos_grade": 0
         }
+        pearson = {}
+        for field in ("temperatura", "umidade"):
+            grid = cross_correlation.align_to_grid(
+                series, device_ids, np.datetime64(start), np.datetime64(end), bin_minutes, field
+            )
+            pearson[field], overlap = cross_correlation.masked_corrcoef(grid)
+            spearman, _ = cross_correlation.masked_corrcoef(cross_correlation.rank_columns(grid))
+            result["intervalos_grade"] = len(grid)
+            result[field] = {
+                "pearson": as_lists(pearson[field]),
+                "spearman": as_lists(spearman),
+                "intervalos_comuns": overlap.tolist()
+            }
+        
+        # Pares que mais variam juntos (Pearson da temperatura)
+        i, j = np.triu_indices(len(device_ids), k=1)
+        temp_r = pearson["temperatura"][i, j]
+        umid_r = pearson["umidade"][i, j]
+        order = [k for k in np.argsort(-temp_r, kind="stable") if not np.isnan(temp_r[k])][:10]
+        result["pares_mais_correlacionados"] = [
+            {
+                "dispositivos": [device_ids[i[k]], device_ids[j[k]]],
+                "temperatura": round(float(temp_r[k]), 4),
+                "umidade": None if np.isnan(umid_r[k]) else round(float(umid_r[k]), 4),
+                "interpretacao": AnalyticsService._interpret_correlation(float(temp_r[k]))
+            }
+            for k in order
+        ]
+        return result
     
-    def _interpret_correlation(self, corr: float) -> str:
+    @staticmethod
+    def _interpret_correlation(corr: float) -> str:
         """Interpretar coeficiente de correlação"""
         abs_corr = abs(corr)
         direction = "negativa" if corr < 0 else "positiva"
@@ -269,64 +785,45 @@ class AnalyticsService:
     async def get_comfort_analysis(
         self,
         device_id: str,
-        hours: int = 24
+        hours: int = 24,
+        loader: Optional[DeviceDatasetLoader] = None
     ) -> Dict:
         """Análise de conforto térmico baseado em índices"""
-        data = await self.repository.get_last_hours(device_id, hours)
+        data = await self._last_hours(device_id, hours, loader)
         
         if not data:
             return {"erro": "Nenhum dado encontrado"}
         
-        df = self._to_dataframe(data)
-        
+        return await ComputeExecutor.run(AnalyticsService._compute_comfort, device_id, hours, data)
+    
+    @staticmethod
+    def _compute_comfort(device_id: str, hours: int, data: SensorSeries) -> Dict:
+        """Parte CPU-bound de get_comfort_analysis (roda no ComputeExecutor)"""
         # Calcular índice de desconforto (Heat Index simplificado)
-        df['indice_desconforto'] = df.apply(
-            lambda row: self._calculate_heat_index(row['temperatura'], row['umidade']),
-            axis=1
-        )
+        indice_desconforto = kernels.heat_index(data.temperatura, data.umidade)
         
         # Classificar conforto
-        df['conforto'] = df['indice_desconforto'].apply(self._classify_comfort)
-        
-        comfort_distribution = df['conforto'].value_counts().to_dict()
+        comfort_distribution = kernels.value_counts(kernels.comfort_classes(indice_desconforto))
         
         return {
             "dispositivo": device_id,
             "periodo_horas": hours,
-            "indice_medio": round(df['indice_desconforto'].mean(), 2),
+            "indice_medio": round(float(np.nanmean(indice_desconforto)), 2),
             "distribuicao_conforto": comfort_distribution,
             "percentual_confortavel": round(
-                (comfort_distribution.get('confortável', 0) / len(df)) * 100, 2
+                (comfort_distribution.get('confortável', 0) / len(data)) * 100, 2
             ),
-            "recomendacoes": self._generate_comfort_recommendations(df)
+            "recomendacoes": AnalyticsService._generate_comfort_recommendations(
+                float(np.nanmean(data.temperatura)),
+                float(np.nanmean(data.umidade))
+            )
         }
     
-    def _calculate_heat_index(self, temp: float, humidity: float) -> float:
-        """Calcular índice de calor simplificado"""
-        # Fórmula simplificada do Heat Index
-        hi = temp + (0.5555 * (6.11 * np.exp(5417.7530 * ((1/273.16) - (1/(temp+273.15)))) * (humidity/100) - 10))
-        return hi
-    
-    def _classify_comfort(self, heat_index: float) -> str:
-        """Classificar nível de conforto"""
-        if heat_index < 24:
-            return "muito confortável"
-        elif heat_index < 27:
-            return "confortável"
-        elif heat_index < 30:
-            return "levemente desconfortável"
-        elif heat_index < 33:
-            return "desconfortável"
-        else:
-            return "muito desconfortável"
-    
-    def _generate_comfort_recommendations(self, df: pd.DataFrame) -> List[str]:
+    @staticmethod
+    def _generate_comfort_recommendations(avg_temp: float, avg_humidity: float) -> List[str]:
         """Gerar recomendações baseadas nos dados"""
         recommendations = []
         
-        avg_temp = df['temperatura'].mean()
-        avg_humidity = df['umidade'].mean()
-        
         if avg_temp > 26:
             recommendations.append("Temperatura acima do ideal. Considere melhorar a ventilação ou climatização.")
         if avg_temp < 18:
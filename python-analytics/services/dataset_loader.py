@@ -0,0 +1,88 @@
+from typing import AsyncIterator, Dict, List, Optional
+from datetime import datetime, timedelta
+import asyncio
+from models.sensor_series import SensorSeries
+from repositories.sensor_repository import SensorRepository
+
+
+class DeviceDatasetLoader:
+    """
+    Carregador de dados com escopo de requisição
+
+    Busca uma única vez a janela mais larga pedida para o dispositivo e
+    entrega às análises fatias dessa série (views, sem cópia), evitando
+    uma consulta ao MongoDB por análise.
+    """
+
+    def __init__(self, device_id: str, repository: Optional[SensorRepository] = None):
+        self.device_id = device_id
+        self.repository = repository or SensorRepository()
+        self.reference_time: Optional[datetime] = None
+        self.loaded_hours = 0
+        self.series = SensorSeries.empty()
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_series(
+        cls,
+        device_id: str,
+        series: SensorSeries,
+        hours: int,
+        reference_time: datetime,
+        repository: Optional[SensorRepository] = None
+    ) -> "DeviceDatasetLoader":
+        """Carregador já preenchido com uma janela buscada em lote (ex.: get_series_bulk)"""
+        loader = cls(device_id, repository)
+        loader.series = series
+        loader.loaded_hours = hours
+        loader.reference_time = reference_time
+        return loader
+
+    @classmethod
+    async def preload_many(
+        cls,
+        device_ids: Optional[List[str]],
+        hours: int,
+        repository: Optional[SensorRepository] = None
+    ) -> Dict[str, "DeviceDatasetLoader"]:
+        """
+        Carregadores de vários dispositivos com uma única consulta ao MongoDB
+
+        device_ids=None carrega todos os dispositivos com leituras na janela;
+        dispositivos pedidos sem leituras recebem um carregador vazio.
+        """
+        repository = repository or SensorRepository()
+        reference_time = datetime.now()
+        series = await repository.get_series_bulk(
+            reference_time - timedelta(hours=hours), device_ids
+        )
+        ids = device_ids if device_ids is not None else sorted(series)
+        return {
+            device_id: cls.from_series(
+                device_id, series.get(device_id, SensorSeries.empty()),
+                hours, reference_time, repository
+            )
+            for device_id in ids
+        }
+
+    async def preload(self, hours: int) -> None:
+        """Carregar a janela das últimas `hours` horas, se ainda não coberta"""
+        async with self._lock:
+            if self.reference_time is not None and hours <= self.loaded_hours:
+                return
+
+            self.reference_time = datetime.now()
+            self.series = await self.repository.get_last_hours_series(self.device_id, hours)
+            self.loaded_hours = hours
+
+    async def last_hours(self, hours: int) -> SensorSeries:
+        """Leituras das últimas `hours` horas (relativas ao início da requisição)"""
+        await self.preload(hours)
+        start = self.reference_time - timedelta(hours=hours)
+        return self.series.between(start)
+
+    async def iter_last_hours(self, hours: int) -> AsyncIterator[SensorSeries]:
+        """Mesma interface de SensorRepository.iter_last_hours, com um único lote (nenhum se vazio)"""
+        series = await self.last_hours(hours)
+        if len(series):
+            yield series
@@ -0,0 +1,219 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+import asyncio
+import math
+import multiprocessing
+import os
+import time
+from models.sensor_series import SensorSeries
+from repositories.sensor_repository import SensorRepository
+from repositories.forecast_repository import ForecastRepository
+from repositories.forecast_model_store import model_store
+from services.forecast_service import (
+    FLEET_FORECAST_MAX_AGE_HOURS,
+    FORECAST_MODEL_PARAMS,
+    FORECAST_RESAMPLE_MINUTES,
+    ForecastService
+)
+
+# Processos usados para treinar os modelos da frota
+FLEET_FORECAST_WORKERS = int(os.getenv("FLEET_FORECAST_WORKERS", os.cpu_count() or 2))
+
+METRICS = ("temperatura", "umidade")
+
+
+def _forecast_device(
+    engine: str,
+    column: str,
+    data: SensorSeries,
+    start: datetime,
+    days_forecast: int,
+    min_points: int,
+    bin_minutes: int,
+    model_path: str
+) -> Dict:
+    """Treinar e prever uma métrica de um dispositivo (roda no pool de processos)"""
+    if engine == "harmonico":
+        forecast = ForecastService._fit_predict_harmonic(
+            data, column, days_forecast, min_points, start, bin_minutes
+        )
+        if forecast is None:
+            return {"erro": "Dados insuficientes após limpeza (NaN)"}
+        return forecast
+
+    meta = ForecastService._fit_model(
+        data, column, model_path, min_points, bin_minutes,
+        **FORECAST_MODEL_PARAMS[column]
+    )
+    if meta is None:
+        return {"erro": "Dados insuficientes após limpeza (NaN)"}
+
+    previsoes = ForecastService._predict(model_path, max(start, meta["ultima_leitura"]), days_forecast)
+    return {"previsoes": previsoes, "meta": meta}
+
+
+class FleetForecastService:
+    """
+    Previsão em lote de todos os dispositivos
+
+    Carrega os históricos reamostrados da frota em uma única agregação,
+    treina temperatura e umidade de cada dispositivo em paralelo num pool
+    de processos e grava o resultado na coleção 'previsoes', de onde os
+    endpoints por dispositivo passam a ler. Com Prophet, os modelos
+    treinados também vão para o armazenamento de modelos.
+
+    O horizonte gravado tem dias extras para cobrir FLEET_FORECAST_MAX_AGE_HOURS:
+    uma previsão de 7 dias gerada à noite ainda atende pedidos de 7 dias
+    durante o dia seguinte.
+    """
+
+    def __init__(self):
+        self.repository = SensorRepository()
+        self.forecast_repository = ForecastRepository()
+        self.forecast_service = ForecastService()
+        self.last_run: Optional[Dict] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, **params) -> Dict:
+        """Iniciar uma execução em segundo plano (uma por vez)"""
+        if not self.running:
+            self.last_run = {"status": "executando", "iniciado_em": datetime.now().isoformat(), **params}
+            self._task = asyncio.create_task(self.run(**params))
+        return self.last_run
+
+    async def _load_histories(self, devices: List[str], days_history: int) -> Dict[str, SensorSeries]:
+        start = datetime.now() - timedelta(days=days_history)
+        if FORECAST_RESAMPLE_MINUTES > 0:
+            return await self.repository.get_resampled_series_bulk(
+                start,
+                device_ids=devices,
+                bin_minutes=FORECAST_RESAMPLE_MINUTES
+            )
+
+        series = await asyncio.gather(*(self.repository.get_series(d, start) for d in devices))
+        return dict(zip(devices, series))
+
+    async def run(
+        self,
+        days_history: int = 30,
+        days_forecast: int = 7,
+        engine: str = "prophet",
+        workers: int = FLEET_FORECAST_WORKERS
+    ) -> Dict:
+        """Executar a previsão de toda a frota e gravar os resultados"""
+        started = time.time()
+        try:
+            if engine not in ("prophet", "harmonico"):
+                raise ValueError(f"Motor de previsão inválido: {engine}. Use prophet ou harmonico")
+
+            devices = await self.repository.get_all_devices()
+            histories = await self._load_histories(devices, days_history)
+            latest = {
+                doc["_id"]: doc["timestamp"]
+                for doc in await self.repository.get_latest_per_device()
+            }
+            min_points = self.forecast_service._min_training_points()
+            stored_days = days_forecast + math.ceil(FLEET_FORECAST_MAX_AGE_HOURS / 24)
+
+            failures = []
+            tasks = []
+            for device_id in devices:
+                data = histories.get(device_id)
+                if data is None or len(data) < min_points:
+                    failures.extend(
+                        {"dispositivo": device_id, "metrica": m, "erro": "Dados insuficientes"}
+                        for m in METRICS
+                    )
+                    continue
+                start = latest.get(device_id) or data.timestamps[-1].astype("datetime64[us]").item()
+                for column in METRICS:
+                    # Prophet treina em um arquivo próprio; a troca pelo modelo
+                    # salvo acontece abaixo, com o lock do modelo
+                    staging = model_store.staging_path((device_id, column, days_history))
+                    tasks.append((device_id, column, data, start, staging))
+
+            loop = asyncio.get_running_loop()
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            ) as pool:
+                results = await asyncio.gather(
+                    *(
+                        loop.run_in_executor(
+                            pool,
+                            _forecast_device,
+                            engine,
+                            column,
+                            data,
+                            start,
+                            stored_days,
+                            min_points,
+                            FORECAST_RESAMPLE_MINUTES,
+                            staging
+                        )
+                        for device_id, column, data, start, staging in tasks
+                    ),
+                    return_exceptions=True
+                )
+
+            generated_at = datetime.now()
+            forecasts = []
+            for (device_id, column, _, _, staging), result in zip(tasks, results):
+                if isinstance(result, Exception):
+                    result = {"erro": str(result)}
+                if "erro" in result:
+                    model_store.discard_staging(staging)
+                    failures.append({"dispositivo": device_id, "metrica": column, "erro": result["erro"]})
+                    continue
+
+                if engine == "prophet":
+                    key = (device_id, column, days_history)
+                    async with model_store.lock(key):
+                        model_store.install_model(key, staging, result["meta"])
+                    model_store.fits += 1
+                    modelo = self.forecast_service._model_info({**result["meta"], "reutilizado": False})
+                else:
+                    modelo = result["modelo"]
+
+                forecasts.append({
+                    "dispositivo": device_id,
+                    "metrica": column,
+                    "motor": engine,
+                    "dias_historico": days_history,
+                    "dias_previstos": days_forecast,
+                    "gerado_em": generated_at,
+                    "previsoes": result["previsoes"],
+                    "modelo": modelo
+                })
+
+            await self.forecast_repository.save_many(forecasts)
+
+            self.last_run = {
+                "status": "concluido",
+                "motor": engine,
+                "days_history": days_history,
+                "days_forecast": days_forecast,
+                "workers": workers,
+                "dispositivos": len(devices),
+                "previsoes_gravadas": len(forecasts),
+                "falhas": failures,
+                "duracao_segundos": round(time.time() - started, 2),
+                "finalizado_em": datetime.now().isoformat()
+            }
+        except Exception as e:
+            self.last_run = {
+                "status": "erro",
+                "erro": str(e),
+                "duracao_segundos": round(time.time() - started, 2),
+                "finalizado_em": datetime.now().isoformat()
+            }
+        return self.last_run
+
+
+# Instância compartilhada (uma execução da frota por vez no processo)
+fleet_forecasts = FleetForecastService()
@@ -0,0 +1,166 @@
+from typing import Dict, Optional, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import os
+import uuid
+from services.forecast_service import ForecastService
+
+# Previsões executadas ao mesmo tempo pelos jobs (o treino roda no ComputeExecutor)
+FORECAST_JOB_WORKERS = int(os.getenv("FORECAST_JOB_WORKERS", 2))
+# Jobs aguardando vaga além disso são recusados
+FORECAST_JOB_MAX_PENDING = int(os.getenv("FORECAST_JOB_MAX_PENDING", 100))
+# Tempo que um job finalizado continua disponível para consulta
+FORECAST_JOB_TTL_SECONDS = int(os.getenv("FORECAST_JOB_TTL_SECONDS", 3600))
+
+JobKey = Tuple[str, str, int, int]
+
+
+class ForecastJob:
+    """Estado de uma previsão submetida em segundo plano"""
+
+    def __init__(self, key: JobKey):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = "pendente"
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("concluido", "erro")
+
+    def to_dict(self) -> Dict:
+        device_id, metric, days_history, days_forecast = self.key
+        job = {
+            "job_id": self.id,
+            "status": self.status,
+            "dispositivo": device_id,
+            "metrica": metric,
+            "days_history": days_history,
+            "days_forecast": days_forecast,
+            "criado_em": self.created_at.isoformat(),
+            "iniciado_em": self.started_at.isoformat() if self.started_at else None,
+            "finalizado_em": self.finished_at.isoformat() if self.finished_at else None
+        }
+        if self.status == "concluido":
+            job["resultado"] = self.result
+        elif self.status == "erro":
+            job["erro"] = self.error
+        return job
+
+
+class ForecastJobService:
+    """
+    Fila de previsões assíncronas com deduplicação
+
+    Jobs idênticos em andamento (mesmo dispositivo, métrica e parâmetros)
+    são unificados: a nova submissão recebe o job já existente. No máximo
+    `workers` previsões rodam ao mesmo tempo; os demais jobs aguardam vaga.
+    O estado fica em memória no processo da API.
+    """
+
+    METRICS = ("temperatura", "umidade")
+
+    def __init__(
+        self,
+        forecast_service: Optional[ForecastService] = None,
+        workers: int = FORECAST_JOB_WORKERS,
+        max_pending: int = FORECAST_JOB_MAX_PENDING,
+        ttl_seconds: int = FORECAST_JOB_TTL_SECONDS
+    ):
+        self.forecast_service = forecast_service or ForecastService()
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.jobs: Dict[str, ForecastJob] = {}
+        self.in_flight: Dict[JobKey, str] = {}
+        self.coalesced = 0
+        self._slots = asyncio.Semaphore(workers)
+
+    def submit(
+        self,
+        device_id: str,
+        metric: str,
+        days_history: int = 30,
+        days_forecast: int = 7
+    ) -> Dict:
+        """Submeter uma previsão (ou reaproveitar o job idêntico em andamento)"""
+        if metric not in self.METRICS:
+            return {"erro": f"Métrica inválida: {metric}. Use {', '.join(self.METRICS)}"}
+
+        self._purge_finished()
+
+        key = (device_id, metric, days_history, days_forecast)
+        job_id = self.in_flight.get(key)
+        if job_id is not None:
+            self.coalesced += 1
+            return {**self.jobs[job_id].to_dict(), "coalescido": True}
+
+        pending = sum(1 for job in self.jobs.values() if job.status == "pendente")
+        if pending >= self.max_pending:
+            return {"erro": "Fila de previsões cheia, tente novamente mais tarde"}
+
+        job = ForecastJob(key)
+        self.jobs[job.id] = job
+        self.in_flight[key] = job.id
+        job.task = asyncio.create_task(self._run(job))
+        return {**job.to_dict(), "coalescido": False}
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        job = self.jobs.get(job_id)
+        return job.to_dict() if job else None
+
+    async def _run(self, job: ForecastJob) -> None:
+        device_id, metric, days_history, days_forecast = job.key
+        forecast = {
+            "temperatura": self.forecast_service.forecast_temperature,
+            "umidade": self.forecast_service.forecast_humidity
+        }[metric]
+
+        try:
+            async with self._slots:
+                job.status = "executando"
+                job.started_at = datetime.now()
+                result = await forecast(device_id, days_history, days_forecast)
+
+            if "erro" in result:
+                job.status = "erro"
+                job.error = result["erro"]
+            else:
+                job.status = "concluido"
+                job.result = result
+        except Exception as e:
+            job.status = "erro"
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.now()
+            self.in_flight.pop(job.key, None)
+
+    def _purge_finished(self) -> None:
+        """Remover jobs finalizados há mais que o TTL"""
+        limit = datetime.now() - self.ttl
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.finished and job.finished_at < limit
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def stats(self) -> Dict:
+        counts = {"pendente": 0, "executando": 0, "concluido": 0, "erro": 0}
+        for job in self.jobs.values():
+            counts[job.status] += 1
+        return {
+            "workers": self.workers,
+            "max_pendentes": self.max_pending,
+            "jobs": counts,
+            "coalescidos": self.coalesced
+        }
+
+
+# Instância compartilhada (estado dos jobs em memória do processo)
+forecast_jobs = ForecastJobService()
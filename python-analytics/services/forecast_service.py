@@ -1,82 +1,110 @@
 import pandas as pd
-from typing import Dict, List
+import numpy as np
+from typing import AsyncIterator, Dict, List, Optional
 from datetime import datetime, timedelta
+from models.sensor_series import SensorSeries
 from repositories.sensor_repository import SensorRepository
+from repositories.forecast_repository import ForecastRepository
+from services.dataset_loader import DeviceDatasetLoader
+from config.compute_executor import ComputeExecutor
+from repositories.forecast_model_store import (
+    FORECAST_REFIT_INTERVAL_SECONDS,
+    load_model,
+    model_store,
+    save_model
+)
+from repositories.profile_store import WEEKDAYS, DeviceProfile, WeeklyProfile, profile_store
+from utils.chunk_aggregators import MomentsAggregator
+from utils.harmonic_forecaster import HarmonicForecaster
+from utils import kernels
+from utils.time_buckets import BUCKET_TIMEZONE, get_zone
+import asyncio
+import os
 import warnings
 warnings.filterwarnings('ignore')
 
+# Resolução da série de treino (média por intervalo, calculada no MongoDB).
+# 0 treina com as leituras brutas.
+FORECAST_RESAMPLE_MINUTES = int(os.getenv("FORECAST_RESAMPLE_MINUTES", 60))
+
+# Mínimo para treinar: 100 leituras brutas ou 1 dia de intervalos reamostrados
+MIN_RAW_TRAINING_POINTS = 100
+MIN_RESAMPLED_TRAINING_HOURS = 24
+
+# Idade máxima de uma previsão gravada pela execução em lote para ser servida
+FLEET_FORECAST_MAX_AGE_HOURS = float(os.getenv("FLEET_FORECAST_MAX_AGE_HOURS", 24))
+
+# Parâmetros específicos de cada métrica (somados aos comuns em _fit_model)
+FORECAST_MODEL_PARAMS = {
+    'temperatura': {'yearly_seasonality': False},
+    'umidade': {}
+}
+
 class ForecastService:
     """Serviço para previsões e análises avançadas"""
     
     def __init__(self):
         self.repository = SensorRepository()
+        self.forecast_repository = ForecastRepository()
+    
+    async def _last_hours(
+        self,
+        device_id: str,
+        hours: int,
+        loader: Optional[DeviceDatasetLoader] = None
+    ) -> SensorSeries:
+        """Buscar a janela no carregador da requisição (se houver) ou no repositório"""
+        if loader is not None:
+            return await loader.last_hours(hours)
+        return await self.repository.get_last_hours_series(device_id, hours)
+    
+    def _iter_last_hours(
+        self,
+        device_id: str,
+        hours: int,
+        loader: Optional[DeviceDatasetLoader] = None
+    ) -> AsyncIterator[SensorSeries]:
+        """Iterar em lotes pelo repositório ou pela fatia já carregada"""
+        if loader is not None:
+            return loader.iter_last_hours(hours)
+        return self.repository.iter_last_hours(device_id, hours)
     
     async def forecast_temperature(
         self,
         device_id: str,
         days_history: int = 30,
-        days_forecast: int = 7
+        days_forecast: int = 7,
+        loader: Optional[DeviceDatasetLoader] = None,
+        engine: str = "prophet"
     ) -> Dict:
         """
-        Prever temperatura usando Prophet
+        Prever temperatura usando Prophet ou regressão harmônica
         
         Args:
             device_id: ID do dispositivo
             days_history: Dias de histórico para treinar
             days_forecast: Dias para prever
+            engine: "prophet" ou "harmonico" (rápido, não requer Prophet)
         """
         try:
-            from prophet import Prophet
-            
-            # Buscar dados históricos
-            data = await self.repository.get_last_hours(device_id, days_history * 24)
-            
-            if not data or len(data) < 100:
-                return {"erro": "Dados insuficientes para previsão (mínimo 100 leituras)"}
-            
-            # Preparar dados para Prophet
-            df = pd.DataFrame(data)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df = df.dropna(subset=['temperatura', 'timestamp'])
-            
-            if len(df) < 100:
-                 return {"erro": "Dados insuficientes após limpeza (NaN)"}
-
-            # Prophet requer colunas 'ds' (data) e 'y' (valor)
-            prophet_df = pd.DataFrame({
-                'ds': df['timestamp'],
-                'y': df['temperatura']
-            })
-            
-            # Criar e treinar modelo
-            model = Prophet(
-                daily_seasonality=True,
-                weekly_seasonality=True,
-                yearly_seasonality=False,
-                changepoint_prior_scale=0.05
+            forecast = await self._forecast(
+                device_id,
+                'temperatura',
+                days_history,
+                days_forecast,
+                loader,
+                engine,
+                insufficient_message="Dados insuficientes para previsão (mínimo 100 leituras)"
             )
-            model.fit(prophet_df)
-            
-            # Criar dataframe para previsão
-            future = model.make_future_dataframe(periods=days_forecast * 24, freq='H')
-            forecast = model.predict(future)
-            
-            # Extrair apenas previsões futuras
-            future_forecast = forecast[forecast['ds'] > prophet_df['ds'].max()]
+            if "erro" in forecast:
+                return forecast
             
             return {
                 "dispositivo": device_id,
                 "tipo": "temperatura",
                 "dias_previstos": days_forecast,
-                "previsoes": [
-                    {
-                        "timestamp": row['ds'].isoformat(),
-                        "previsto": round(row['yhat'], 2),
-                        "limite_inferior": round(row['yhat_lower'], 2),
-                        "limite_superior": round(row['yhat_upper'], 2)
-                    }
-                    for _, row in future_forecast.iterrows()
-                ],
+                "previsoes": forecast["previsoes"],
+                "modelo": forecast["modelo"],
                 "metricas_modelo": {
                     "componentes": ["tendência", "sazonalidade_diária", "sazonalidade_semanal"]
                 }
@@ -92,180 +120,537 @@ class ForecastService:
         self,
         device_id: str,
         days_history: int = 30,
-        days_forecast: int = 7
+        days_forecast: int = 7,
+        loader: Optional[DeviceDatasetLoader] = None,
+        engine: str = "prophet"
     ) -> Dict:
-        """Prever umidade usando Prophet"""
+        """Prever umidade usando Prophet ou regressão harmônica"""
         try:
-            from prophet import Prophet
-            
-            data = await self.repository.get_last_hours(device_id, days_history * 24)
-            
-            if not data or len(data) < 100:
-                return {"erro": "Dados insuficientes"}
-            
-            df = pd.DataFrame(data)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df = df.dropna(subset=['umidade', 'timestamp'])
-
-            if len(df) < 100:
-                 return {"erro": "Dados insuficientes após limpeza (NaN)"}
-            
-            prophet_df = pd.DataFrame({
-                'ds': df['timestamp'],
-                'y': df['umidade']
-            })
-            
-            model = Prophet(
-                daily_seasonality=True,
-                weekly_seasonality=True,
-                changepoint_prior_scale=0.05
+            forecast = await self._forecast(
+                device_id,
+                'umidade',
+                days_history,
+                days_forecast,
+                loader,
+                engine,
+                insufficient_message="Dados insuficientes"
             )
-            model.fit(prophet_df)
-            
-            future = model.make_future_dataframe(periods=days_forecast * 24, freq='H')
-            forecast = model.predict(future)
-            
-            future_forecast = forecast[forecast['ds'] > prophet_df['ds'].max()]
+            if "erro" in forecast:
+                return forecast
             
             return {
                 "dispositivo": device_id,
                 "tipo": "umidade",
                 "dias_previstos": days_forecast,
-                "previsoes": [
-                    {
-                        "timestamp": row['ds'].isoformat(),
-                        "previsto": round(row['yhat'], 2),
-                        "limite_inferior": round(row['yhat_lower'], 2),
-                        "limite_superior": round(row['yhat_upper'], 2)
-                    }
-                    for _, row in future_forecast.iterrows()
-                ]
+                "previsoes": forecast["previsoes"],
+                "modelo": forecast["modelo"]
             }
         except ImportError:
             return {"erro": "Prophet não instalado"}
         except Exception as e:
             return {"erro": f"Erro: {str(e)}"}
     
+    async def _forecast(
+        self,
+        device_id: str,
+        column: str,
+        days_history: int,
+        days_forecast: int,
+        loader: Optional[DeviceDatasetLoader],
+        engine: str,
+        insufficient_message: str
+    ) -> Dict:
+        """Previsões e informações do modelo pelo motor escolhido"""
+        stored = await self._stored_forecast(device_id, column, engine, days_history, days_forecast)
+        if stored is not None:
+            return stored
+        
+        if engine == "harmonico":
+            data = await self._training_series(device_id, days_history, loader)
+            min_points = self._min_training_points()
+            
+            if not data or len(data) < min_points:
+                return {"erro": insufficient_message}
+            
+            latest = await self.repository.get_latest_timestamp(device_id)
+            forecast = await ComputeExecutor.run(
+                ForecastService._fit_predict_harmonic,
+                data,
+                column,
+                days_forecast,
+                min_points,
+                latest or data.timestamps[-1].astype('datetime64[us]').item(),
+                FORECAST_RESAMPLE_MINUTES
+            )
+            if forecast is None:
+                return {"erro": "Dados insuficientes após limpeza (NaN)"}
+            return forecast
+        
+        if engine != "prophet":
+            return {"erro": f"Motor de previsão inválido: {engine}. Use prophet ou harmonico"}
+        
+        model = await self._ensure_model(
+            device_id,
+            column,
+            days_history,
+            loader,
+            insufficient_message=insufficient_message
+        )
+        if "erro" in model:
+            return model
+        
+        return {
+            "previsoes": await self._predict_from_store(device_id, model, days_forecast),
+            "modelo": self._model_info(model)
+        }
+    
+    async def _stored_forecast(
+        self,
+        device_id: str,
+        column: str,
+        engine: str,
+        days_history: int,
+        days_forecast: int
+    ) -> Optional[Dict]:
+        """
+        Previsão gravada pela execução em lote da frota, se ainda servir
+        
+        Usa o documento da coleção 'previsoes' quando foi gerado há menos de
+        FLEET_FORECAST_MAX_AGE_HOURS e ainda tem `days_forecast` dias de
+        previsões a partir de agora.
+        """
+        stored = await self.forecast_repository.get(device_id, column, engine, days_history)
+        if stored is None:
+            return None
+        
+        age_hours = (datetime.now() - stored["gerado_em"]).total_seconds() / 3600
+        if age_hours > FLEET_FORECAST_MAX_AGE_HOURS:
+            return None
+        
+        now = datetime.now()
+        previsoes = [
+            p for p in stored["previsoes"]
+            if datetime.fromisoformat(p["timestamp"]) > now
+        ][:days_forecast * 24]
+        if len(previsoes) < days_forecast * 24:
+            return None
+        
+        return {
+            "previsoes": previsoes,
+            "modelo": {
+                **stored["modelo"],
+                "fonte": "lote",
+                "gerado_em": stored["gerado_em"].isoformat()
+            }
+        }
+    
+    async def _training_series(
+        self,
+        device_id: str,
+        days_history: int,
+        loader: Optional[DeviceDatasetLoader] = None
+    ) -> SensorSeries:
+        """
+        Histórico de treino: médias reamostradas (no MongoDB ou, com o
+        carregador da requisição, sobre as leituras dele) ou leituras brutas
+        """
+        if FORECAST_RESAMPLE_MINUTES <= 0:
+            return await self._last_hours(device_id, days_history * 24, loader)
+        
+        if loader is not None:
+            data = await loader.last_hours(days_history * 24)
+            return data.resample(FORECAST_RESAMPLE_MINUTES)
+        
+        start = datetime.now() - timedelta(days=days_history)
+        return await self.repository.get_resampled_series(
+            device_id,
+            start,
+            bin_minutes=FORECAST_RESAMPLE_MINUTES
+        )
+    
+    def _min_training_points(self) -> int:
+        if FORECAST_RESAMPLE_MINUTES <= 0:
+            return MIN_RAW_TRAINING_POINTS
+        return max(2, MIN_RESAMPLED_TRAINING_HOURS * 60 // FORECAST_RESAMPLE_MINUTES)
+    
+    @staticmethod
+    def _gap_stats(timestamps: np.ndarray, bin_minutes: int) -> Dict:
+        """Intervalos sem leituras na série de treino (não são preenchidos)"""
+        if bin_minutes <= 0 or len(timestamps) < 2:
+            return {"intervalos_sem_dados": 0, "maior_lacuna_horas": 0.0}
+        
+        bins = np.diff(timestamps) / np.timedelta64(bin_minutes, 'm')
+        # Centros de intervalos vizinhos distam ~1 intervalo; acima de 1,5 há intervalo vazio
+        missing = np.rint(bins[bins > 1.5]) - 1
+        return {
+            "intervalos_sem_dados": int(missing.sum()),
+            "maior_lacuna_horas": round(float(missing.max(initial=0)) * bin_minutes / 60, 2)
+        }
+    
+    @staticmethod
+    def _fit_predict_harmonic(
+        data: SensorSeries,
+        column: str,
+        days_forecast: int,
+        min_points: int,
+        start: datetime,
+        bin_minutes: int = 0
+    ) -> Optional[Dict]:
+        """
+        Ajustar a regressão harmônica e prever as próximas horas (roda no ComputeExecutor)
+        
+        Retorna None se restarem menos de `min_points` pontos após remover NaN.
+        """
+        values = getattr(data, column)
+        if np.count_nonzero(~np.isnan(values)) < min_points:
+            return None
+        
+        model = HarmonicForecaster().fit(data.timestamps, values)
+        
+        # Uma previsão por hora a partir da leitura mais recente
+        future = np.datetime64(start, 'ns') + np.arange(1, days_forecast * 24 + 1) * np.timedelta64(1, 'h')
+        yhat, lower, upper = model.predict(future)
+        
+        return {
+            "previsoes": kernels.forecast_rows(future, yhat, lower, upper),
+            "modelo": {
+                **model.describe(),
+                "resolucao_minutos": bin_minutes,
+                "lacunas": ForecastService._gap_stats(data.timestamps, bin_minutes)
+            }
+        }
+    
+    async def _needs_refit(self, device_id: str, meta: Optional[Dict]) -> bool:
+        """Retreinar se não há modelo, se expirou ou se chegaram leituras novas suficientes"""
+        if meta is None or model_store.is_expired(meta):
+            return True
+        if meta.get("resolucao_minutos") != FORECAST_RESAMPLE_MINUTES:
+            return True
+        new_readings = await self.repository.count_since(device_id, meta["ultima_leitura"])
+        return new_readings >= model_store.refit_new_readings
+    
+    async def _ensure_model(
+        self,
+        device_id: str,
+        column: str,
+        days_history: int,
+        loader: Optional[DeviceDatasetLoader] = None,
+        insufficient_message: str = "Dados insuficientes",
+        force: bool = False
+    ) -> Dict:
+        """
+        Metadados de um modelo válido para (dispositivo, métrica, histórico)
+        
+        Reaproveita o modelo salvo quando possível; caso contrário busca o
+        histórico e treina um novo no ComputeExecutor.
+        """
+        key = (device_id, column, days_history)
+        
+        async with model_store.lock(key):
+            meta = model_store.get_meta(key)
+            if not force and not await self._needs_refit(device_id, meta):
+                model_store.reuses += 1
+                return {**meta, "chave": key, "reutilizado": True}
+            
+            data = await self._training_series(device_id, days_history, loader)
+            min_points = self._min_training_points()
+            
+            if not data or len(data) < min_points:
+                return {"erro": insufficient_message}
+            
+            meta = await ComputeExecutor.run(
+                ForecastService._fit_model,
+                data,
+                column,
+                model_store.model_path(key),
+                min_points,
+                FORECAST_RESAMPLE_MINUTES,
+                **FORECAST_MODEL_PARAMS[column]
+            )
+            
+            if meta is None:
+                return {"erro": "Dados insuficientes após limpeza (NaN)"}
+            
+            model_store.save_meta(key, meta)
+            model_store.fits += 1
+            return {**meta, "chave": key, "reutilizado": False}
+    
+    async def _predict_from_store(
+        self,
+        device_id: str,
+        model: Dict,
+        days_forecast: int
+    ) -> List[Dict]:
+        """Prever a partir da leitura mais recente usando o modelo salvo"""
+        latest = await self.repository.get_latest_timestamp(device_id)
+        start = max(latest, model["ultima_leitura"]) if latest else model["ultima_leitura"]
+        
+        return await ComputeExecutor.run(
+            ForecastService._predict,
+            model_store.model_path(model["chave"]),
+            start,
+            days_forecast
+        )
+    
+    def _model_info(self, model: Dict) -> Dict:
+        """Idade e origem do modelo usado na resposta"""
+        return {
+            "motor": "prophet",
+            "treinado_em": model["treinado_em"].isoformat(),
+            "idade_horas": round(model_store.age_hours(model), 2),
+            "leituras_treino": model["leituras_treino"],
+            "resolucao_minutos": model["resolucao_minutos"],
+            "lacunas": model["lacunas"],
+            "reutilizado": model["reutilizado"]
+        }
+    
+    @staticmethod
+    def _fit_model(
+        data: SensorSeries,
+        column: str,
+        path: str,
+        min_points: int,
+        bin_minutes: int = 0,
+        **model_params
+    ) -> Optional[Dict]:
+        """
+        Treinar Prophet e salvar o modelo em `path` (roda no ComputeExecutor)
+        
+        Retorna None se restarem menos de `min_points` pontos após remover NaN.
+        """
+        from prophet import Prophet
+        
+        # Preparar dados para Prophet
+        df = data.to_dataframe()
+        df = df.dropna(subset=[column, 'timestamp'])
+        
+        if len(df) < min_points:
+            return None
+        
+        # Prophet requer colunas 'ds' (data) e 'y' (valor)
+        prophet_df = pd.DataFrame({
+            'ds': df['timestamp'],
+            'y': df[column]
+        })
+        
+        # Criar e treinar modelo
+        model = Prophet(
+            daily_seasonality=True,
+            weekly_seasonality=True,
+            changepoint_prior_scale=0.05,
+            **model_params
+        )
+        model.fit(prophet_df)
+        save_model(model, path)
+        
+        return {
+            "treinado_em": datetime.now(),
+            "leituras_treino": len(prophet_df),
+            "resolucao_minutos": bin_minutes,
+            "lacunas": ForecastService._gap_stats(data.timestamps, bin_minutes),
+            "ultima_leitura": prophet_df['ds'].max().to_pydatetime()
+        }
+    
+    @staticmethod
+    def _predict(path: str, start: datetime, days_forecast: int) -> List[Dict]:
+        """Prever as `days_forecast` * 24 horas após `start` (roda no ComputeExecutor)"""
+        model = load_model(path)
+        
+        # Mesmas datas que make_future_dataframe, partindo da leitura mais recente
+        future = pd.DataFrame({
+            'ds': pd.date_range(
+                start=start + timedelta(hours=1),
+                periods=days_forecast * 24,
+                freq=timedelta(hours=1)
+            )
+        })
+        forecast = model.predict(future)
+        
+        return kernels.forecast_rows(
+            forecast['ds'].to_numpy(),
+            forecast['yhat'].to_numpy(),
+            forecast['yhat_lower'].to_numpy(),
+            forecast['yhat_upper'].to_numpy()
+        )
+    
+    async def refit_stale_models(self) -> int:
+        """Retreinar os modelos salvos que expiraram ou receberam leituras novas"""
+        refitted = 0
+        for device_id, column, days_history in model_store.keys():
+            meta = model_store.get_meta((device_id, column, days_history))
+            if not await self._needs_refit(device_id, meta):
+                continue
+            result = await self._ensure_model(device_id, column, days_history, force=True)
+            if "erro" not in result:
+                refitted += 1
+        return refitted
+    
+    async def run_periodic_refit(self, interval: int = FORECAST_REFIT_INTERVAL_SECONDS) -> None:
+        """Loop de retreino agendado (iniciado no lifespan da aplicação)"""
+        while True:
+            try:
+                refitted = await self.refit_stale_models()
+                if refitted:
+                    print(f"🔁 {refitted} modelo(s) de previsão retreinado(s)")
+            except asyncio.CancelledError:
+                raise
+            except ImportError:
+                # Prophet não instalado: nada a retreinar
+                return
+            except Exception as e:
+                print(f"⚠️ Erro no retreino dos modelos de previsão: {e}")
+            await asyncio.sleep(interval)
+    
     async def analyze_patterns(
         self,
         device_id: str,
-        days: int = 30
+        days: int = 30,
+        loader: Optional[DeviceDatasetLoader] = None,
+        timezone: str = BUCKET_TIMEZONE
     ) -> Dict:
-        """Analisar padrões temporais"""
-        data = await self.repository.get_last_hours(device_id, days * 24)
+        """
+        Analisar padrões temporais: hora do dia e dia da semana no fuso pedido
         
-        if not data or len(data) < 100:
+        Sem carregador, o perfil vem do profile_store (mantido por dispositivo
+        e atualizado só com as leituras novas); com carregador, é montado em
+        uma passada sobre a fatia já carregada.
+        """
+        if get_zone(timezone) is None:
+            return {"erro": f"Fuso horário inválido: {timezone}"}
+        
+        hours = days * 24
+        if loader is None and hours <= profile_store.horizon_hours:
+            profile = await profile_store.get_profile(self.repository, device_id, hours, timezone)
+        else:
+            device_profile = DeviceProfile(hours, timezone)
+            async for chunk in self._iter_last_hours(device_id, hours, loader):
+                device_profile.add(chunk)
+            reference = loader.reference_time if loader is not None else datetime.now()
+            profile = device_profile.profile(reference - timedelta(hours=hours))
+        
+        if profile.readings < 100:
             return {"erro": "Dados insuficientes"}
         
-        df = pd.DataFrame(data)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df = df.dropna(subset=['temperatura', 'umidade', 'timestamp'])
-
-        if len(df) < 100:
+        temp_hourly = profile.by_hour("temperatura")
+        umid_hourly = profile.by_hour("umidade")
+        if min(temp_hourly.count.sum(), umid_hourly.count.sum()) < 100:
             return {"erro": "Dados insuficientes após limpeza (NaN)"}
-            
-        # Extrair componentes temporais
-        df['hora'] = df['timestamp'].dt.hour
-        df['dia_semana'] = df['timestamp'].dt.dayofweek
-        df['dia_mes'] = df['timestamp'].dt.day
-        
-        # Análise por hora do dia
-        hourly_pattern = df.groupby('hora').agg({
-            'temperatura': ['mean', 'std'],
-            'umidade': ['mean', 'std']
-        }).round(2)
-        
-        # Análise por dia da semana
-        weekly_pattern = df.groupby('dia_semana').agg({
-            'temperatura': ['mean', 'std'],
-            'umidade': ['mean', 'std']
-        }).round(2)
+        
+        # Médias e desvios por hora do dia (NaN nas horas sem dados)
+        temp_means = np.round(temp_hourly.means(), 2)
+        temp_stds = np.round(temp_hourly.stds(), 2)
+        umid_means = np.round(umid_hourly.means(), 2)
+        umid_stds = np.round(umid_hourly.stds(), 2)
         
         # Encontrar horários críticos
-        temp_peak_hour = df.groupby('hora')['temperatura'].mean().idxmax()
-        temp_low_hour = df.groupby('hora')['temperatura'].mean().idxmin()
+        temp_peak_hour = int(np.nanargmax(temp_hourly.means()))
+        temp_low_hour = int(np.nanargmin(temp_hourly.means()))
         
-        umid_peak_hour = df.groupby('hora')['umidade'].mean().idxmax()
-        umid_low_hour = df.groupby('hora')['umidade'].mean().idxmin()
+        umid_peak_hour = int(np.nanargmax(umid_hourly.means()))
+        umid_low_hour = int(np.nanargmin(umid_hourly.means()))
         
-        # Garantir que temos dados para todas as 24h (preencher com 0 ou NaN se faltar)
-        hourly_temp_data = hourly_pattern.get('temperatura', pd.DataFrame(columns=['mean', 'std'])).reindex(range(24))
-        hourly_umid_data = hourly_pattern.get('umidade', pd.DataFrame(columns=['mean', 'std'])).reindex(range(24))
+        temp_weekly = self._weekly_profile(profile, "temperatura")
+        umid_weekly = self._weekly_profile(profile, "umidade")
 
         return {
             "dispositivo": device_id,
             "periodo_dias": days,
+            "fuso_horario": timezone,
             "padroes_horarios": {
                 "temperatura": {
-                    "hora_maxima": int(temp_peak_hour),
-                    "hora_minima": int(temp_low_hour),
-                    "por_hora": [
-                        {
-                            "hora": int(hora),
-                            "media": float(hourly_temp_data.loc[hora, 'mean']) if pd.notna(hourly_temp_data.loc[hora, 'mean']) else None,
-                            "desvio": float(hourly_temp_data.loc[hora, 'std']) if pd.notna(hourly_temp_data.loc[hora, 'std']) else None
-                        }
-                        for hora in range(24)
-                    ]
+                    "hora_maxima": temp_peak_hour,
+                    "hora_minima": temp_low_hour,
+                    "por_hora": self._hourly_profile(temp_means, temp_stds)
                 },
                 "umidade": {
-                    "hora_maxima": int(umid_peak_hour),
-                    "hora_minima": int(umid_low_hour),
-                    "por_hora": [
-                        {
-                            "hora": int(hora),
-                            "media": float(hourly_umid_data.loc[hora, 'mean']) if pd.notna(hourly_umid_data.loc[hora, 'mean']) else None,
-                            "desvio": float(hourly_umid_data.loc[hora, 'std']) if pd.notna(hourly_umid_data.loc[hora, 'std']) else None
-                        }
-                        for hora in range(24)
-                    ]
+                    "hora_maxima": umid_peak_hour,
+                    "hora_minima": umid_low_hour,
+                    "por_hora": self._hourly_profile(umid_means, umid_stds)
                 }
             },
+            "padroes_semanais": {
+                "dias": list(WEEKDAYS),
+                "temperatura": temp_weekly,
+                "umidade": umid_weekly
+            },
             "insights": [
                 f"Temperatura mais alta às {temp_peak_hour}h",
                 f"Temperatura mais baixa às {temp_low_hour}h",
                 f"Umidade mais alta às {umid_peak_hour}h",
-                f"Umidade mais baixa às {umid_low_hour}h"
+                f"Umidade mais baixa às {umid_low_hour}h",
+                f"Dia da semana mais quente: {temp_weekly['dia_maximo']}",
+                f"Dia da semana mais úmido: {umid_weekly['dia_maximo']}"
             ]
         }
     
+    def _weekly_profile(self, profile: WeeklyProfile, field: str) -> Dict:
+        """Médias/desvios por dia da semana e a grade dia × hora (None sem dados)"""
+        def values(array: np.ndarray) -> List[Optional[float]]:
+            return [None if np.isnan(v) else float(v) for v in np.round(array, 2)]
+        
+        daily = profile.by_weekday(field)
+        cells = profile.fields[field]
+        return {
+            "dia_maximo": WEEKDAYS[int(np.nanargmax(daily.means()))],
+            "dia_minimo": WEEKDAYS[int(np.nanargmin(daily.means()))],
+            "por_dia": [
+                {"dia": dia, "media": media, "desvio": desvio}
+                for dia, media, desvio in zip(WEEKDAYS, values(daily.means()), values(daily.stds()))
+            ],
+            # Linhas: dias da semana (segunda primeiro); colunas: horas 0-23
+            "por_dia_hora": {
+                "media": [values(row) for row in cells.means().reshape(7, 24)],
+                "desvio": [values(row) for row in cells.stds().reshape(7, 24)]
+            }
+        }
+    
+    def _hourly_profile(self, means: np.ndarray, stds: np.ndarray) -> List[Dict]:
+        """Montar lista hora a hora (None para horas sem dados)"""
+        return [
+            {
+                "hora": hora,
+                "media": float(means[hora]) if not np.isnan(means[hora]) else None,
+                "desvio": float(stds[hora]) if not np.isnan(stds[hora]) else None
+            }
+            for hora in range(24)
+        ]
+    
     async def energy_analysis(
         self,
         device_id: str,
         days: int = 30,
         target_temp: float = 22.0,
-        cost_per_kwh: float = 0.85
+        cost_per_kwh: float = 0.85,
+        loader: Optional[DeviceDatasetLoader] = None
     ) -> Dict:
         """
         Análise de eficiência energética (estimativa)
         Calcula custo potencial de climatização
         """
-        data = await self.repository.get_last_hours(device_id, days * 24)
+        total_leituras = 0
+        delta_stats = MomentsAggregator()
+        horas_criticas = 0
+        
+        async for chunk in self._iter_last_hours(device_id, days * 24, loader):
+            total_leituras += len(chunk)
+            
+            # Calcular diferença da temperatura alvo
+            delta_temp = np.abs(chunk.temperatura - target_temp)
+            delta_stats.update(delta_temp)
+            
+            # Identificar períodos críticos
+            horas_criticas += int(np.count_nonzero(delta_temp > 5))
         
-        if not data or len(data) < 100:
+        if total_leituras < 100:
             return {"erro": "Dados insuficientes"}
         
-        df = pd.DataFrame(data)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df = df.dropna(subset=['temperatura', 'timestamp'])
-
-        if len(df) < 100:
+        if delta_stats.count < 100:
             return {"erro": "Dados insuficientes após limpeza (NaN)"}
-            
-        # Calcular diferença da temperatura alvo
-        df['delta_temp'] = abs(df['temperatura'] - target_temp)
         
         # Estimar consumo (simplificado: 0.1 kWh por °C de diferença por hora)
         # Esta é uma estimativa muito grosseira, idealmente usaria dados de potência
-        df['consumo_estimado_kwh'] = df['delta_temp'] * 0.1
-        df['custo_estimado'] = df['consumo_estimado_kwh'] * cost_per_kwh
-        
-        total_consumo = df['consumo_estimado_kwh'].sum()
-        total_custo = df['custo_estimado'].sum()
-        
-        # Identificar períodos críticos
-        df['periodo_critico'] = df['delta_temp'] > 5
-        horas_criticas = df['periodo_critico'].sum()
+        total_consumo = delta_stats.total * 0.1
+        total_custo = total_consumo * cost_per_kwh
         
         return {
             "dispositivo": device_id,
@@ -275,12 +660,12 @@ class ForecastService:
                 "consumo_total_estimado_kwh": round(total_consumo, 2),
                 "custo_total_estimado_brl": round(total_custo, 2),
                 "custo_medio_diario_brl": round(total_custo / days, 2),
-                "horas_periodo_critico": int(horas_criticas),
-                "percentual_critico": round((horas_criticas / len(df)) * 100, 2)
+                "horas_periodo_critico": horas_criticas,
+                "percentual_critico": round((horas_criticas / delta_stats.count) * 100, 2)
             },
             "recomendacoes": self._generate_energy_recommendations(
-                df['delta_temp'].mean(),
-                horas_criticas / len(df)
+                delta_stats.mean,
+                horas_criticas / delta_stats.count
             )
         }
     
@@ -1,8 +1,59 @@
-import pandas as pd
 import numpy as np
-from typing import Dict, List
+from typing import AsyncIterator, Dict, List, Optional
 from datetime import datetime, timedelta
+import asyncio
+import os
 from repositories.sensor_repository import SensorRepository
+from models.sensor_series import SensorSeries
+from services.dataset_loader import DeviceDatasetLoader
+from config.compute_executor import ComputeExecutor
+from utils.chunk_aggregators import LaggedDiffAggregator, MomentsAggregator
+from utils import kernels
+from utils.episodes import EpisodeAggregator, find_episodes
+from utils import episode_pipeline
+from utils.time_buckets import BUCKET_TIMEZONE, get_zone, local_isoformat
+
+# Limite padrão de temperatura do TAC (°C)
+CRITICAL_TEMPERATURE = 35.0
+
+# Taxa de umidade: intervalo mínimo entre leituras (5 min, em horas) e taxa máxima plausível (%/h)
+HUMIDITY_RATE_MIN_INTERVAL_HOURS = 0.083
+HUMIDITY_RATE_MAX_ABS = 50
+
+# Taxa de umidade, IRF e TAC calculados no MongoDB ($setWindowFields, MongoDB 5.0+);
+# "false" volta ao cálculo em Python sobre as leituras
+INDICATOR_PIPELINES_ENABLED = os.getenv("INDICATOR_PIPELINES_ENABLED", "true").lower() == "true"
+
+
+def _clipped_score(field: str, lower: float, span: float) -> Dict:
+    """np.clip((campo - lower) / span, 0, 1) * 50 como expressão do MongoDB"""
+    ratio = {"$divide": [{"$subtract": [field, lower]}, span]}
+    return {"$multiply": [{"$min": [{"$max": [ratio, 0]}, 1]}, 50]}
+
+
+# IRF de cada leitura no pipeline (mesmas operações do cálculo com NumPy).
+# Sem temperatura ou umidade o IRF é nulo, como o NaN do NumPy: a leitura
+# conta no tempo observado, mas não na média, no máximo nem nas faixas
+# ($max/$min do MongoDB ignorariam o nulo e dariam pontuação 0)
+IRF_EXPRESSION = {"$cond": [
+    {"$and": [{"$gt": ["$temperatura", -1e12]}, {"$gt": ["$umidade", -1e12]}]},
+    {"$min": [{"$max": [
+        {"$add": [_clipped_score("$temperatura", 30, 10), _clipped_score("$umidade", 75, 25)]}, 0
+    ]}, 100]},
+    None
+]}
+
+# Faixas de risco do IRF: horas críticas (> 70) e de alerta (40-70)
+IRF_LEVELS = {
+    "criticas": {"$gt": ["$valor", 70]},
+    "alerta": {"$and": [{"$gt": ["$valor", 40]}, {"$lte": ["$valor", 70]}]}
+}
+
+# Indicadores disponíveis no cálculo em lote (mesmos nomes das rotas)
+BATCH_INDICATORS = ("amplitude-termica", "taxa-umidade", "indice-fungos", "tempo-critico")
+
+# Dispositivos calculados ao mesmo tempo no cálculo em lote
+INDICATOR_BATCH_CONCURRENCY = int(os.getenv("INDICATOR_BATCH_CONCURRENCY", 8))
 
 class IndicatorsService:
     """Serviço para indicadores avançados de qualidade e risco"""
@@ -10,34 +61,110 @@ class IndicatorsService:
     def __init__(self):
         self.repository = SensorRepository()
     
-    async def get_thermal_amplitude(self, device_id: str, days: int = 7) -> Dict:
+    async def _iter_last_hours(
+        self,
+        device_id: str,
+        hours: int,
+        loader: Optional[DeviceDatasetLoader] = None
+    ) -> AsyncIterator[SensorSeries]:
+        """Lotes da janela: do carregador (se houver) ou do repositório"""
+        if loader is not None:
+            source = loader.iter_last_hours(hours)
+        else:
+            source = self.repository.iter_last_hours(device_id, hours)
+        async for chunk in source:
+            yield chunk
+    
+    async def get_batch(
+        self,
+        indicator: str,
+        device_ids: Optional[List[str]] = None,
+        days: int = 7,
+        limit: float = CRITICAL_TEMPERATURE
+    ) -> Dict[str, Dict]:
+        """
+        Um indicador para vários dispositivos (device_ids=None: todos com
+        leituras na janela)
+        
+        Cada dispositivo é calculado pelo mesmo caminho da rota individual
+        (pipeline no MongoDB ou leitura em lotes), com no máximo
+        INDICATOR_BATCH_CONCURRENCY dispositivos ao mesmo tempo: as séries
+        brutas não são carregadas todas de uma vez. A amplitude usa os
+        buckets diários, em uma única agregação.
+        """
+        time_limit = datetime.now() - timedelta(days=days)
+        if indicator == "amplitude-termica":
+            buckets = await self.repository.get_buckets_bulk(time_limit, device_ids, granularity="1d")
+            ids = device_ids if device_ids is not None else sorted(buckets)
+            return {
+                device_id: IndicatorsService._thermal_amplitude_from_buckets(
+                    device_id, days, buckets.get(device_id, [])
+                )
+                for device_id in ids
+            }
+        
+        if indicator == "taxa-umidade":
+            compute = lambda device_id: self.get_humidity_rate(device_id, days)
+        elif indicator == "indice-fungos":
+            compute = lambda device_id: self.get_fungus_risk_index(device_id, days)
+        elif indicator == "tempo-critico":
+            compute = lambda device_id: self.get_critical_time_above_limit(device_id, days, limit)
+        else:
+            raise ValueError(f"Indicador inválido: {indicator}")
+        
+        ids = device_ids if device_ids is not None else await self.repository.get_active_devices(time_limit)
+        slots = asyncio.Semaphore(INDICATOR_BATCH_CONCURRENCY)
+        
+        async def run(device_id: str) -> Dict:
+            async with slots:
+                return await compute(device_id)
+        
+        return dict(zip(ids, await asyncio.gather(*(run(d) for d in ids))))
+    
+    async def get_thermal_amplitude(
+        self,
+        device_id: str,
+        days: int = 7,
+        timezone: str = BUCKET_TIMEZONE
+    ) -> Dict:
         """
         Amplitude Térmica Diária
-        Cálculo: Máx - Mín do dia
+        Cálculo: Máx - Mín de cada dia local (buckets "1d" no fuso pedido)
         """
-        data = await self.repository.get_last_hours(device_id, days * 24)
+        if get_zone(timezone) is None:
+            return {"erro": f"Fuso horário inválido: {timezone}"}
         
-        if not data or len(data) < 24:
+        time_limit = datetime.now() - timedelta(days=days)
+        buckets = await self.repository.get_buckets(device_id, time_limit, granularity="1d", timezone=timezone)
+        return IndicatorsService._thermal_amplitude_from_buckets(device_id, days, buckets, timezone)
+    
+    @staticmethod
+    def _thermal_amplitude_from_buckets(
+        device_id: str,
+        days: int,
+        buckets: List[Dict],
+        timezone: str = BUCKET_TIMEZONE
+    ) -> Dict:
+        """Amplitude de cada bucket diário"""
+        total_leituras = sum(b['leituras'] for b in buckets)
+        if total_leituras < 24:
             return {"erro": "Dados insuficientes (mínimo 24h)"}
         
-        df = pd.DataFrame(data)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df['date'] = df['timestamp'].dt.date
+        day_min = np.array([b['temp_min'] for b in buckets], dtype=np.float64)
+        day_max = np.array([b['temp_max'] for b in buckets], dtype=np.float64)
+        amplitude = day_max - day_min
         
-        # Calcular amplitude por dia
-        daily_stats = df.groupby('date')['temperatura'].agg(['min', 'max']).reset_index()
-        daily_stats['amplitude'] = daily_stats['max'] - daily_stats['min']
+        amplitudes = [
+            {
+                "data": local_isoformat(b['inicio'], timezone)[:10],
+                "temp_minima": round(vmin, 2),
+                "temp_maxima": round(vmax, 2),
+                "amplitude": round(amp, 2)
+            }
+            for b, vmin, vmax, amp in zip(buckets, day_min.tolist(), day_max.tolist(), amplitude.tolist())
+        ]
         
-        amplitudes = []
-        for _, row in daily_stats.iterrows():
-            amplitudes.append({
-                "data": row['date'].isoformat(),
-                "temp_minima": round(float(row['min']), 2),
-                "temp_maxima": round(float(row['max']), 2),
-                "amplitude": round(float(row['amplitude']), 2)
-            })
-        
-        amplitude_media = daily_stats['amplitude'].mean()
+        amplitude_media = float(np.nanmean(amplitude))
         
         # Análise
         if amplitude_media > 10:
@@ -53,57 +180,99 @@ class IndicatorsService:
         return {
             "dispositivo": device_id,
             "periodo_dias": days,
+            "fuso_horario": timezone,
             "amplitude_media": round(amplitude_media, 2),
-            "amplitude_maxima": round(float(daily_stats['amplitude'].max()), 2),
-            "amplitude_minima": round(float(daily_stats['amplitude'].min()), 2),
+            "amplitude_maxima": round(float(np.nanmax(amplitude)), 2),
+            "amplitude_minima": round(float(np.nanmin(amplitude)), 2),
             "estabilidade": estabilidade,
             "alerta": alerta,
             "historico_diario": amplitudes
         }
     
-    async def get_humidity_rate(self, device_id: str, days: int = 7) -> Dict:
+    async def get_humidity_rate(
+        self,
+        device_id: str,
+        days: int = 7,
+        loader: Optional[DeviceDatasetLoader] = None
+    ) -> Dict:
         """
         Taxa de Aumento de Umidade (ΔU/Δt)
         Mudança percentual por hora/dia
-        """
-        data = await self.repository.get_last_hours(device_id, days * 24)
         
-        if not data or len(data) < 10:
+        Sem carregador, o cálculo é feito no MongoDB e só o resumo é lido
+        """
+        if loader is None and INDICATOR_PIPELINES_ENABLED:
+            stats = await self.repository.get_humidity_rate_stats(
+                device_id, days * 24, HUMIDITY_RATE_MIN_INTERVAL_HOURS, HUMIDITY_RATE_MAX_ABS
+            )
+            return IndicatorsService._humidity_rate_result(
+                device_id,
+                days,
+                stats["leituras"],
+                stats["taxas"],
+                stats.get("media"),
+                stats.get("maxima"),
+                stats.get("minima"),
+                stats.get("media_abs")
+            )
+        
+        total_leituras = 0
+        lag = LaggedDiffAggregator()
+        taxa_stats = MomentsAggregator()
+        taxa_abs_stats = MomentsAggregator()
+        
+        async for chunk in self._iter_last_hours(device_id, days * 24, loader):
+            total_leituras += len(chunk)
+            
+            # Calcular variação por hora (considerando a última leitura do lote anterior)
+            umidade_diff, time_diff_hours = lag.diff(chunk.timestamps, chunk.umidade)
+            
+            # FILTRAR: Ignorar intervalos muito curtos (menores que 5 minutos)
+            # Isso evita divisões por valores muito pequenos que geram taxas absurdas
+            valid = time_diff_hours >= HUMIDITY_RATE_MIN_INTERVAL_HOURS
+            
+            # Calcular taxa apenas para intervalos válidos
+            taxa_por_hora = umidade_diff[valid] / time_diff_hours[valid]
+            
+            # FILTRAR: Remover outliers absurdos (taxas maiores que 50%/hora são irreais)
+            # Em condições normais, umidade não varia mais que isso por hora
+            # (a comparação também descarta NaN)
+            taxa_por_hora = taxa_por_hora[np.abs(taxa_por_hora) <= HUMIDITY_RATE_MAX_ABS]
+            
+            taxa_stats.update(taxa_por_hora)
+            taxa_abs_stats.update(np.abs(taxa_por_hora))
+        
+        return IndicatorsService._humidity_rate_result(
+            device_id,
+            days,
+            total_leituras,
+            taxa_stats.count,
+            taxa_stats.mean,
+            taxa_stats.max,
+            taxa_stats.min,
+            # Usar valor absoluto médio para análise de risco
+            # Isso considera tanto aumentos quanto diminuições
+            taxa_abs_stats.mean
+        )
+    
+    @staticmethod
+    def _humidity_rate_result(
+        device_id: str,
+        days: int,
+        total_leituras: int,
+        total_taxas: int,
+        taxa_media: float,
+        taxa_maxima: float,
+        taxa_minima: float,
+        taxa_abs_media: float
+    ) -> Dict:
+        """Classificação da taxa de umidade (estatísticas do NumPy ou do pipeline)"""
+        if total_leituras < 10:
             return {"erro": "Dados insuficientes"}
         
-        df = pd.DataFrame(data)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df = df.sort_values('timestamp')
-        
-        # Calcular variação por hora
-        df['umidade_diff'] = df['umidade'].diff()
-        df['time_diff_hours'] = df['timestamp'].diff().dt.total_seconds() / 3600
-        
-        # FILTRAR: Ignorar intervalos muito curtos (menores que 5 minutos)
-        # Isso evita divisões por valores muito pequenos que geram taxas absurdas
-        df = df[df['time_diff_hours'] >= 0.083]  # 5 minutos = 0.083 horas
-        
-        # Calcular taxa apenas para intervalos válidos
-        df['taxa_por_hora'] = df['umidade_diff'] / df['time_diff_hours']
-        
-        # FILTRAR: Remover outliers absurdos (taxas maiores que 50%/hora são irreais)
-        # Em condições normais, umidade não varia mais que isso por hora
-        df = df[abs(df['taxa_por_hora']) <= 50]
-        
-        # Filtrar valores válidos
-        df_valid = df[df['taxa_por_hora'].notna()]
-        
-        if len(df_valid) == 0:
+        if total_taxas == 0:
             return {"erro": "Não foi possível calcular taxas válidas"}
         
-        taxa_media = df_valid['taxa_por_hora'].mean()
-        taxa_maxima = df_valid['taxa_por_hora'].max()
-        taxa_minima = df_valid['taxa_por_hora'].min()
-        
-        # Usar valor absoluto médio para análise de risco
-        # Isso considera tanto aumentos quanto diminuições
-        taxa_abs_media = df_valid['taxa_por_hora'].abs().mean()
-        
         # Determinar tendência dominante
         if taxa_media > 0:
             tendencia = "aumentando"
@@ -134,40 +303,74 @@ class IndicatorsService:
             "tendencia": tendencia,
             "risco": risco,
             "alerta": alerta,
-            "total_leituras_analisadas": len(df_valid)
+            "total_leituras_analisadas": total_taxas
         }
     
-    async def get_fungus_risk_index(self, device_id: str, days: int = 7) -> Dict:
+    async def get_fungus_risk_index(
+        self,
+        device_id: str,
+        days: int = 7,
+        loader: Optional[DeviceDatasetLoader] = None
+    ) -> Dict:
         """
         Índice de Risco de Fungos (IRF)
         Função de T e UR alta (>30°C e >75%)
-        """
-        data = await self.repository.get_last_hours(device_id, days * 24)
+        Horas por nível ponderadas pelo intervalo entre leituras
         
-        if not data:
+        Sem carregador, o cálculo é feito no MongoDB e só o resumo é lido
+        """
+        if loader is None and INDICATOR_PIPELINES_ENABLED:
+            doc = await self.repository.summarize_episodes(
+                device_id, days * 24, IRF_EXPRESSION, IRF_LEVELS, top=1
+            )
+            stats, levels = episode_pipeline.summarize(doc, list(IRF_LEVELS))
+            if not stats["leituras"]:
+                return {"erro": "Sem dados"}
+            return IndicatorsService._fungus_risk_result(
+                device_id, days, stats["media"], stats["maximo"], levels["criticas"], levels["alerta"]
+            )
+        
+        irf_stats = MomentsAggregator()
+        criticas = EpisodeAggregator()
+        alerta = EpisodeAggregator()
+        
+        async for chunk in self._iter_last_hours(device_id, days * 24, loader):
+            # Calcular IRF
+            # IRF = 0 se condições normais, até 100 se condições críticas
+            # Temperatura > 30°C contribui com até 50 pontos
+            temp_risk = np.clip((chunk.temperatura - 30) / 10, 0, 1) * 50
+            
+            # Umidade > 75% contribui com até 50 pontos
+            umid_risk = np.clip((chunk.umidade - 75) / 25, 0, 1) * 50
+            
+            irf = np.clip(temp_risk + umid_risk, 0, 100)
+            irf_stats.update(irf)
+            
+            # Tempo em cada nível de risco
+            criticas.update(chunk.timestamps, irf > 70, irf)
+            alerta.update(chunk.timestamps, (irf > 40) & (irf <= 70), irf)
+        
+        criticas.finish()
+        alerta.finish()
+        
+        if criticas.total_count == 0:
             return {"erro": "Sem dados"}
         
-        df = pd.DataFrame(data)
-        
-        # Calcular IRF
-        # IRF = 0 se condições normais, até 100 se condições críticas
-        df['irf'] = 0
-        
-        # Temperatura > 30°C contribui com até 50 pontos
-        temp_risk = ((df['temperatura'] - 30) / 10).clip(0, 1) * 50
-        
-        # Umidade > 75% contribui com até 50 pontos
-        umid_risk = ((df['umidade'] - 75) / 25).clip(0, 1) * 50
-        
-        df['irf'] = temp_risk + umid_risk
-        df['irf'] = df['irf'].clip(0, 100)
-        
-        # Contar horas em cada nível de risco
-        horas_criticas = len(df[df['irf'] > 70])
-        horas_alerta = len(df[(df['irf'] > 40) & (df['irf'] <= 70)])
-        horas_normais = len(df[df['irf'] <= 40])
-        
-        irf_medio = df['irf'].mean()
+        return IndicatorsService._fungus_risk_result(
+            device_id, days, irf_stats.mean, float(irf_stats.max), criticas, alerta
+        )
+    
+    @staticmethod
+    def _fungus_risk_result(
+        device_id: str,
+        days: int,
+        irf_medio: float,
+        irf_maximo: float,
+        criticas: EpisodeAggregator,
+        alerta: EpisodeAggregator
+    ) -> Dict:
+        """Classificação do IRF (episódios do EpisodeAggregator ou do pipeline)"""
+        horas_normais = criticas.total_hours - criticas.hours - alerta.hours
         
         # Classificação
         if irf_medio > 70:
@@ -184,52 +387,88 @@ class IndicatorsService:
             "dispositivo": device_id,
             "periodo_dias": days,
             "irf_medio": round(irf_medio, 2),
-            "irf_maximo": round(float(df['irf'].max()), 2),
+            "irf_maximo": round(irf_maximo, 2),
             "nivel_risco": nivel,
-            "horas_criticas": horas_criticas,
-            "horas_alerta": horas_alerta,
-            "horas_normais": horas_normais,
-            "percentual_critico": round((horas_criticas / len(df)) * 100, 2),
+            "horas_criticas": round(criticas.hours, 2),
+            "horas_alerta": round(alerta.hours, 2),
+            "horas_normais": round(max(horas_normais, 0.0), 2),
+            "percentual_critico": round(criticas.percent, 2),
+            "periodos_criticos": criticas.n_episodes,
+            "maior_periodo_critico_horas": round(criticas.longest_hours, 2),
             "recomendacao": recomendacao
         }
     
-    async def get_critical_time_above_limit(self, device_id: str, days: int = 7) -> Dict:
+    async def get_critical_time_above_limit(
+        self,
+        device_id: str,
+        days: int = 7,
+        limit: float = CRITICAL_TEMPERATURE,
+        loader: Optional[DeviceDatasetLoader] = None
+    ) -> Dict:
         """
         Horas Acima de Limite Crítico (TAC)
-        Tempo acumulado com T>35°C
+        Tempo acumulado com T > limite (padrão 35°C), ponderado pelo intervalo entre leituras
+        
+        Sem carregador, o cálculo é feito no MongoDB e só o resumo é lido
         """
-        data = await self.repository.get_last_hours(device_id, days * 24)
+        if loader is None and INDICATOR_PIPELINES_ENABLED:
+            doc = await self.repository.summarize_episodes(
+                device_id, days * 24, "$temperatura", {"acima": {"$gt": ["$valor", limit]}}
+            )
+            stats, levels = episode_pipeline.summarize(doc, ["acima"])
+            if not stats["leituras"]:
+                return {"erro": "Sem dados"}
+            return IndicatorsService._critical_time_result(
+                device_id, days, limit, levels["acima"], stats["maximo"]
+            )
+        
+        if loader is not None:
+            data = await loader.last_hours(days * 24)
+        else:
+            data = await self.repository.get_last_hours_series(device_id, days * 24)
         
         if not data:
             return {"erro": "Sem dados"}
         
-        df = pd.DataFrame(data)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df = df.sort_values('timestamp')
-        
-        # Identificar períodos críticos
-        df['critico'] = df['temperatura'] > 35
-        
-        # Calcular tempo em condição crítica
-        horas_criticas = df['critico'].sum()
-        total_horas = len(df)
-        percentual_critico = (horas_criticas / total_horas) * 100 if total_horas > 0 else 0
-        
-        # Encontrar períodos contínuos críticos
-        df['grupo_critico'] = (df['critico'] != df['critico'].shift()).cumsum()
-        periodos_criticos = []
-        
-        for grupo_id, grupo_df in df[df['critico']].groupby('grupo_critico'):
-            if len(grupo_df) > 0:
-                periodos_criticos.append({
-                    "inicio": grupo_df['timestamp'].min().isoformat(),
-                    "fim": grupo_df['timestamp'].max().isoformat(),
-                    "duracao_horas": len(grupo_df),
-                    "temp_maxima": round(float(grupo_df['temperatura'].max()), 2)
-                })
-        
-        # Ordenar por duração (mais longos primeiro)
-        periodos_criticos = sorted(periodos_criticos, key=lambda x: x['duracao_horas'], reverse=True)
+        return await ComputeExecutor.run(
+            IndicatorsService._compute_critical_time, device_id, days, limit, data
+        )
+    
+    @staticmethod
+    def _compute_critical_time(device_id: str, days: int, limit: float, data: SensorSeries) -> Dict:
+        """Parte CPU-bound de get_critical_time_above_limit (roda no ComputeExecutor)"""
+        # Episódios contínuos acima do limite
+        criticos = find_episodes(data.timestamps, data.temperatura > limit, data.temperatura)
+        return IndicatorsService._critical_time_result(
+            device_id, days, limit, criticos, float(np.nanmax(data.temperatura))
+        )
+    
+    @staticmethod
+    def _critical_time_result(
+        device_id: str,
+        days: int,
+        limit: float,
+        criticos: EpisodeAggregator,
+        temp_maxima: float
+    ) -> Dict:
+        """Resposta do TAC (episódios do EpisodeAggregator ou do pipeline)"""
+        horas_criticas = criticos.hours
+        
+        top = criticos.top(5)  # Top 5 mais longos
+        periodos_criticos = [
+            {
+                "inicio": ts_inicio,
+                "fim": ts_fim,
+                "duracao_horas": round(duracao, 2),
+                "temp_maxima": round(pico, 2)
+            }
+            for ts_inicio, ts_fim, duracao, pico in zip(
+                kernels.isoformat(top["inicio"]),
+                kernels.isoformat(top["fim"]),
+                top["duracao_horas"].tolist(),
+                top["pico"].tolist()
+            )
+        ]
         
         # Análise de risco
         if horas_criticas > 6:
@@ -245,11 +484,15 @@ class IndicatorsService:
         return {
             "dispositivo": device_id,
             "periodo_dias": days,
-            "horas_acima_35c": int(horas_criticas),
-            "total_horas_analisadas": int(total_horas),
-            "percentual_critico": round(percentual_critico, 2),
-            "temperatura_maxima_registrada": round(float(df['temperatura'].max()), 2),
+            "limite_temperatura": limit,
+            "horas_acima_limite": round(horas_criticas, 2),
+            "total_horas_analisadas": round(criticos.total_hours, 2),
+            "percentual_critico": round(criticos.percent, 2),
+            "leituras_acima_limite": criticos.count,
+            "total_leituras": criticos.total_count,
+            "temperatura_maxima_registrada": round(temp_maxima, 2),
             "nivel_risco": risco,
             "acao_recomendada": acao,
-            "periodos_criticos": periodos_criticos[:5]  # Top 5 mais longos
-        }
\ No newline at end of file
+            "total_periodos_criticos": criticos.n_episodes,
+            "periodos_criticos": periodos_criticos
+        }
@@ -1,5 +1,12 @@
 from typing import Dict, List
+import numpy as np
 from repositories.sensor_repository import SensorRepository
+from utils import kernels
+from utils.episodes import find_episodes
+
+# Limites padrão de alerta (°C e %)
+ALERT_TEMPERATURE = 35.0
+ALERT_HUMIDITY = 80.0
 
 class MetricsService:
     """Serviço para cálculo de métricas globais"""
@@ -7,21 +14,15 @@ class MetricsService:
     def __init__(self):
         self.repository = SensorRepository()
     
-    async def get_global_metrics(self) -> Dict:
+    async def get_global_metrics(
+        self,
+        temp_limit: float = ALERT_TEMPERATURE,
+        humidity_limit: float = ALERT_HUMIDITY
+    ) -> Dict:
         """Calcular métricas globais de todos os dispositivos"""
         
-        # Buscar últimas leituras de cada dispositivo
-        devices = await self.repository.get_all_devices()
-        
-        if not devices:
-            return self._empty_metrics()
-        
-        # Buscar última leitura de cada dispositivo
-        all_readings = []
-        for device_id in devices:
-            readings = await self.repository.get_by_device(device_id, limit=1)
-            if readings:
-                all_readings.append(readings[0])
+        # Buscar última leitura de cada dispositivo (uma única agregação)
+        all_readings = await self.repository.get_latest_per_device()
         
         if not all_readings:
             return self._empty_metrics()
@@ -41,7 +42,7 @@ class MetricsService:
         
         # Contar silos em alerta
         silos_em_alerta = sum(1 for r in all_readings 
-                              if r['temperatura'] >= 35 or r['umidade'] >= 80)
+                              if r['temperatura'] >= temp_limit or r['umidade'] >= humidity_limit)
         
         return {
             "silos_ativos": len(all_readings),
@@ -60,7 +61,13 @@ class MetricsService:
             }
         }
     
-    async def get_device_metrics(self, device_id: str, limit: int = 100) -> Dict:
+    async def get_device_metrics(
+        self,
+        device_id: str,
+        limit: int = 100,
+        temp_limit: float = ALERT_TEMPERATURE,
+        humidity_limit: float = ALERT_HUMIDITY
+    ) -> Dict:
         """Calcular métricas de um dispositivo específico"""
         
         readings = await self.repository.get_by_device(device_id, limit=limit)
@@ -71,6 +78,12 @@ class MetricsService:
         temperaturas = [r['temperatura'] for r in readings]
         umidades = [r['umidade'] for r in readings]
         
+        # Episódios de alerta nas leituras analisadas (em ordem cronológica)
+        timestamps = np.array([r['timestamp'] for r in reversed(readings)], dtype='datetime64[ns]')
+        temp = np.array(temperaturas[::-1], dtype=np.float64)
+        umid = np.array(umidades[::-1], dtype=np.float64)
+        alertas = find_episodes(timestamps, (temp >= temp_limit) | (umid >= humidity_limit), temp)
+        
         return {
             "dispositivo": device_id,
             "total_leituras": len(readings),
@@ -84,6 +97,19 @@ class MetricsService:
                 "minima": round(min(umidades), 2),
                 "maxima": round(max(umidades), 2)
             },
+            "alertas": {
+                "limite_temperatura": temp_limit,
+                "limite_umidade": humidity_limit,
+                "leituras_em_alerta": alertas.count,
+                "episodios": alertas.n_episodes,
+                "horas_em_alerta": round(alertas.hours, 2),
+                "percentual_tempo": round(alertas.percent, 2),
+                "maior_episodio_horas": round(alertas.longest_hours, 2),
+                "em_alerta_desde": (
+                    kernels.isoformat([alertas.ongoing_since])[0]
+                    if alertas.ongoing_since is not None else None
+                )
+            },
             "ultima_leitura": readings[0]['timestamp'].isoformat()
         }
     
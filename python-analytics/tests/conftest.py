@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Importar os módulos do serviço (utils, services, ...) a partir de tests/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,105 @@
+"""Acumuladores por lotes (utils/chunk_aggregators.py)"""
+import numpy as np
+import pytest
+
+from utils.chunk_aggregators import GroupedMomentsAggregator, LaggedDiffAggregator, MomentsAggregator
+
+
+def batches(values, size):
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+
+@pytest.mark.parametrize("size", [1, 13, 1000])
+def test_moments_match_numpy(size):
+    rng = np.random.default_rng(1)
+    values = rng.normal(28, 4, 500)
+    values[rng.random(500) < 0.1] = np.nan
+    valid = values[~np.isnan(values)]
+
+    acc = MomentsAggregator()
+    for batch in batches(values, size):
+        acc.update(batch)
+
+    assert acc.count == len(valid)
+    assert acc.mean == pytest.approx(valid.mean(), rel=1e-12)
+    assert acc.variance == pytest.approx(valid.var(ddof=1), rel=1e-10)
+    assert acc.std == pytest.approx(valid.std(ddof=1), rel=1e-10)
+    assert acc.total == pytest.approx(valid.sum(), rel=1e-12)
+    assert acc.min == valid.min()
+    assert acc.max == valid.max()
+
+
+def test_moments_merge_equals_single_pass():
+    rng = np.random.default_rng(2)
+    values = rng.normal(70, 10, 300)
+    left, right, whole = MomentsAggregator(), MomentsAggregator(), MomentsAggregator()
+    left.update(values[:120])
+    right.update(values[120:])
+    whole.update(values)
+    left.merge(right)
+    # Mesclar um acumulador vazio não altera nada
+    left.merge(MomentsAggregator())
+
+    assert left.count == whole.count
+    assert left.mean == pytest.approx(whole.mean, rel=1e-12)
+    assert left.m2 == pytest.approx(whole.m2, rel=1e-10)
+    assert (left.min, left.max) == (whole.min, whole.max)
+
+
+def test_moments_without_data():
+    acc = MomentsAggregator()
+    acc.update(np.array([np.nan, np.nan]))
+    assert acc.count == 0
+    assert np.isnan(acc.variance)
+    acc.update(np.array([5.0]))
+    assert acc.mean == 5.0
+    assert np.isnan(acc.variance)
+
+
+@pytest.mark.parametrize("size", [1, 37, 1000])
+def test_grouped_moments_match_numpy(size):
+    rng = np.random.default_rng(3)
+    groups = rng.integers(0, 23, 600)
+    values = rng.normal(30, 5, 600)
+    values[rng.random(600) < 0.1] = np.nan
+
+    acc = GroupedMomentsAggregator(24)
+    for g, v in zip(batches(groups, size), batches(values, size)):
+        acc.update(g, v)
+
+    means, stds = acc.means(), acc.stds()
+    for group in range(24):
+        selected = values[(groups == group) & ~np.isnan(values)]
+        assert acc.count[group] == len(selected)
+        if len(selected) == 0:
+            # Hora 23 nunca aparece
+            assert np.isnan(means[group]) and np.isnan(stds[group])
+            continue
+        assert means[group] == pytest.approx(selected.mean(), rel=1e-12)
+        if len(selected) > 1:
+            assert stds[group] == pytest.approx(selected.std(ddof=1), rel=1e-10)
+        else:
+            assert np.isnan(stds[group])
+
+
+@pytest.mark.parametrize("size", [1, 5, 100])
+def test_lagged_diff_across_batches(size):
+    rng = np.random.default_rng(4)
+    timestamps = np.datetime64("2024-03-01T00:00", "ns") + np.cumsum(
+        rng.integers(30, 900, 50)
+    ).astype("timedelta64[s]")
+    values = rng.normal(75, 5, 50)
+
+    acc = LaggedDiffAggregator()
+    diffs, hours = [], []
+    for ts, v in zip(batches(timestamps, size), batches(values, size)):
+        d, h = acc.diff(ts, v)
+        diffs.append(d)
+        hours.append(h)
+    diffs = np.concatenate(diffs)
+    hours = np.concatenate(hours)
+
+    # A primeira leitura da série não tem anterior
+    assert np.isnan(diffs[0]) and np.isnan(hours[0])
+    np.testing.assert_allclose(diffs[1:], np.diff(values), rtol=1e-12)
+    np.testing.assert_allclose(hours[1:], np.diff(timestamps) / np.timedelta64(1, "h"), rtol=1e-12)
@@ -0,0 +1,83 @@
+"""Redução de pontos para gráficos (utils/downsampling.py)"""
+import numpy as np
+import pytest
+
+from utils.downsampling import downsample, lttb, m4
+
+
+def series(seed: int, count: int = 3000):
+    rng = np.random.default_rng(seed)
+    x = np.cumsum(rng.uniform(0.5, 2.0, count))
+    y = np.sin(x / 50) * 10 + rng.normal(0, 1, count)
+    y[rng.integers(0, count, 5)] += 25
+    return x, y
+
+
+def reference_lttb(x, y, n_out):
+    """LTTB ponto a ponto, com os mesmos limites de bucket"""
+    n = len(x)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = [0]
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        if b + 2 < len(edges):
+            cx = x[hi:edges[b + 2]].mean()
+            cy = y[hi:edges[b + 2]].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        best, best_area = lo, -1.0
+        for i in range(lo, hi):
+            area = abs((x[a] - cx) * (y[i] - y[a]) - (x[a] - x[i]) * (cy - y[a]))
+            if area > best_area:
+                best, best_area = i, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return np.array(selected)
+
+
+@pytest.mark.parametrize("n_out", [3, 10, 500])
+def test_lttb_matches_reference(n_out):
+    x, y = series(1)
+    selected = lttb(x, y, n_out)
+    assert len(selected) == n_out
+    assert selected[0] == 0 and selected[-1] == len(x) - 1
+    assert np.all(np.diff(selected) > 0)
+    np.testing.assert_array_equal(selected, reference_lttb(x, y, n_out))
+
+
+def test_lttb_keeps_all_points_when_not_reducing():
+    x, y = series(2, 50)
+    np.testing.assert_array_equal(lttb(x, y, 50), np.arange(50))
+    np.testing.assert_array_equal(lttb(x, y, 2), np.arange(50))
+
+
+@pytest.mark.parametrize("n_out", [4, 40, 400])
+def test_m4_keeps_extremes_of_each_column(n_out):
+    x, y = series(3)
+    selected = m4(x, y, n_out)
+    assert len(selected) <= n_out
+    assert np.all(np.diff(selected) > 0)
+
+    columns = n_out // 4
+    column = np.minimum(((x - x[0]) / (x[-1] - x[0]) * columns).astype(np.int64), columns - 1)
+    for c in np.unique(column):
+        members = np.flatnonzero(column == c)
+        chosen = selected[np.isin(selected, members)]
+        assert members[0] in chosen and members[-1] in chosen
+        assert y[chosen].min() == y[members].min()
+        assert y[chosen].max() == y[members].max()
+
+
+def test_m4_degenerate_inputs():
+    np.testing.assert_array_equal(m4(np.zeros(10), np.arange(10.0), 4), [0, 9])
+    np.testing.assert_array_equal(m4(np.arange(10.0), np.arange(10.0), 3), np.arange(10))
+
+
+def test_downsample_dispatch():
+    x, y = series(4, 200)
+    np.testing.assert_array_equal(downsample(x, y, 20), lttb(x, y, 20))
+    np.testing.assert_array_equal(downsample(x, y, 20, "m4"), m4(x, y, 20))
+    with pytest.raises(ValueError):
+        downsample(x, y, 20, "media")
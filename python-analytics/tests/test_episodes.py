@@ -0,0 +1,108 @@
+"""Episódios ponderados pelo tempo (utils/episodes.py)"""
+import numpy as np
+import pytest
+
+from utils.episodes import EpisodeAggregator, find_episodes
+
+T0 = np.datetime64("2024-01-01T00:00:00", "ns")
+
+
+def at_hours(*hours):
+    return T0 + (np.asarray(hours, dtype=np.float64) * 3600e9).astype("timedelta64[ns]")
+
+
+def chunked(timestamps, condition, values, size, max_gap_hours=2.0):
+    episodes = EpisodeAggregator(max_gap_hours)
+    for i in range(0, len(timestamps), size):
+        block = slice(i, i + size)
+        episodes.update(timestamps[block], condition[block], values[block])
+    return episodes.finish()
+
+
+def test_episodes_weighted_by_interval():
+    ts = at_hours(0, 1, 2, 3, 4)
+    values = np.array([30.0, 36.0, 37.0, 31.0, 38.0])
+    episodes = find_episodes(ts, values > 35, values)
+
+    assert episodes.typical_hours == 1.0
+    assert episodes.count == 3
+    assert episodes.total_count == 5
+    assert episodes.hours == 3.0
+    assert episodes.total_hours == 5.0
+    assert episodes.percent == 60.0
+    assert episodes.n_episodes == 2
+    assert episodes.longest_hours == 2.0
+    # A condição vale na última leitura
+    assert episodes.ongoing_since == ts[4]
+
+    top = episodes.top()
+    np.testing.assert_array_equal(top["inicio"], ts[[1, 4]])
+    np.testing.assert_array_equal(top["fim"], ts[[2, 4]])
+    np.testing.assert_array_equal(top["duracao_horas"], [2.0, 1.0])
+    np.testing.assert_array_equal(top["pico"], [37.0, 38.0])
+
+
+def test_gap_closes_episode_and_weighs_typical_interval():
+    ts = at_hours(0, 0.5, 5, 5.5)
+    episodes = find_episodes(ts, np.ones(4, dtype=bool), max_gap_hours=2)
+
+    assert episodes.typical_hours == 0.5
+    assert episodes.n_episodes == 2
+    # Leitura antes da lacuna e a última valem o intervalo típico
+    assert episodes.total_hours == 2.0
+    top = episodes.top()
+    np.testing.assert_array_equal(top["inicio"], ts[[0, 2]])
+    np.testing.assert_array_equal(top["fim"], ts[[1, 3]])
+    np.testing.assert_array_equal(top["duracao_horas"], [1.0, 1.0])
+
+
+def test_no_condition_and_empty_series():
+    ts = at_hours(0, 1, 2)
+    episodes = find_episodes(ts, np.zeros(3, dtype=bool))
+    assert episodes.n_episodes == 0
+    assert episodes.hours == 0.0
+    assert episodes.total_hours == 3.0
+    assert episodes.ongoing_since is None
+    assert len(episodes.top()["inicio"]) == 0
+
+    empty = EpisodeAggregator().finish()
+    assert empty.total_count == 0
+    assert empty.percent == 0.0
+    assert empty.longest_hours == 0.0
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("size", [1, 2, 7, 64])
+def test_result_does_not_depend_on_chunk_size(seed, size):
+    rng = np.random.default_rng(seed)
+    steps = rng.choice([0.05, 0.1, 0.25], size=300)
+    steps[rng.random(300) < 0.02] = 4.0
+    ts = at_hours(*np.cumsum(steps))
+    values = rng.normal(35, 2, size=300)
+    values[rng.random(300) < 0.05] = np.nan
+    condition = values > 35
+
+    expected = find_episodes(ts, condition, values)
+    actual = chunked(ts, condition, values, size)
+
+    assert actual.typical_hours == expected.typical_hours
+    assert actual.count == expected.count
+    assert actual.total_count == expected.total_count
+    assert actual.n_episodes == expected.n_episodes
+    assert actual.ongoing_since == expected.ongoing_since
+    assert actual.hours == pytest.approx(expected.hours, rel=1e-12)
+    assert actual.total_hours == pytest.approx(expected.total_hours, rel=1e-12)
+
+    top_expected = expected.top()
+    top_actual = actual.top()
+    np.testing.assert_array_equal(top_actual["inicio"], top_expected["inicio"])
+    np.testing.assert_array_equal(top_actual["fim"], top_expected["fim"])
+    np.testing.assert_array_equal(top_actual["pico"], top_expected["pico"])
+    np.testing.assert_allclose(top_actual["duracao_horas"], top_expected["duracao_horas"], rtol=1e-12)
+
+
+def test_finish_is_idempotent():
+    ts = at_hours(0, 1, 2)
+    episodes = find_episodes(ts, np.array([True, False, True]))
+    hours = episodes.hours
+    assert episodes.finish().hours == hours
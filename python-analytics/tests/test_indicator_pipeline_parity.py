@@ -0,0 +1,288 @@
+"""
+Paridade dos indicadores: caminho em Python x lógica do pipeline
+
+Sem MongoDB: as expressões (IRF_EXPRESSION, condições) são avaliadas com a
+semântica de nulos do MongoDB e os estágios de utils/episode_pipeline.py
+($setWindowFields, numeração dos episódios, $facet) são reproduzidos
+leitura a leitura. O documento resultante passa pelo summarize real e a
+resposta tem de ser idêntica à do caminho em Python, lido em lotes
+pequenos, sobre uma série irregular com lacunas e leituras nulas.
+"""
+import asyncio
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from models.sensor_series import SensorSeries
+from services import indicators_service
+from services.dataset_loader import DeviceDatasetLoader
+from services.indicators_service import IRF_EXPRESSION, IRF_LEVELS, IndicatorsService
+from utils.episode_pipeline import summarize
+from utils.episodes import EPISODE_MAX_GAP_HOURS, EpisodeAggregator, histogram_median
+
+DEVICE = "paridade"
+DAYS = 5
+
+
+def evaluate(expression, doc):
+    """Expressão de agregação com a semântica de nulos do MongoDB"""
+    if isinstance(expression, str):
+        return doc.get(expression[1:]) if expression.startswith("$") else expression
+    if not isinstance(expression, dict):
+        return expression
+
+    (operator, args), = expression.items()
+    if operator == "$cond":
+        condition, then, otherwise = args
+        return evaluate(then if evaluate(condition, doc) else otherwise, doc)
+    if operator == "$and":
+        return all(evaluate(a, doc) for a in args)
+    if operator == "$not":
+        return not evaluate(args[0], doc)
+
+    values = [evaluate(a, doc) for a in args]
+    if operator in ("$gt", "$gte", "$lte"):
+        # Nulo ordena antes de qualquer número
+        left, right = (-math.inf if v is None else v for v in values)
+        return {"$gt": left > right, "$gte": left >= right, "$lte": left <= right}[operator]
+    if operator in ("$min", "$max"):
+        present = [v for v in values if v is not None]
+        if not present:
+            return None
+        return min(present) if operator == "$min" else max(present)
+    if any(v is None for v in values):
+        return None
+    if operator == "$add":
+        return sum(values)
+    if operator == "$subtract":
+        return values[0] - values[1]
+    if operator == "$multiply":
+        return math.prod(values)
+    if operator == "$divide":
+        return values[0] / values[1]
+    raise NotImplementedError(operator)
+
+
+def hours(later: datetime, earlier: datetime) -> float:
+    """hours_between: milissegundos -> segundos -> horas"""
+    return (later - earlier) // timedelta(milliseconds=1) / 1000 / 3600
+
+
+def pipeline_facet(docs, value, conditions, max_gap_hours=EPISODE_MAX_GAP_HOURS, top=5):
+    """Documento do $facet de episode_pipeline, estágio a estágio"""
+    rows = [{"timestamp": d["timestamp"], "valor": evaluate(value, d)} for d in docs]
+    for row in rows:
+        for name, condition in conditions.items():
+            row[f"c_{name}"] = bool(evaluate(condition, row))
+
+    # $setWindowFields ($shift) e os $set de dt, lacuna, peso e início
+    for i, row in enumerate(rows):
+        last = i == len(rows) - 1
+        row["dt"] = 0 if last else hours(rows[i + 1]["timestamp"], row["timestamp"])
+        gap_before = i > 0 and hours(row["timestamp"], rows[i - 1]["timestamp"]) > max_gap_hours
+        row["tipica"] = last or row["dt"] > max_gap_hours
+        row["peso"] = 0 if row["tipica"] else row["dt"]
+        for name in conditions:
+            previous = i > 0 and rows[i - 1][f"c_{name}"]
+            row[f"inicio_{name}"] = row[f"c_{name}"] and not (previous and not gap_before)
+
+    # Soma acumulada dos inícios numera os episódios
+    for name in conditions:
+        number = 0
+        for row in rows:
+            number += row[f"inicio_{name}"]
+            row[f"e_{name}"] = number
+
+    values = [r["valor"] for r in rows if r["valor"] is not None]
+    resumo = {
+        "leituras": len(rows),
+        "media": sum(values) / len(values) if values else None,
+        "maximo": max(values) if values else None,
+        "horas": sum(r["peso"] for r in rows),
+        "tipicas": sum(r["tipica"] for r in rows)
+    }
+    for name in conditions:
+        hits = [r for r in rows if r[f"c_{name}"]]
+        resumo[f"{name}_leituras"] = len(hits)
+        resumo[f"{name}_horas"] = sum(r["peso"] for r in hits)
+        resumo[f"{name}_tipicas"] = sum(r["tipica"] for r in hits)
+
+    intervals = {}
+    for r in rows:
+        if not r["tipica"] and r["dt"] > 0:
+            intervals[r["dt"]] = intervals.get(r["dt"], 0) + 1
+    facet = {
+        "resumo": [resumo],
+        "intervalos": [{"_id": dt, "n": n} for dt, n in sorted(intervals.items())]
+    }
+
+    for name in conditions:
+        episodes = {}
+        for r in rows:
+            if r[f"c_{name}"]:
+                e = episodes.setdefault(r[f"e_{name}"], {
+                    "inicio": r["timestamp"], "fim": r["timestamp"], "horas": 0, "tipica": False, "pico": None
+                })
+                e["fim"] = r["timestamp"]
+                e["horas"] += r["peso"]
+                e["tipica"] |= r["tipica"]
+                e["pico"] = evaluate({"$max": [e["pico"], r["valor"]]}, {})
+        ordered = sorted(episodes.values(), key=lambda e: (-e["horas"], e["inicio"]))
+        groups = []
+        for tipica in (False, True):
+            chosen = [e for e in ordered if e["tipica"] == tipica]
+            if chosen:
+                groups.append({
+                    "_id": tipica,
+                    "n": len(chosen),
+                    "episodios": [
+                        {k: e[k] for k in ("inicio", "fim", "horas", "pico")} for e in chosen[:top]
+                    ]
+                })
+        facet[f"episodios_{name}"] = groups
+    return facet
+
+
+def irregular_readings(seed: int):
+    """Intervalos de 30 s a 20 min, lacunas de 3-8h e leituras sem temperatura/umidade"""
+    rng = np.random.default_rng(seed)
+    end = datetime.now().replace(microsecond=0) - timedelta(hours=1)
+    t = end - timedelta(days=DAYS) + timedelta(hours=2)
+    docs = []
+    while t < end:
+        hour = t.hour + t.minute / 60
+        temperatura = 34 + 7 * math.sin(2 * math.pi * (hour - 9) / 24) + rng.normal(0, 1.5)
+        umidade = 80 + 15 * math.sin(2 * math.pi * (hour - 11) / 24) + rng.normal(0, 4)
+        docs.append({
+            "timestamp": t,
+            "temperatura": None if rng.random() < 0.03 else round(temperatura, 2),
+            "umidade": None if rng.random() < 0.03 else round(umidade, 2)
+        })
+        step = timedelta(milliseconds=int(rng.choice([30_000, 60_000, 300_000, 1_200_000]) + rng.integers(-900, 900)))
+        if rng.random() < 0.004:
+            step = timedelta(milliseconds=int(rng.uniform(3, 8) * 3_600_000))
+        t += step
+    return docs
+
+
+class ChunkedService(IndicatorsService):
+    """Caminho em Python com a série entregue em lotes pequenos"""
+
+    def __init__(self, series: SensorSeries, chunk: int):
+        super().__init__()
+        self.series = series
+        self.chunk = chunk
+
+    async def _iter_last_hours(self, device_id, hours, loader=None):
+        for i in range(0, len(self.series), self.chunk):
+            yield SensorSeries(
+                self.series.timestamps[i:i + self.chunk],
+                self.series.temperatura[i:i + self.chunk],
+                self.series.umidade[i:i + self.chunk]
+            )
+
+
+def python_and_pipeline(seed: int, chunk: int, call, value, conditions, top):
+    docs = irregular_readings(seed)
+    series = SensorSeries.from_documents(docs)
+    loader = DeviceDatasetLoader.from_series(DEVICE, series, DAYS * 24, datetime.now())
+
+    service = ChunkedService(series, chunk)
+    python = asyncio.run(call(service, loader))
+
+    facet = pipeline_facet(docs, value, conditions, top=top)
+
+    async def summarize_episodes(device_id, hours, value, conditions, top=5):
+        return facet
+
+    service.repository.summarize_episodes = summarize_episodes
+    pipelines_enabled = indicators_service.INDICATOR_PIPELINES_ENABLED
+    indicators_service.INDICATOR_PIPELINES_ENABLED = True
+    try:
+        pipeline = asyncio.run(call(service, None))
+    finally:
+        indicators_service.INDICATOR_PIPELINES_ENABLED = pipelines_enabled
+    return docs, python, pipeline, facet
+
+
+def test_histogram_median_matches_numpy():
+    rng = np.random.default_rng(1)
+    for size in (1, 2, 3, 10, 101):
+        samples = rng.choice([0.1, 0.25, 0.3, 2.0], size=size)
+        values, counts = np.unique(samples, return_counts=True)
+        assert histogram_median(values, counts) == np.median(samples)
+    assert histogram_median(np.empty(0), np.empty(0, dtype=np.int64)) == 0.0
+
+
+def test_irf_expression_matches_numpy_and_skips_nulls():
+    docs = irregular_readings(2)
+    series = SensorSeries.from_documents(docs)
+    temp_risk = np.clip((series.temperatura - 30) / 10, 0, 1) * 50
+    umid_risk = np.clip((series.umidade - 75) / 25, 0, 1) * 50
+    expected = np.clip(temp_risk + umid_risk, 0, 100)
+
+    actual = [evaluate(IRF_EXPRESSION, doc) for doc in docs]
+    assert any(v is None for v in actual)
+    for irf, value in zip(expected, actual):
+        if np.isnan(irf):
+            assert value is None
+        else:
+            assert value == irf
+
+
+@pytest.mark.parametrize("seed,chunk", [(3, 17), (4, 250), (5, 10_000)])
+def test_fungus_risk_index_parity(seed, chunk):
+    _, python, pipeline, _ = python_and_pipeline(
+        seed, chunk,
+        lambda service, loader: service.get_fungus_risk_index(DEVICE, DAYS, loader=loader),
+        IRF_EXPRESSION, IRF_LEVELS, top=1
+    )
+    assert "erro" not in python
+    assert python["periodos_criticos"] > 0
+    assert pipeline == python
+
+
+@pytest.mark.parametrize("seed", [6, 7])
+def test_critical_time_parity(seed):
+    limit = 36.0
+    _, python, pipeline, _ = python_and_pipeline(
+        seed, 10_000,
+        lambda service, loader: service.get_critical_time_above_limit(DEVICE, DAYS, limit, loader=loader),
+        "$temperatura", {"acima": {"$gt": ["$valor", limit]}}, top=5
+    )
+    assert "erro" not in python
+    assert python["total_periodos_criticos"] > 1
+    assert pipeline == python
+
+
+def test_summarize_matches_episode_aggregator():
+    """Contagens, episódios e intervalo típico exatos; horas a menos da ordem das somas"""
+    limit = 36.0
+    docs = irregular_readings(8)
+    series = SensorSeries.from_documents(docs)
+    facet = pipeline_facet(docs, "$temperatura", {"acima": {"$gt": ["$valor", limit]}}, top=1000)
+    _, summaries = summarize(facet, ["acima"])
+    summary = summaries["acima"]
+
+    aggregator = EpisodeAggregator()
+    for i in range(0, len(series), 40):
+        block = slice(i, i + 40)
+        aggregator.update(
+            series.timestamps[block], series.temperatura[block] > limit, series.temperatura[block]
+        )
+    aggregator.finish()
+
+    assert summary.count == aggregator.count
+    assert summary.total_count == aggregator.total_count
+    assert summary.n_episodes == aggregator.n_episodes
+    assert math.isclose(summary.hours, aggregator.hours, rel_tol=1e-12)
+    assert math.isclose(summary.total_hours, aggregator.total_hours, rel_tol=1e-12)
+
+    expected = aggregator.top()
+    actual = summary.top()
+    np.testing.assert_array_equal(actual["inicio"], expected["inicio"])
+    np.testing.assert_array_equal(actual["fim"], expected["fim"])
+    np.testing.assert_array_equal(actual["pico"], expected["pico"])
+    np.testing.assert_allclose(actual["duracao_horas"], expected["duracao_horas"], rtol=1e-12)
@@ -0,0 +1,71 @@
+"""Kernels NumPy dos indicadores (utils/kernels.py)"""
+import math
+
+import numpy as np
+import pandas as pd
+
+from utils.kernels import (
+    COMFORT_CLASSES,
+    anomaly_rows,
+    comfort_classes,
+    forecast_rows,
+    heat_index,
+    isoformat,
+    value_counts
+)
+
+
+def test_heat_index_matches_scalar_formula():
+    temperatura = np.array([20.0, 30.0, 38.5])
+    umidade = np.array([40.0, 80.0, 95.0])
+    for t, u, indice in zip(temperatura, umidade, heat_index(temperatura, umidade)):
+        vapor = 6.11 * math.exp(5417.7530 * ((1 / 273.16) - (1 / (t + 273.15))))
+        assert math.isclose(indice, t + 0.5555 * (vapor * (u / 100) - 10), rel_tol=1e-12)
+
+
+def test_comfort_classes_limits():
+    indice = np.array([10.0, 24.0, 26.9, 27.0, 32.99, 33.0, np.nan])
+    assert comfort_classes(indice).tolist() == [
+        COMFORT_CLASSES[0],
+        COMFORT_CLASSES[1],
+        COMFORT_CLASSES[1],
+        COMFORT_CLASSES[2],
+        COMFORT_CLASSES[3],
+        COMFORT_CLASSES[4],
+        COMFORT_CLASSES[4]
+    ]
+
+
+def test_value_counts_order():
+    labels = np.array(["b", "a", "c", "a", "c", "d"])
+    counts = value_counts(labels)
+    # Empate entre a e c: a aparece primeiro
+    assert list(counts.items()) == [("a", 2), ("c", 2), ("b", 1), ("d", 1)]
+    assert value_counts(labels) == pd.Series(labels).value_counts().to_dict()
+
+
+def test_isoformat_matches_pandas():
+    timestamps = np.array(["2024-01-01T00:00:00", "2024-01-01T10:30:15.250"], dtype="datetime64[ns]")
+    assert isoformat(timestamps) == ["2024-01-01T00:00:00", "2024-01-01T10:30:15.250000"]
+
+
+def test_anomaly_rows():
+    timestamps = np.array(["2024-01-01T00:00", "2024-01-01T01:00", "2024-01-01T02:00"], dtype="datetime64[ns]")
+    rows = anomaly_rows(
+        timestamps, np.array([20.123, 35.456, 41.0]), np.array([0.5, 3.2, 4.5]), 3, "temperatura"
+    )
+    assert rows == [
+        {"timestamp": "2024-01-01T01:00:00", "tipo": "temperatura", "valor": 35.46, "zscore": 3.2, "gravidade": "moderada"},
+        {"timestamp": "2024-01-01T02:00:00", "tipo": "temperatura", "valor": 41.0, "zscore": 4.5, "gravidade": "alta"}
+    ]
+
+
+def test_forecast_rows():
+    timestamps = np.array(["2024-01-01T05:00"], dtype="datetime64[ns]")
+    rows = forecast_rows(timestamps, np.array([25.678]), np.array([24.001]), np.array([27.999]))
+    assert rows == [{
+        "timestamp": "2024-01-01T05:00:00",
+        "previsto": 25.68,
+        "limite_inferior": 24.0,
+        "limite_superior": 28.0
+    }]
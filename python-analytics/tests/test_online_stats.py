@@ -0,0 +1,92 @@
+"""Ring de momentos por dispositivo (DeviceMoments em repositories/online_stats.py)"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from models.sensor_series import SensorSeries
+from repositories.online_stats import FIELDS, DeviceMoments
+
+START = datetime(2024, 6, 1)
+BUCKET = 5
+
+
+def readings(seed: int, hours: float, count: int) -> SensorSeries:
+    rng = np.random.default_rng(seed)
+    seconds = np.sort(rng.uniform(0, hours * 3600, count)).round()
+    temperatura = rng.normal(30, 3, count)
+    umidade = rng.normal(75, 8, count)
+    temperatura[rng.random(count) < 0.05] = np.nan
+    return SensorSeries(
+        np.datetime64(START, "ns") + (seconds * 1e9).astype("timedelta64[ns]"),
+        temperatura,
+        umidade
+    )
+
+
+def add_in_chunks(moments: DeviceMoments, series: SensorSeries, size: int) -> None:
+    for i in range(0, len(series), size):
+        moments.add(SensorSeries(
+            series.timestamps[i:i + size], series.temperatura[i:i + size], series.umidade[i:i + size]
+        ))
+
+
+def assert_window(moments: DeviceMoments, series: SensorSeries, start: datetime) -> None:
+    """Janela alinhada ao início do bucket que contém `start`"""
+    bucket_start = np.datetime64(start, "ns").astype("datetime64[m]")
+    bucket_start -= bucket_start.astype(np.int64) % BUCKET
+    selected = series.timestamps >= bucket_start
+    window = moments.window(start)
+
+    assert window.readings == selected.sum()
+    assert window.start == series.timestamps[selected][0]
+    assert window.end == series.timestamps[selected][-1]
+    for field in FIELDS:
+        values = getattr(series, field)[selected]
+        values = values[~np.isnan(values)]
+        acc = window.fields[field]
+        assert acc.count == len(values)
+        assert acc.mean == pytest.approx(values.mean(), rel=1e-12)
+        assert acc.variance == pytest.approx(values.var(ddof=1), rel=1e-9)
+        assert (acc.min, acc.max) == (values.min(), values.max())
+
+
+@pytest.mark.parametrize("size", [1, 97, 5000])
+def test_window_matches_numpy(size):
+    series = readings(1, 20, 3000)
+    moments = DeviceMoments(horizon_hours=24, bucket_minutes=BUCKET)
+    add_in_chunks(moments, series, size)
+
+    assert moments.readings == len(series)
+    assert moments.last_timestamp == series.timestamps[-1]
+    for hours in (0.5, 3, 19.5):
+        assert_window(moments, series, START + timedelta(hours=20 - hours))
+    assert_window(moments, series, START - timedelta(hours=1))
+
+
+def test_ring_drops_buckets_beyond_horizon():
+    series = readings(2, 10, 2000)
+    moments = DeviceMoments(horizon_hours=2, bucket_minutes=BUCKET)
+    add_in_chunks(moments, series, 150)
+
+    # Só os buckets das últimas 2 horas (e o atual) continuam no ring
+    newest = series.timestamps[-1].astype("datetime64[m]")
+    first_kept = newest - newest.astype(np.int64) % BUCKET - np.timedelta64(2 * 60, "m")
+    kept = series.timestamps >= first_kept
+    window = moments.window(START)
+    assert window.readings == kept.sum()
+    assert window.start == series.timestamps[kept][0]
+
+    # Leituras atrasadas de buckets já descartados são ignoradas
+    before = moments.window(START).readings
+    moments.add(SensorSeries(series.timestamps[:10], series.temperatura[:10], series.umidade[:10]))
+    assert moments.window(START).readings == before
+
+
+def test_empty_window():
+    moments = DeviceMoments(horizon_hours=1, bucket_minutes=BUCKET)
+    moments.add(SensorSeries.empty())
+    window = moments.window(START)
+    assert window.readings == 0
+    assert window.start is None and window.end is None
+    assert all(window.fields[field].count == 0 for field in FIELDS)
@@ -0,0 +1,75 @@
+"""Sketch de quantis mesclável (utils/quantile_sketch.py)"""
+import numpy as np
+import pytest
+
+from utils.quantile_sketch import SKETCH_ERROR_BOUND, QuantileSketch
+
+QS = [0.0, 0.01, 0.25, 0.5, 0.75, 0.99, 1.0]
+
+
+def values(seed: int, count: int = 5000):
+    rng = np.random.default_rng(seed)
+    data = rng.normal(27, 6, count)
+    data[rng.random(count) < 0.02] = np.nan
+    return data
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_quantiles_within_error_bound(seed):
+    data = values(seed)
+    sketch = QuantileSketch.from_values(data)
+    exact = np.nanquantile(data, QS)
+
+    assert sketch.count == np.count_nonzero(~np.isnan(data))
+    np.testing.assert_allclose(sketch.quantiles(QS), exact, rtol=0, atol=SKETCH_ERROR_BOUND + 1e-12)
+    assert sketch.quantile(0.5) == sketch.quantiles([0.5])[0]
+
+
+def test_iqr_bounds_within_error_bound():
+    data = values(5)
+    k = 1.5
+    q1, q3 = np.nanquantile(data, [0.25, 0.75])
+    expected = (q1, q3, q1 - k * (q3 - q1), q3 + k * (q3 - q1))
+    bound = (1 + 2 * k) * SKETCH_ERROR_BOUND + 1e-12
+    actual = QuantileSketch.from_values(data).iqr_bounds(k)
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=bound)
+
+
+def test_merged_sketches_equal_sketch_of_union():
+    data = values(6)
+    parts = np.array_split(data, 7)
+    expected = QuantileSketch.from_values(data)
+
+    merged = QuantileSketch.merge_all(QuantileSketch.from_values(p) for p in parts)
+    from_histograms = QuantileSketch.from_histograms(
+        QuantileSketch.from_values(p).to_histogram() for p in parts
+    )
+    pairwise = QuantileSketch.from_values(parts[0])
+    for part in parts[1:]:
+        pairwise = pairwise.merge(QuantileSketch.from_values(part))
+
+    for sketch in (merged, from_histograms, pairwise):
+        np.testing.assert_array_equal(sketch.bins, expected.bins)
+        np.testing.assert_array_equal(sketch.counts, expected.counts)
+
+
+def test_histogram_round_trip():
+    sketch = QuantileSketch.from_values(np.array([25.34, 25.26, -1.0, 25.3, 40.05]))
+    histogram = sketch.to_histogram()
+    # Meio bin arredonda para o par, como o $round do MongoDB (400,5 -> 400)
+    assert histogram == {"-10": 1, "253": 3, "400": 1}
+    restored = QuantileSketch.from_histogram(histogram)
+    np.testing.assert_array_equal(restored.bins, sketch.bins)
+    np.testing.assert_array_equal(restored.counts, sketch.counts)
+
+
+def test_empty_sketch():
+    for sketch in (
+        QuantileSketch.empty(),
+        QuantileSketch.from_values(np.array([np.nan])),
+        QuantileSketch.from_histogram(None),
+        QuantileSketch.from_histograms([None, {}]),
+        QuantileSketch.merge_all([])
+    ):
+        assert sketch.count == 0
+        assert all(np.isnan(sketch.quantiles([0.25, 0.75])))
@@ -0,0 +1,100 @@
+"""Somas para tendência e correlação (utils/regression_sums.py)"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from scipy import stats
+
+from utils.regression_sums import ROLLUP_FIELDS, SUMS, RegressionSums
+
+START = datetime(2024, 5, 1)
+
+
+def readings(seed: int, count: int = 2000):
+    """Leituras irregulares ao longo de ~5 dias, com nulos"""
+    rng = np.random.default_rng(seed)
+    seconds = np.sort(rng.uniform(0, 5 * 86400, count)).round(3)
+    timestamps = np.datetime64(START, "ns") + (seconds * 1e9).astype("timedelta64[ns]")
+    hour = seconds / 3600
+    temperatura = 25 + 0.02 * hour + 4 * np.sin(2 * np.pi * hour / 24) + rng.normal(0, 1, count)
+    umidade = 80 - 0.5 * temperatura + rng.normal(0, 2, count)
+    temperatura[rng.random(count) < 0.03] = np.nan
+    umidade[rng.random(count) < 0.03] = np.nan
+    return timestamps, temperatura, umidade
+
+
+def hourly_buckets(timestamps, temperatura, umidade):
+    """Buckets horários como os dos agregados (tempo a partir do início de cada bucket)"""
+    hours = (timestamps - np.datetime64(START, "ns")) // np.timedelta64(1, "h")
+    buckets = []
+    for hour in np.unique(hours):
+        selected = hours == hour
+        inicio = START + timedelta(hours=int(hour))
+        sums = RegressionSums.from_arrays(
+            timestamps[selected], temperatura[selected], umidade[selected], origin=inicio
+        )
+        bucket = {"inicio": inicio}
+        bucket.update({field: getattr(sums, name) for name, field in ROLLUP_FIELDS.items()})
+        buckets.append(bucket)
+    return buckets
+
+
+def test_trend_and_pearson_match_scipy():
+    timestamps, temperatura, umidade = readings(1)
+    valid = ~(np.isnan(temperatura) | np.isnan(umidade))
+    t = (timestamps[valid] - timestamps[valid][0]) / np.timedelta64(1, "h")
+
+    sums = RegressionSums.from_arrays(timestamps, temperatura, umidade)
+    assert sums.n == valid.sum()
+
+    for field, values in (("temperatura", temperatura), ("umidade", umidade)):
+        expected = stats.linregress(t, values[valid])
+        slope, r2 = sums.trend(field)
+        assert slope == pytest.approx(expected.slope, rel=1e-9)
+        assert r2 == pytest.approx(expected.rvalue ** 2, rel=1e-9)
+
+    r, p = sums.pearson()
+    expected_r, expected_p = stats.pearsonr(temperatura[valid], umidade[valid])
+    assert r == pytest.approx(expected_r, rel=1e-9)
+    assert p == pytest.approx(expected_p, rel=1e-6, abs=1e-300)
+
+
+def test_buckets_combine_to_raw_sums():
+    timestamps, temperatura, umidade = readings(2)
+    raw = RegressionSums.from_arrays(timestamps, temperatura, umidade, origin=START)
+    combined = RegressionSums.from_buckets(hourly_buckets(timestamps, temperatura, umidade), origin=START)
+    for name in SUMS:
+        assert getattr(combined, name) == pytest.approx(getattr(raw, name), rel=1e-9)
+
+
+def test_merge_buckets_and_raw_edges():
+    """Janela = buckets inteiros + leituras brutas das pontas, na mesma origem"""
+    timestamps, temperatura, umidade = readings(3)
+    window_start = START + timedelta(hours=7, minutes=20)
+    first_full = START + timedelta(hours=8)
+    inside = timestamps >= np.datetime64(window_start, "ns")
+    edge = inside & (timestamps < np.datetime64(first_full, "ns"))
+    full = timestamps >= np.datetime64(first_full, "ns")
+
+    buckets = hourly_buckets(timestamps[full], temperatura[full], umidade[full])
+    merged = RegressionSums.from_buckets(buckets, origin=window_start).merge(
+        RegressionSums.from_arrays(timestamps[edge], temperatura[edge], umidade[edge], origin=window_start)
+    )
+    expected = RegressionSums.from_arrays(
+        timestamps[inside], temperatura[inside], umidade[inside], origin=window_start
+    )
+    for field in ("temperatura", "umidade"):
+        assert merged.trend(field) == pytest.approx(expected.trend(field), rel=1e-9)
+    assert merged.pearson() == pytest.approx(expected.pearson(), rel=1e-6)
+
+
+def test_degenerate_sums():
+    ts = np.array([np.datetime64(START, "ns")] * 3)
+    sums = RegressionSums.from_arrays(ts, np.array([20.0, 21.0, 22.0]), np.array([70.0, 70.0, 70.0]))
+    # Tempo constante: sem tendência; umidade constante: sem correlação
+    assert sums.trend("temperatura") == (0.0, 0.0)
+    assert all(np.isnan(sums.pearson()))
+
+    empty = RegressionSums.from_arrays(ts, np.full(3, np.nan), np.full(3, np.nan))
+    assert empty.n == 0
+    assert RegressionSums.from_buckets([{"inicio": START, "reg_n": 0}]).n == 0
@@ -0,0 +1,140 @@
+import numpy as np
+from typing import Optional
+
+
+class MomentsAggregator:
+    """
+    Acumulador de momentos (contagem, média, M2, mín, máx) por lotes
+
+    Cada lote é resumido com NumPy e combinado ao estado atual pela fórmula
+    de Chan et al., então a memória não depende do tamanho da janela.
+    Valores NaN são ignorados.
+    """
+
+    __slots__ = ("count", "mean", "m2", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values: np.ndarray) -> None:
+        """Incorporar um lote de valores"""
+        values = values[~np.isnan(values)]
+        n = len(values)
+        if n == 0:
+            return
+
+        mean = float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        self._combine(n, mean, m2, float(values.min()), float(values.max()))
+
+    def merge(self, other: "MomentsAggregator") -> None:
+        """Combinar com outro acumulador"""
+        if other.count:
+            self._combine(other.count, other.mean, other.m2, other.min, other.max)
+
+    def _combine(self, n: int, mean: float, m2: float, vmin: float, vmax: float) -> None:
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+        self.min = min(self.min, vmin)
+        self.max = max(self.max, vmax)
+
+    @property
+    def variance(self) -> float:
+        """Variância amostral (ddof=1, como no pandas)"""
+        return self.m2 / (self.count - 1) if self.count > 1 else np.nan
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.variance))
+
+    @property
+    def total(self) -> float:
+        """Soma dos valores"""
+        return self.mean * self.count
+
+
+class GroupedMomentsAggregator:
+    """
+    Momentos por grupo (ex.: hora do dia) acumulados por lotes
+
+    Os grupos são índices inteiros em [0, n_groups); cada lote é resumido
+    com np.bincount e combinado grupo a grupo de forma vetorizada.
+    """
+
+    def __init__(self, n_groups: int):
+        self.n_groups = n_groups
+        self.count = np.zeros(n_groups, dtype=np.int64)
+        self.mean = np.zeros(n_groups, dtype=np.float64)
+        self.m2 = np.zeros(n_groups, dtype=np.float64)
+
+    def update(self, groups: np.ndarray, values: np.ndarray) -> None:
+        """Incorporar um lote de valores com seus índices de grupo"""
+        valid = ~np.isnan(values)
+        groups = groups[valid]
+        values = values[valid]
+        if len(values) == 0:
+            return
+
+        n = np.bincount(groups, minlength=self.n_groups)
+        sums = np.bincount(groups, weights=values, minlength=self.n_groups)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(n > 0, sums / n, 0.0)
+        m2 = np.bincount(groups, weights=(values - mean[groups]) ** 2, minlength=self.n_groups)
+
+        total = self.count + n
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = mean - self.mean
+            self.mean = np.where(total > 0, self.mean + delta * n / total, 0.0)
+            self.m2 = np.where(
+                total > 0,
+                self.m2 + m2 + delta * delta * self.count * n / total,
+                0.0
+            )
+        self.count = total
+
+    def means(self) -> np.ndarray:
+        """Média por grupo (NaN para grupos sem dados)"""
+        return np.where(self.count > 0, self.mean, np.nan)
+
+    def stds(self) -> np.ndarray:
+        """Desvio padrão amostral por grupo (NaN com menos de 2 leituras)"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.count > 1, np.sqrt(self.m2 / (self.count - 1)), np.nan)
+
+
+class LaggedDiffAggregator:
+    """
+    Diferenças entre leituras consecutivas ao longo de lotes
+
+    Guarda a última leitura do lote anterior para que a primeira diferença
+    de cada lote seja calculada corretamente.
+    """
+
+    def __init__(self):
+        self.last_timestamp: Optional[np.datetime64] = None
+        self.last_value: float = np.nan
+
+    def diff(self, timestamps: np.ndarray, values: np.ndarray):
+        """Retornar (Δvalor, Δt em horas) alinhados com as leituras do lote"""
+        if self.last_timestamp is None:
+            prev_ts = np.concatenate([[timestamps[0]], timestamps[:-1]])
+            prev_values = np.concatenate([[np.nan], values[:-1]])
+        else:
+            prev_ts = np.concatenate([[self.last_timestamp], timestamps[:-1]])
+            prev_values = np.concatenate([[self.last_value], values[:-1]])
+
+        value_diff = values - prev_values
+        hours_diff = (timestamps - prev_ts) / np.timedelta64(1, "s") / 3600
+        if self.last_timestamp is None:
+            hours_diff[0] = np.nan
+
+        self.last_timestamp = timestamps[-1]
+        self.last_value = values[-1]
+        return value_diff, hours_diff
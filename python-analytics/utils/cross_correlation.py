@@ -0,0 +1,83 @@
+"""
+Matriz de correlação entre dispositivos
+
+As séries reamostradas de cada dispositivo são alinhadas em uma grade de
+tempo comum (uma linha por intervalo, uma coluna por dispositivo, NaN onde
+o dispositivo não tem leitura). A matriz sai de produtos de matrizes sobre
+a grade mascarada: cada par usa apenas os intervalos em que os dois
+dispositivos têm valor (pairwise complete, como DataFrame.corr).
+
+O Spearman é o Pearson dos postos, calculados por dispositivo sobre os seus
+próprios intervalos; quando dois dispositivos têm lacunas em intervalos
+diferentes, os postos não são recalculados para o par e o resultado é uma
+aproximação (exato quando as grades se sobrepõem por completo).
+"""
+from typing import Dict, List, Tuple
+import numpy as np
+from scipy import stats
+from models.sensor_series import SensorSeries
+
+# Mínimo de intervalos em comum para um par ter correlação
+MIN_OVERLAP = 10
+
+
+def align_to_grid(
+    series_by_device: Dict[str, SensorSeries],
+    device_ids: List[str],
+    start: np.datetime64,
+    end: np.datetime64,
+    bin_minutes: int,
+    field: str
+) -> np.ndarray:
+    """Grade (intervalos × dispositivos) de `field`; NaN onde não há leitura"""
+    bin_ns = bin_minutes * 60 * 10**9
+    first = int(start.astype("datetime64[ns]").astype(np.int64)) // bin_ns
+    n_bins = int(end.astype("datetime64[ns]").astype(np.int64)) // bin_ns - first + 1
+
+    grid = np.full((n_bins, len(device_ids)), np.nan)
+    for column, device_id in enumerate(device_ids):
+        series = series_by_device.get(device_id)
+        if series is None or not len(series):
+            continue
+        rows = series.timestamps.astype("datetime64[ns]").astype(np.int64) // bin_ns - first
+        inside = (rows >= 0) & (rows < n_bins)
+        grid[rows[inside], column] = getattr(series, field)[inside]
+    return grid
+
+
+def masked_corrcoef(grid: np.ndarray, min_overlap: int = MIN_OVERLAP) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (matriz de Pearson, intervalos em comum) de todas as colunas, par a par
+
+    Com M a máscara de valores e X0 a grade com zeros nas lacunas, as somas
+    de cada par sobre os intervalos comuns são M'M, X0'M, (X0²)'M e X0'X0.
+    Pares com menos de `min_overlap` intervalos ou variância nula ficam NaN.
+    """
+    mask = ~np.isnan(grid)
+    m = mask.astype(np.float64)
+    x = np.where(mask, grid, 0.0)
+
+    n = m.T @ m
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Centrar cada coluna na própria média reduz o cancelamento numérico
+        x = np.where(mask, x - x.sum(axis=0) / m.sum(axis=0), 0.0)
+        sx = x.T @ m          # sx[i, j]: soma de x_i nos intervalos comuns a i e j
+        sxx = (x * x).T @ m
+        sxy = x.T @ x
+        cov = sxy - sx * sx.T / n
+        var_i = sxx - sx * sx / n
+        var_j = var_i.T
+        r = cov / np.sqrt(var_i * var_j)
+
+    r[(n < min_overlap) | ~(var_i > 0) | ~(var_j > 0)] = np.nan
+    np.clip(r, -1.0, 1.0, out=r)
+    diagonal = (np.diag(n) >= min_overlap) & (np.diag(var_i) > 0)
+    r[np.diag_indices_from(r)] = np.where(diagonal, 1.0, np.nan)
+    return r, n.astype(np.int64)
+
+
+def rank_columns(grid: np.ndarray) -> np.ndarray:
+    """Postos de cada coluna (empates: posto médio); NaN continua NaN"""
+    if grid.size == 0:
+        return grid.copy()
+    return stats.rankdata(grid, axis=0, nan_policy="omit")
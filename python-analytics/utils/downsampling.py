@@ -0,0 +1,88 @@
+"""
+Redução de pontos para gráficos (LTTB e M4)
+
+Ambas as funções recebem x (tempo, crescente) e y como arrays float e
+devolvem os índices dos pontos escolhidos, em ordem, para que a série
+reduzida seja montada por fatiamento dos arrays colunares.
+
+- LTTB (Largest-Triangle-Three-Buckets, Steinarsson 2013): divide a série
+  em n_out - 2 buckets e em cada um escolhe o ponto que forma o maior
+  triângulo com o ponto escolhido no bucket anterior e a média do bucket
+  seguinte. Preserva picos e a forma visual com exatamente n_out pontos.
+  As médias de todos os buckets saem de somas acumuladas e as áreas de
+  cada bucket são vetorizadas; só a escolha encadeada percorre os buckets.
+- M4 (Jugel et al. 2014): divide o eixo do tempo em n_out / 4 colunas
+  (pixels) e mantém primeiro, último, mínimo e máximo de cada uma, o que
+  reproduz exatamente o desenho em linha naquela largura. Totalmente
+  vetorizado; devolve até n_out pontos (menos se houver colunas vazias).
+"""
+import numpy as np
+
+METHODS = ("lttb", "m4")
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Índices dos n_out pontos escolhidos pelo LTTB (todos, se n_out >= len)"""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Limites dos n_out - 2 buckets internos (primeiro e último ponto ficam fixos)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    cum_x = np.concatenate([[0.0], np.cumsum(x)])
+    cum_y = np.concatenate([[0.0], np.cumsum(y)])
+    sizes = np.diff(edges)
+    avg_x = (cum_x[edges[1:]] - cum_x[edges[:-1]]) / sizes
+    avg_y = (cum_y[edges[1:]] - cum_y[edges[:-1]]) / sizes
+    # Terceiro vértice de cada bucket: média do seguinte (no último, o ponto final)
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        xa, ya = x[a], y[a]
+        # Dobro da área (o fator 1/2 não altera o argmax)
+        area = np.abs((xa - next_x[b]) * (y[lo:hi] - ya) - (xa - x[lo:hi]) * (next_y[b] - ya))
+        a = lo + int(np.argmax(area))
+        selected[b + 1] = a
+    return selected
+
+
+def m4(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Índices de primeiro, último, mínimo e máximo de cada uma das n_out / 4 colunas"""
+    n = len(x)
+    columns = n_out // 4
+    if n_out >= n or columns < 1:
+        return np.arange(n)
+
+    span = x[-1] - x[0]
+    if span <= 0:
+        return np.array([0, n - 1]) if n > 1 else np.arange(n)
+    column = np.minimum(((x - x[0]) / span * columns).astype(np.int64), columns - 1)
+
+    starts = np.flatnonzero(np.r_[True, column[1:] != column[:-1]])
+    ends = np.r_[starts[1:], n] - 1
+    segment = np.repeat(np.arange(len(starts)), ends - starts + 1)
+
+    def first_where(hit: np.ndarray) -> np.ndarray:
+        """Primeiro índice de cada coluna em que hit é verdadeiro"""
+        positions = np.flatnonzero(hit)
+        _, first = np.unique(segment[positions], return_index=True)
+        return positions[first]
+
+    lows = first_where(y == np.minimum.reduceat(y, starts)[segment])
+    highs = first_where(y == np.maximum.reduceat(y, starts)[segment])
+    return np.unique(np.concatenate([starts, ends, lows, highs]))
+
+
+def downsample(x: np.ndarray, y: np.ndarray, n_out: int, method: str = "lttb") -> np.ndarray:
+    """Índices escolhidos por `method` (lttb ou m4)"""
+    if method == "m4":
+        return m4(x, y, n_out)
+    if method == "lttb":
+        return lttb(x, y, n_out)
+    raise ValueError(f"Método inválido: {method}")
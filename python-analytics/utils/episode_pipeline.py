@@ -0,0 +1,224 @@
+"""
+Episódios de condição calculados no MongoDB
+
+Versão em pipeline de agregação de find_episodes (utils/episodes.py): as
+leituras não saem do banco, apenas um resumo com contagens, horas, média e
+máximo do valor e os episódios mais longos de cada condição.
+
+- $setWindowFields ($shift) traz a leitura seguinte e a anterior de cada
+  leitura: intervalo até a próxima (peso), lacunas e se a condição já valia
+  na leitura anterior (início de episódio).
+- Um segundo $setWindowFields numera os episódios com a soma acumulada dos
+  inícios, e um $facet agrupa totais, episódios e intervalos.
+
+O peso de uma leitura antes de lacuna (ou da última) é o intervalo típico,
+a mediana dos intervalos regulares, que depende da série inteira; por isso
+o pipeline devolve separados a soma dos intervalos regulares e a quantidade
+de leituras com peso típico, e a mediana sai do histograma dos intervalos.
+Como cada episódio termina na primeira leitura com peso típico, os mais
+longos são escolhidos entre os `top` primeiros de cada grupo (com e sem
+leitura típica), sem transferir todos os episódios.
+"""
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+from utils.episodes import EPISODE_MAX_GAP_HOURS, histogram_median
+
+
+def hours_between(later, earlier) -> Dict:
+    """Diferença em horas (ms -> s -> h, mesma sequência de divisões do NumPy)"""
+    return {"$divide": [{"$divide": [{"$subtract": [later, earlier]}, 1000]}, 3600]}
+
+
+def episode_pipeline(
+    match: Dict,
+    value: Union[str, Dict],
+    conditions: Dict[str, Dict],
+    max_gap_hours: float = EPISODE_MAX_GAP_HOURS,
+    top: int = 5
+) -> List[Dict]:
+    """
+    Pipeline de resumo dos episódios de cada condição
+
+    - value: expressão do valor de cada leitura (vira o campo "valor")
+    - conditions: nome -> expressão booleana sobre "$valor"
+    """
+    sorted_by_time = {"timestamp": 1}
+    gap = {"$gt": ["$dt", max_gap_hours]}
+
+    facets = {
+        "resumo": [{"$group": {
+            "_id": None,
+            "leituras": {"$sum": 1},
+            "media": {"$avg": "$valor"},
+            "maximo": {"$max": "$valor"},
+            "horas": {"$sum": "$peso"},
+            "tipicas": {"$sum": {"$cond": ["$tipica", 1, 0]}},
+            **{
+                f"{name}_{field}": {"$sum": {"$cond": [when, amount, 0]}}
+                for name in conditions
+                for field, when, amount in (
+                    ("leituras", f"$c_{name}", 1),
+                    ("horas", f"$c_{name}", "$peso"),
+                    ("tipicas", {"$and": [f"$c_{name}", "$tipica"]}, 1)
+                )
+            }
+        }}],
+        # Histograma dos intervalos regulares (para a mediana exata)
+        "intervalos": [
+            {"$match": {"tipica": False, "dt": {"$gt": 0}}},
+            {"$group": {"_id": "$dt", "n": {"$sum": 1}}},
+            {"$sort": {"_id": 1}}
+        ]
+    }
+    for name in conditions:
+        facets[f"episodios_{name}"] = [
+            {"$match": {f"c_{name}": True}},
+            {"$group": {
+                "_id": f"$e_{name}",
+                "inicio": {"$min": "$timestamp"},
+                "fim": {"$max": "$timestamp"},
+                "horas": {"$sum": "$peso"},
+                "tipica": {"$max": "$tipica"},
+                "pico": {"$max": "$valor"}
+            }},
+            {"$sort": {"horas": -1, "inicio": 1}},
+            {"$group": {
+                "_id": "$tipica",
+                "n": {"$sum": 1},
+                "episodios": {"$push": {"inicio": "$inicio", "fim": "$fim", "horas": "$horas", "pico": "$pico"}}
+            }},
+            {"$project": {"n": 1, "episodios": {"$slice": ["$episodios", top]}}}
+        ]
+
+    return [
+        {"$match": match},
+        {"$project": {"_id": 0, "timestamp": 1, "valor": value}},
+        {"$set": {f"c_{name}": condition for name, condition in conditions.items()}},
+        {"$setWindowFields": {
+            "sortBy": sorted_by_time,
+            "output": {
+                "proximo": {"$shift": {"output": "$timestamp", "by": 1}},
+                "anterior": {"$shift": {"output": "$timestamp", "by": -1}},
+                **{
+                    f"p_{name}": {"$shift": {"output": f"$c_{name}", "by": -1, "default": False}}
+                    for name in conditions
+                }
+            }
+        }},
+        {"$set": {
+            # dt: intervalo até a próxima leitura (0 na última)
+            "dt": {"$cond": [{"$eq": ["$proximo", None]}, 0, hours_between("$proximo", "$timestamp")]},
+            "lacuna_anterior": {"$cond": [
+                {"$eq": ["$anterior", None]},
+                False,
+                {"$gt": [hours_between("$timestamp", "$anterior"), max_gap_hours]}
+            ]}
+        }},
+        {"$set": {
+            # Leituras antes de lacuna e a última valem o intervalo típico
+            "tipica": {"$or": [{"$eq": ["$proximo", None]}, gap]},
+            "peso": {"$cond": [{"$or": [{"$eq": ["$proximo", None]}, gap]}, 0, "$dt"]},
+            **{
+                f"inicio_{name}": {"$and": [
+                    f"$c_{name}",
+                    {"$not": [{"$and": [f"$p_{name}", {"$not": ["$lacuna_anterior"]}]}]}
+                ]}
+                for name in conditions
+            }
+        }},
+        {"$setWindowFields": {
+            "sortBy": sorted_by_time,
+            "output": {
+                f"e_{name}": {
+                    "$sum": {"$cond": [f"$inicio_{name}", 1, 0]},
+                    "window": {"documents": ["unbounded", "current"]}
+                }
+                for name in conditions
+            }
+        }},
+        {"$facet": facets}
+    ]
+
+
+class EpisodeSummary:
+    """
+    Resumo de uma condição vindo do pipeline
+
+    Mesmos atributos do EpisodeAggregator após finish() (hours, total_hours,
+    count, total_count, n_episodes, percent, longest_hours, top), então os
+    cálculos dos indicadores aceitam qualquer um dos dois.
+    """
+
+    def __init__(
+        self,
+        hours: float,
+        total_hours: float,
+        count: int,
+        total_count: int,
+        n_episodes: int,
+        episodes: List[Tuple[np.datetime64, np.datetime64, float, float]]
+    ):
+        self.hours = hours
+        self.total_hours = total_hours
+        self.count = count
+        self.total_count = total_count
+        self.n_episodes = n_episodes
+        # Candidatos a mais longos: (início, fim, duração, pico)
+        self._episodes = sorted(episodes, key=lambda e: (-round(e[2], 9), e[0]))
+
+    @property
+    def percent(self) -> float:
+        """Percentual do tempo observado na condição"""
+        return self.hours / self.total_hours * 100 if self.total_hours > 0 else 0.0
+
+    @property
+    def longest_hours(self) -> float:
+        return self._episodes[0][2] if self._episodes else 0.0
+
+    def top(self, n: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Episódios do mais longo para o mais curto (até o `top` do pipeline)"""
+        chosen = self._episodes[:n]
+        return {
+            "inicio": np.array([e[0] for e in chosen], dtype="datetime64[ns]"),
+            "fim": np.array([e[1] for e in chosen], dtype="datetime64[ns]"),
+            "duracao_horas": np.array([e[2] for e in chosen], dtype=np.float64),
+            "pico": np.array([e[3] for e in chosen], dtype=np.float64)
+        }
+
+
+def summarize(doc: Dict, conditions: List[str]) -> Tuple[Dict, Dict[str, EpisodeSummary]]:
+    """
+    ({leituras, media, maximo} do valor, resumo por condição) a partir do
+    documento do $facet
+    """
+    intervals = doc.get("intervalos") or []
+    typical = histogram_median(
+        np.array([i["_id"] for i in intervals], dtype=np.float64),
+        np.array([i["n"] for i in intervals], dtype=np.int64)
+    )
+
+    resumo = doc["resumo"][0] if doc.get("resumo") else {}
+    total_count = resumo.get("leituras", 0)
+    stats = {"leituras": total_count, "media": resumo.get("media"), "maximo": resumo.get("maximo")}
+    total_hours = resumo.get("horas", 0.0) + resumo.get("tipicas", 0) * typical
+
+    summaries = {}
+    for name in conditions:
+        episodes = []
+        n_episodes = 0
+        for group in doc.get(f"episodios_{name}") or []:
+            n_episodes += group["n"]
+            extra = typical if group["_id"] else 0.0
+            episodes.extend(
+                (np.datetime64(e["inicio"], "ns"), np.datetime64(e["fim"], "ns"), e["horas"] + extra, e["pico"])
+                for e in group["episodios"]
+            )
+        summaries[name] = EpisodeSummary(
+            hours=resumo.get(f"{name}_horas", 0.0) + resumo.get(f"{name}_tipicas", 0) * typical,
+            total_hours=total_hours,
+            count=resumo.get(f"{name}_leituras", 0),
+            total_count=total_count,
+            n_episodes=n_episodes,
+            episodes=episodes
+        )
+    return stats, summaries
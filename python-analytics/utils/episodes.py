@@ -0,0 +1,265 @@
+"""
+Episódios de condição (run-length) ponderados pelo tempo
+
+Um episódio é um trecho contínuo de leituras em que uma condição booleana
+é verdadeira (ex.: T > 35°C). Cada leitura vale o intervalo até a leitura
+seguinte, então as durações ficam corretas com qualquer taxa de amostragem.
+Intervalos maiores que max_gap_hours são lacunas: encerram o episódio e a
+leitura anterior à lacuna vale apenas o intervalo típico da série.
+
+O EpisodeAggregator processa a série por lotes (ex.: iter_last_hours) em uma
+única passada vetorizada; a última leitura de cada lote fica pendente até o
+lote seguinte, que define o seu intervalo. O intervalo típico (mediana dos
+intervalos regulares) é o da série inteira, não o de cada lote: os lotes
+acumulam um histograma dos intervalos e a quantidade de leituras com peso
+típico, e o peso dessas leituras só é aplicado em finish(). O resultado não
+depende do tamanho dos lotes.
+"""
+import os
+import numpy as np
+from typing import Dict, List, Optional
+
+# Intervalo máximo entre leituras dentro de um mesmo episódio
+EPISODE_MAX_GAP_HOURS = float(os.getenv("EPISODE_MAX_GAP_HOURS", 2))
+
+
+def histogram_median(values: np.ndarray, counts: np.ndarray) -> float:
+    """Mediana da série expandida do histograma (como np.median; values em ordem)"""
+    total = int(counts.sum())
+    if total == 0:
+        return 0.0
+    cumulative = np.cumsum(counts)
+    low = values[np.searchsorted(cumulative, (total - 1) // 2, side="right")]
+    high = values[np.searchsorted(cumulative, total // 2, side="right")]
+    return float((low + high) / 2)
+
+
+class EpisodeAggregator:
+    """
+    Episódios de uma condição acumulados por lotes
+
+    Após finish():
+    - hours / total_hours: tempo na condição / tempo observado (horas)
+    - count / total_count: leituras na condição / leituras processadas
+    - episodes: início, fim, duração (horas) e pico de cada episódio
+    - typical_hours: intervalo típico da série (peso das leituras antes de
+      lacunas e da última)
+    """
+
+    def __init__(self, max_gap_hours: float = EPISODE_MAX_GAP_HOURS):
+        self.max_gap_hours = max_gap_hours
+        self.typical_hours = 0.0
+        self.hours = 0.0
+        self.total_hours = 0.0
+        self.count = 0
+        self.total_count = 0
+
+        # Horas dos intervalos regulares e leituras com peso típico (resolvidas em finish)
+        self._hours = 0.0
+        self._total_hours = 0.0
+        self._typical = 0
+        self._total_typical = 0
+        # Histograma dos intervalos regulares: horas -> quantidade
+        self._intervals: Dict[float, int] = {}
+
+        # Leitura pendente (aguardando a próxima para saber quanto vale)
+        self._pending: Optional[tuple] = None
+        # Episódio ainda aberto no fim do último lote:
+        # [início, fim, horas regulares, leituras com peso típico, pico]
+        self._open: Optional[list] = None
+        self._starts: List[np.ndarray] = []
+        self._ends: List[np.ndarray] = []
+        self._durations: List[np.ndarray] = []
+        self._typicals: List[np.ndarray] = []
+        self._peaks: List[np.ndarray] = []
+        self._finished = False
+        # Início do episódio que chega à última leitura (None se a condição não vale no fim)
+        self.ongoing_since: Optional[np.datetime64] = None
+
+    def update(
+        self,
+        timestamps: np.ndarray,
+        condition: np.ndarray,
+        values: Optional[np.ndarray] = None
+    ) -> None:
+        """Incorporar um lote ordenado (values: série usada para o pico de cada episódio)"""
+        if len(timestamps) == 0:
+            return
+        if values is None:
+            values = np.full(len(timestamps), np.nan)
+        condition = np.asarray(condition, dtype=bool)
+
+        if self._pending is not None:
+            ts0, cond0, value0 = self._pending
+            timestamps = np.concatenate([[ts0], timestamps])
+            condition = np.concatenate([[cond0], condition])
+            values = np.concatenate([[value0], values])
+        self._pending = (timestamps[-1], condition[-1], values[-1])
+
+        if len(timestamps) < 2:
+            return
+
+        dt = np.diff(timestamps) / np.timedelta64(1, "s") / 3600
+        gap = dt > self.max_gap_hours
+        intervals, counts = np.unique(dt[(dt > 0) & ~gap], return_counts=True)
+        for interval, n in zip(intervals.tolist(), counts.tolist()):
+            self._intervals[interval] = self._intervals.get(interval, 0) + n
+        # Leituras antes de lacuna: peso típico, somado em finish()
+        weights = np.where(gap, 0.0, dt)
+
+        # Processar todas as leituras menos a pendente
+        cond = condition[:-1]
+        self._accumulate(weights, gap, cond)
+
+        # Um episódio começa onde a condição liga ou logo após uma lacuna
+        prev_on = np.concatenate([[self._open is not None], cond[:-1] & ~gap[:-1]])
+        idx = np.flatnonzero(cond)
+        if len(idx):
+            run_id = np.cumsum(cond & ~prev_on)[idx]
+            first = np.flatnonzero(np.r_[True, run_id[1:] != run_id[:-1]])
+            last = np.r_[first[1:] - 1, len(idx) - 1]
+            durations = np.add.reduceat(weights[idx], first)
+            typicals = np.add.reduceat(gap[idx].astype(np.int64), first)
+            peaks = np.fmax.reduceat(values[idx], first)
+            starts = timestamps[idx[first]]
+            ends = timestamps[idx[last]]
+
+            # Continuação do episódio aberto no lote anterior
+            if run_id[0] == 0:
+                self._open[1] = ends[0]
+                self._open[2] += durations[0]
+                self._open[3] += typicals[0]
+                self._open[4] = np.fmax(self._open[4], peaks[0])
+                starts, ends, durations, typicals, peaks = (
+                    starts[1:], ends[1:], durations[1:], typicals[1:], peaks[1:]
+                )
+                if len(durations):
+                    self._close_open()
+            elif self._open is not None:
+                self._close_open()
+
+            # O último episódio segue aberto se chega à leitura pendente sem lacuna
+            still_open = idx[-1] == len(cond) - 1 and not gap[-1] and condition[-1]
+            if still_open and len(durations):
+                self._open = [starts[-1], ends[-1], float(durations[-1]), int(typicals[-1]), peaks[-1]]
+                starts, ends, durations, typicals, peaks = (
+                    starts[:-1], ends[:-1], durations[:-1], typicals[:-1], peaks[:-1]
+                )
+            elif not still_open and self._open is not None:
+                self._close_open()
+
+            self._starts.append(starts)
+            self._ends.append(ends)
+            self._durations.append(durations)
+            self._typicals.append(typicals)
+            self._peaks.append(peaks)
+        elif self._open is not None:
+            self._close_open()
+
+    def finish(self) -> "EpisodeAggregator":
+        """
+        Encerrar a série: a última leitura vale o intervalo típico, agora
+        conhecido, assim como as leituras antes de lacunas
+        """
+        if self._finished:
+            return self
+        self._finished = True
+
+        if self._pending is not None:
+            ts, cond, value = self._pending
+            self._pending = None
+            self._accumulate(np.array([0.0]), np.array([True]), np.array([cond]))
+
+            if cond:
+                if self._open is None:
+                    self._open = [ts, ts, 0.0, 0, value]
+                self._open[1] = ts
+                self._open[3] += 1
+                self._open[4] = np.fmax(self._open[4], value)
+                self.ongoing_since = self._open[0]
+            if self._open is not None:
+                self._close_open()
+
+        intervals = sorted(self._intervals)
+        self.typical_hours = histogram_median(
+            np.array(intervals, dtype=np.float64),
+            np.array([self._intervals[i] for i in intervals], dtype=np.int64)
+        )
+        self.hours = self._hours + self._typical * self.typical_hours
+        self.total_hours = self._total_hours + self._total_typical * self.typical_hours
+        return self
+
+    def _accumulate(self, weights: np.ndarray, typical: np.ndarray, cond: np.ndarray) -> None:
+        self._hours += float(weights[cond].sum())
+        self._total_hours += float(weights.sum())
+        self._typical += int(np.count_nonzero(cond & typical))
+        self._total_typical += int(np.count_nonzero(typical))
+        self.count += int(np.count_nonzero(cond))
+        self.total_count += len(cond)
+
+    def _close_open(self) -> None:
+        start, end, duration, typicals, peak = self._open
+        self._starts.append(np.array([start]))
+        self._ends.append(np.array([end]))
+        self._durations.append(np.array([duration]))
+        self._typicals.append(np.array([typicals]))
+        self._peaks.append(np.array([peak]))
+        self._open = None
+
+    @property
+    def n_episodes(self) -> int:
+        return int(sum(len(d) for d in self._durations))
+
+    @property
+    def percent(self) -> float:
+        """Percentual do tempo observado na condição"""
+        return self.hours / self.total_hours * 100 if self.total_hours > 0 else 0.0
+
+    @property
+    def longest_hours(self) -> float:
+        durations = self._collect()[2]
+        return float(durations.max()) if len(durations) else 0.0
+
+    def _collect(self):
+        if not self._durations:
+            return (
+                np.empty(0, dtype="datetime64[ns]"),
+                np.empty(0, dtype="datetime64[ns]"),
+                np.empty(0),
+                np.empty(0)
+            )
+        durations = (
+            np.concatenate(self._durations).astype(np.float64)
+            + np.concatenate(self._typicals) * self.typical_hours
+        )
+        return (
+            np.concatenate(self._starts).astype("datetime64[ns]"),
+            np.concatenate(self._ends).astype("datetime64[ns]"),
+            durations,
+            np.concatenate(self._peaks).astype(np.float64)
+        )
+
+    def top(self, n: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Episódios do mais longo para o mais curto (empate: ordem cronológica)"""
+        starts, ends, durations, peaks = self._collect()
+        # Durações iguais a menos do arredondamento das somas contam como empate
+        order = np.argsort(-np.round(durations, 9), kind="stable")[:n]
+        return {
+            "inicio": starts[order],
+            "fim": ends[order],
+            "duracao_horas": durations[order],
+            "pico": peaks[order]
+        }
+
+
+
+def find_episodes(
+    timestamps: np.ndarray,
+    condition: np.ndarray,
+    values: Optional[np.ndarray] = None,
+    max_gap_hours: float = EPISODE_MAX_GAP_HOURS
+) -> EpisodeAggregator:
+    """Episódios de uma série já carregada (um único lote)"""
+    episodes = EpisodeAggregator(max_gap_hours)
+    episodes.update(timestamps, condition, values)
+    return episodes.finish()
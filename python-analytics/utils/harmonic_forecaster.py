@@ -0,0 +1,103 @@
+import numpy as np
+from typing import Dict, Tuple
+
+# Períodos sazonais (em horas) e número de pares seno/cosseno de cada um
+DAILY_PERIOD_HOURS = 24.0
+WEEKLY_PERIOD_HOURS = 168.0
+DAILY_FOURIER_ORDER = 4
+WEEKLY_FOURIER_ORDER = 2
+
+# Histórico mínimo para estimar a sazonalidade semanal
+WEEKLY_MIN_HISTORY_HOURS = 144.0
+
+# Quantil normal do intervalo de 80% (mesma largura padrão do Prophet)
+INTERVAL_Z = 1.2815515655446004
+
+
+class HarmonicForecaster:
+    """
+    Regressão harmônica: tendência linear + termos de Fourier diários e semanais
+
+    Os coeficientes são obtidos por mínimos quadrados (np.linalg.lstsq) e os
+    intervalos de previsão usam o desvio padrão dos resíduos somado à
+    incerteza dos coeficientes (alavancagem de cada ponto futuro). A
+    sazonalidade semanal só entra quando o histórico cobre ao menos
+    WEEKLY_MIN_HISTORY_HOURS. Treino e previsão são vetorizados e levam
+    milissegundos.
+    """
+
+    def __init__(
+        self,
+        daily_order: int = DAILY_FOURIER_ORDER,
+        weekly_order: int = WEEKLY_FOURIER_ORDER,
+        interval_z: float = INTERVAL_Z
+    ):
+        self.daily_order = daily_order
+        self.weekly_order = weekly_order
+        self.interval_z = interval_z
+        self.origin = None
+        self.scale_hours = 1.0
+        self.use_weekly = False
+        self.coef = None
+        self.xtx_inv = None
+        self.sigma = np.nan
+        self.n_obs = 0
+
+    def _hours(self, timestamps: np.ndarray) -> np.ndarray:
+        return (timestamps - self.origin) / np.timedelta64(1, "h")
+
+    def _design(self, hours: np.ndarray) -> np.ndarray:
+        columns = [np.ones_like(hours), hours / self.scale_hours]
+        seasons = [(DAILY_PERIOD_HOURS, self.daily_order)]
+        if self.use_weekly:
+            seasons.append((WEEKLY_PERIOD_HOURS, self.weekly_order))
+
+        for period, order in seasons:
+            k = np.arange(1, order + 1)
+            angles = 2 * np.pi * np.outer(hours, k) / period
+            columns.append(np.sin(angles))
+            columns.append(np.cos(angles))
+
+        return np.column_stack(columns)
+
+    def fit(self, timestamps: np.ndarray, values: np.ndarray) -> "HarmonicForecaster":
+        """Ajustar o modelo (timestamps datetime64, valores NaN são descartados)"""
+        valid = ~np.isnan(values)
+        timestamps, values = timestamps[valid], values[valid]
+
+        self.origin = timestamps.min()
+        hours = self._hours(timestamps)
+        # Tendência normalizada pelo tamanho do histórico (melhor condicionamento)
+        self.scale_hours = max(float(hours.max()), 1.0)
+        self.use_weekly = self.scale_hours >= WEEKLY_MIN_HISTORY_HOURS
+
+        X = self._design(hours)
+        self.coef, _, rank, _ = np.linalg.lstsq(X, values, rcond=None)
+        residuals = values - X @ self.coef
+
+        self.n_obs = len(values)
+        dof = max(self.n_obs - rank, 1)
+        self.sigma = float(np.sqrt(residuals @ residuals / dof))
+        self.xtx_inv = np.linalg.pinv(X.T @ X)
+        return self
+
+    def predict(self, timestamps: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Previsão pontual e limites inferior/superior do intervalo"""
+        X = self._design(self._hours(timestamps))
+        yhat = X @ self.coef
+
+        leverage = np.einsum("ij,jk,ik->i", X, self.xtx_inv, X)
+        half_width = self.interval_z * self.sigma * np.sqrt(1 + leverage)
+        return yhat, yhat - half_width, yhat + half_width
+
+    def describe(self) -> Dict:
+        """Resumo do ajuste para a resposta da API"""
+        return {
+            "motor": "harmonico",
+            "leituras_treino": self.n_obs,
+            "termos_fourier": {
+                "diario": self.daily_order,
+                "semanal": self.weekly_order if self.use_weekly else 0
+            },
+            "desvio_residual": round(self.sigma, 4)
+        }
@@ -0,0 +1,86 @@
+"""
+Kernels NumPy para os indicadores
+
+Funções puras sobre arrays, usadas pelos serviços no lugar de
+DataFrame.apply(axis=1) e iterrows(). O laço Python que sobra é apenas o da
+montagem da resposta, restrito às linhas selecionadas.
+"""
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+# Limites do índice de calor e classes de conforto correspondentes
+COMFORT_LIMITS = (24, 27, 30, 33)
+COMFORT_CLASSES = (
+    "muito confortável",
+    "confortável",
+    "levemente desconfortável",
+    "desconfortável",
+    "muito desconfortável"
+)
+
+
+def isoformat(timestamps: np.ndarray) -> List[str]:
+    """Timestamps datetime64 em ISO 8601 (como pd.Timestamp.isoformat)"""
+    return list(pd.DatetimeIndex(timestamps).map(pd.Timestamp.isoformat))
+
+
+def heat_index(temperatura: np.ndarray, umidade: np.ndarray) -> np.ndarray:
+    """Índice de calor simplificado, elemento a elemento"""
+    vapor = 6.11 * np.exp(5417.7530 * ((1 / 273.16) - (1 / (temperatura + 273.15))))
+    return temperatura + 0.5555 * (vapor * (umidade / 100) - 10)
+
+
+def comfort_classes(indice: np.ndarray) -> np.ndarray:
+    """Classe de conforto de cada índice (NaN cai na última classe)"""
+    conditions = [indice < limit for limit in COMFORT_LIMITS]
+    return np.select(conditions, COMFORT_CLASSES[:-1], default=COMFORT_CLASSES[-1])
+
+
+def value_counts(labels: np.ndarray) -> Dict[str, int]:
+    """Contagem por rótulo, da mais frequente para a menos (empate: ordem de aparição)"""
+    uniques, first_index, counts = np.unique(labels, return_index=True, return_counts=True)
+    order = np.lexsort((first_index, -counts))
+    return {str(uniques[i]): int(counts[i]) for i in order}
+
+
+def anomaly_rows(
+    timestamps: np.ndarray,
+    values: np.ndarray,
+    zscores: np.ndarray,
+    threshold: float,
+    tipo: str,
+    high_zscore: float = 4
+) -> List[Dict]:
+    """Linhas com |z| acima do limite, já no formato da resposta"""
+    mask = zscores > threshold
+    iso = isoformat(timestamps[mask])
+    return [
+        {
+            "timestamp": ts,
+            "tipo": tipo,
+            "valor": round(valor, 2),
+            "zscore": round(z, 2),
+            "gravidade": "alta" if z > high_zscore else "moderada"
+        }
+        for ts, valor, z in zip(iso, values[mask].tolist(), zscores[mask].tolist())
+    ]
+
+
+def forecast_rows(
+    timestamps: np.ndarray,
+    yhat: np.ndarray,
+    lower: np.ndarray,
+    upper: np.ndarray
+) -> List[Dict]:
+    """Previsões horárias no formato da resposta"""
+    iso = isoformat(timestamps)
+    return [
+        {
+            "timestamp": ts,
+            "previsto": round(y, 2),
+            "limite_inferior": round(lo, 2),
+            "limite_superior": round(hi, 2)
+        }
+        for ts, y, lo, hi in zip(iso, yhat.tolist(), lower.tolist(), upper.tolist())
+    ]
@@ -0,0 +1,117 @@
+"""
+Sketch de quantis mesclável (histograma de resolução fixa)
+
+Cada valor é arredondado para a grade de 1/SKETCH_SCALE (0,1°C / 0,1% UR) e
+contado no seu bin. Somar as contagens de dois sketches dá exatamente o
+sketch da união, então sketches por bucket de tempo (agregados horários e
+diários) podem ser mesclados para qualquer intervalo sem reler as leituras.
+O tamanho depende só da faixa de valores observada, não do número de leituras.
+
+Limite de erro: cada valor se desloca no máximo meia resolução ao ser
+arredondado (SKETCH_ERROR_BOUND = 0,05); como a ordem é preservada, qualquer
+quantil (interpolação linear, como no pandas/NumPy) difere do exato em no
+máximo esse valor. Limites do IQR (Q1 - k·IQR, Q3 + k·IQR) ficam dentro de
+(1 + 2k)·SKETCH_ERROR_BOUND.
+"""
+from __future__ import annotations
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+
+# Bins por unidade (0,1 de resolução); o pipeline dos agregados usa o mesmo valor
+SKETCH_SCALE = 10
+SKETCH_ERROR_BOUND = 0.5 / SKETCH_SCALE
+
+
+class QuantileSketch:
+    """Histograma esparso ordenado: bins inteiros (valor × SKETCH_SCALE) e contagens"""
+
+    __slots__ = ("bins", "counts")
+
+    def __init__(self, bins: np.ndarray, counts: np.ndarray):
+        self.bins = bins
+        self.counts = counts
+
+    @classmethod
+    def empty(cls) -> QuantileSketch:
+        return cls(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+
+    @classmethod
+    def from_values(cls, values: np.ndarray) -> QuantileSketch:
+        """Sketch de um array de valores (NaN é ignorado)"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        # np.round arredonda meio para o par, como o $round do MongoDB
+        bins, counts = np.unique(np.round(values * SKETCH_SCALE).astype(np.int64), return_counts=True)
+        return cls(bins, counts.astype(np.int64))
+
+    @classmethod
+    def from_histogram(cls, histogram: Optional[Dict[str, int]]) -> QuantileSketch:
+        """Sketch a partir do histograma gravado nos agregados ({"253": 4, ...})"""
+        if not histogram:
+            return cls.empty()
+        bins = np.fromiter((int(k) for k in histogram), dtype=np.int64, count=len(histogram))
+        counts = np.fromiter(histogram.values(), dtype=np.int64, count=len(histogram))
+        order = np.argsort(bins)
+        return cls(bins[order], counts[order])
+
+    @classmethod
+    def merge_all(cls, sketches: Iterable[QuantileSketch]) -> QuantileSketch:
+        """Mesclar vários sketches de uma vez"""
+        sketches = [s for s in sketches if len(s.bins)]
+        if not sketches:
+            return cls.empty()
+        bins = np.concatenate([s.bins for s in sketches])
+        counts = np.concatenate([s.counts for s in sketches])
+        merged, inverse = np.unique(bins, return_inverse=True)
+        return cls(merged, np.bincount(inverse, weights=counts).astype(np.int64))
+
+    @classmethod
+    def from_histograms(cls, histograms: Iterable[Optional[Dict[str, int]]]) -> QuantileSketch:
+        """Mesclar os histogramas de vários buckets (uma única passada)"""
+        keys: List[str] = []
+        counts: List[int] = []
+        for histogram in histograms:
+            if histogram:
+                keys.extend(histogram)
+                counts.extend(histogram.values())
+        if not keys:
+            return cls.empty()
+        merged, inverse = np.unique(np.array(keys, dtype=np.int64), return_inverse=True)
+        return cls(merged, np.bincount(inverse, weights=counts).astype(np.int64))
+
+    def merge(self, other: QuantileSketch) -> QuantileSketch:
+        return QuantileSketch.merge_all([self, other])
+
+    def to_histogram(self) -> Dict[str, int]:
+        return {str(b): int(c) for b, c in zip(self.bins.tolist(), self.counts.tolist())}
+
+    @property
+    def count(self) -> int:
+        return int(self.counts.sum())
+
+    def quantiles(self, qs: Sequence[float]) -> List[float]:
+        """Quantis com interpolação linear entre as estatísticas de ordem"""
+        n = self.count
+        if n == 0:
+            return [np.nan] * len(qs)
+
+        cumulative = np.cumsum(self.counts)
+        position = (n - 1) * np.asarray(qs, dtype=np.float64)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, n - 1)
+        v_lower = self.bins[np.searchsorted(cumulative, lower, side="right")] / SKETCH_SCALE
+        v_upper = self.bins[np.searchsorted(cumulative, upper, side="right")] / SKETCH_SCALE
+        return (v_lower + (position - lower) * (v_upper - v_lower)).tolist()
+
+    def quantile(self, q: float) -> float:
+        return self.quantiles([q])[0]
+
+    def iqr_bounds(self, k: float = 1.5) -> Tuple[float, float, float, float]:
+        """(Q1, Q3, limite inferior, limite superior) do critério IQR"""
+        q1, q3 = self.quantiles([0.25, 0.75])
+        iqr = q3 - q1
+        return q1, q3, q1 - k * iqr, q3 + k * iqr
+
+    @property
+    def nbytes(self) -> int:
+        return self.bins.nbytes + self.counts.nbytes
@@ -0,0 +1,133 @@
+"""
+Estatísticas suficientes para tendência linear e correlação de Pearson
+
+Com n, Σt, Σt², Σx, Σx², Σy, Σy², Σtx, Σty e Σxy (t = tempo em horas,
+x = temperatura, y = umidade) saem em forma fechada a inclinação e o R² da
+regressão de cada grandeza no tempo e o r de Pearson entre as duas. As
+somas são aditivas, então as de cada bucket dos agregados (campos reg_*)
+se combinam para qualquer intervalo sem reler as leituras.
+
+Nos buckets, t é medido a partir do início do próprio bucket (horas), o
+que mantém Σt² pequeno; ao combinar, cada bucket é deslocado para uma
+origem comum, o que preserva a precisão da variância do tempo. Somas com a
+mesma origem (ex.: buckets e leituras brutas das pontas de uma janela)
+se juntam com merge.
+Só entram leituras com temperatura e umidade presentes.
+"""
+from __future__ import annotations
+from typing import Dict, Iterable, Optional, Tuple
+from datetime import datetime
+import numpy as np
+from scipy import stats
+
+# Campos reg_* dos buckets dos agregados, na ordem de SUMS
+SUMS = ("n", "t", "tt", "x", "xx", "y", "yy", "tx", "ty", "xy")
+ROLLUP_FIELDS = {
+    "n": "reg_n",
+    "t": "reg_t",
+    "tt": "reg_tt",
+    "x": "reg_temp",
+    "xx": "reg_temp2",
+    "y": "reg_umid",
+    "yy": "reg_umid2",
+    "tx": "reg_t_temp",
+    "ty": "reg_t_umid",
+    "xy": "reg_temp_umid"
+}
+# Grandeza -> variável nas somas
+VARIABLES = {"temperatura": "x", "umidade": "y"}
+
+
+class RegressionSums:
+    """Somas acumuladas com o tempo medido em horas a partir de uma origem comum"""
+
+    __slots__ = SUMS
+
+    def __init__(self, **sums: float):
+        for name in SUMS:
+            setattr(self, name, float(sums.get(name, 0.0)))
+
+    @classmethod
+    def from_arrays(
+        cls,
+        timestamps: np.ndarray,
+        temperatura: np.ndarray,
+        umidade: np.ndarray,
+        origin: Optional[datetime] = None
+    ) -> RegressionSums:
+        """Somas de leituras brutas (origem: `origin` ou a primeira leitura)"""
+        valid = ~(np.isnan(temperatura) | np.isnan(umidade))
+        if not valid.any():
+            return cls()
+        zero = timestamps[valid][0] if origin is None else np.datetime64(origin, "ns")
+        t = (timestamps[valid] - zero) / np.timedelta64(1, "s") / 3600
+        x = temperatura[valid]
+        y = umidade[valid]
+        return cls(
+            n=len(t), t=t.sum(), tt=(t * t).sum(),
+            x=x.sum(), xx=(x * x).sum(), y=y.sum(), yy=(y * y).sum(),
+            tx=(t * x).sum(), ty=(t * y).sum(), xy=(x * y).sum()
+        )
+
+    @classmethod
+    def from_buckets(cls, buckets: Iterable[Dict], origin: Optional[datetime] = None) -> RegressionSums:
+        """Combinar as somas reg_* dos buckets (origem: `origin` ou início do primeiro bucket)"""
+        buckets = [b for b in buckets if b.get("reg_n")]
+        if not buckets:
+            return cls()
+
+        if origin is None:
+            origin = min(b["inicio"] for b in buckets)
+        columns = {
+            name: np.array([b.get(field) or 0.0 for b in buckets], dtype=np.float64)
+            for name, field in ROLLUP_FIELDS.items()
+        }
+        # Deslocar o tempo de cada bucket: t = c + τ
+        c = np.array([(b["inicio"] - origin).total_seconds() / 3600 for b in buckets])
+        n, tau, tau2 = columns["n"], columns["t"], columns["tt"]
+        return cls(
+            n=n.sum(),
+            t=(n * c + tau).sum(),
+            tt=(n * c * c + 2 * c * tau + tau2).sum(),
+            x=columns["x"].sum(),
+            xx=columns["xx"].sum(),
+            y=columns["y"].sum(),
+            yy=columns["yy"].sum(),
+            tx=(c * columns["x"] + columns["tx"]).sum(),
+            ty=(c * columns["y"] + columns["ty"]).sum(),
+            xy=columns["xy"].sum()
+        )
+
+    def merge(self, other: RegressionSums) -> RegressionSums:
+        """Somas das duas partes (ambas medidas a partir da mesma origem)"""
+        return RegressionSums(**{name: getattr(self, name) + getattr(other, name) for name in SUMS})
+
+    def _cov(self, a: str, b: str) -> float:
+        """Soma dos produtos centrados: Σab - ΣaΣb/n"""
+        product = getattr(self, "".join(sorted(a + b)) if a != b else a + b)
+        return product - getattr(self, a) * getattr(self, b) / self.n
+
+    def trend(self, field: str) -> Tuple[float, float]:
+        """(inclinação por hora, R²) da regressão de `field` no tempo"""
+        v = VARIABLES[field]
+        stt = self._cov("t", "t")
+        svv = self._cov(v, v)
+        stv = self._cov("t", v)
+        if self.n < 2 or stt <= 0:
+            return 0.0, 0.0
+        slope = stv / stt
+        r2 = stv * stv / (stt * svv) if svv > 0 else 0.0
+        return slope, min(r2, 1.0)
+
+    def pearson(self) -> Tuple[float, float]:
+        """(r, p-valor bilateral) de Pearson entre temperatura e umidade"""
+        sxx = self._cov("x", "x")
+        syy = self._cov("y", "y")
+        if self.n < 3 or sxx <= 0 or syy <= 0:
+            return np.nan, np.nan
+        r = float(np.clip(self._cov("x", "y") / np.sqrt(sxx * syy), -1.0, 1.0))
+        if abs(r) == 1.0:
+            return r, 0.0
+        # Mesmo teste de scipy.stats.pearsonr: t com n - 2 graus de liberdade
+        t = r * np.sqrt((self.n - 2) / (1 - r * r))
+        return r, float(2 * stats.t.sf(abs(t), self.n - 2))
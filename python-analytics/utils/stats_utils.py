@@ -1,7 +1,8 @@
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 from scipy import signal
 import pandas as pd
+from utils.quantile_sketch import QuantileSketch
 
 class StatsUtils:
     """Utilitários para análises estatísticas avançadas"""
@@ -71,15 +72,23 @@ class StatsUtils:
         }
     
     @staticmethod
-    def detect_outliers_iqr(data: List[float]) -> Dict:
-        """Detectar outliers usando método IQR"""
-        arr = np.array(data)
-        q1 = np.percentile(arr, 25)
-        q3 = np.percentile(arr, 75)
-        iqr = q3 - q1
+    def detect_outliers_iqr(data: List[float], sketch: Optional[QuantileSketch] = None) -> Dict:
+        """
+        Detectar outliers usando método IQR
         
-        lower_bound = q1 - 1.5 * iqr
-        upper_bound = q3 + 1.5 * iqr
+        Com `sketch` (ex.: mesclado dos agregados de um período maior), os
+        quartis vêm dele e `data` só é percorrido para marcar os outliers.
+        """
+        arr = np.array(data)
+        if sketch is not None:
+            _, _, lower_bound, upper_bound = sketch.iqr_bounds(1.5)
+        else:
+            q1 = np.percentile(arr, 25)
+            q3 = np.percentile(arr, 75)
+            iqr = q3 - q1
+            
+            lower_bound = q1 - 1.5 * iqr
+            upper_bound = q3 + 1.5 * iqr
         
         outliers_indices = np.where((arr < lower_bound) | (arr > upper_bound))[0]
         
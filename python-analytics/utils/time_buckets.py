@@ -0,0 +1,84 @@
+"""
+Granularidades de agregação por intervalo de tempo
+
+Cada granularidade vira um $dateTrunc com unit/binSize e fuso horário
+explícito, então os buckets voltam do MongoDB como datas ordenáveis (início
+do intervalo, em UTC) alinhadas ao relógio local: "1d" agrupa de meia-noite
+a meia-noite no fuso pedido e "6h" em 00h/06h/12h/18h locais.
+
+As datas voltam do MongoDB em UTC sem tzinfo (como os timestamps usados no
+restante dos repositórios); local_isoformat converte o início do bucket
+para o fuso da resposta.
+"""
+from typing import Dict, Optional, Tuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import os
+import numpy as np
+import pandas as pd
+
+# Fuso padrão dos buckets (o frontend assume o horário de Recife)
+BUCKET_TIMEZONE = os.getenv("BUCKET_TIMEZONE", "America/Recife")
+
+# Granularidade -> (unit, binSize) do $dateTrunc
+GRANULARITIES: Dict[str, Tuple[str, int]] = {
+    "1m": ("minute", 1),
+    "5m": ("minute", 5),
+    "15m": ("minute", 15),
+    "1h": ("hour", 1),
+    "6h": ("hour", 6),
+    "1d": ("day", 1)
+}
+
+# Granularidades que podem ser montadas a partir dos agregados horários
+HOURLY_MULTIPLES = ("1h", "6h", "1d")
+
+
+def bin_width(granularity: str) -> timedelta:
+    unit, size = GRANULARITIES[granularity]
+    return {"minute": timedelta(minutes=1), "hour": timedelta(hours=1), "day": timedelta(days=1)}[unit] * size
+
+
+def date_trunc(date: str, granularity: str, timezone: str = BUCKET_TIMEZONE) -> Dict:
+    """Expressão $dateTrunc do início do bucket que contém `date`"""
+    unit, size = GRANULARITIES[granularity]
+    return {"$dateTrunc": {"date": date, "unit": unit, "binSize": size, "timezone": timezone}}
+
+
+def get_zone(timezone: str) -> Optional[ZoneInfo]:
+    """ZoneInfo do fuso, ou None se o nome não existir"""
+    try:
+        return ZoneInfo(timezone)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def whole_hour_offsets(timezone: str, start: datetime, end: datetime) -> bool:
+    """
+    O fuso tem deslocamento de horas inteiras em [start, end]?
+
+    Nesse caso cada bucket horário UTC cai inteiro dentro de um bucket local
+    de 1h/6h/1d, e os agregados horários podem ser reagrupados sem erro.
+    """
+    zone = ZoneInfo(timezone)
+    for moment in (start, end):
+        offset = moment.replace(tzinfo=dt_timezone.utc).astimezone(zone).utcoffset()
+        if offset.total_seconds() % 3600:
+            return False
+    return True
+
+
+def local_isoformat(moment: datetime, timezone: str = BUCKET_TIMEZONE) -> str:
+    """Instante UTC (sem tzinfo) em ISO 8601 no fuso pedido, com o deslocamento"""
+    return moment.replace(tzinfo=dt_timezone.utc).astimezone(ZoneInfo(timezone)).isoformat()
+
+
+def local_timestamps(timestamps: np.ndarray, timezone: str = BUCKET_TIMEZONE) -> np.ndarray:
+    """Timestamps UTC (datetime64, sem tzinfo) convertidos para o horário local do fuso"""
+    return (
+        pd.DatetimeIndex(timestamps)
+        .tz_localize("UTC")
+        .tz_convert(timezone)
+        .tz_localize(None)
+        .to_numpy(dtype="datetime64[ns]")
+    )